@@ -0,0 +1,385 @@
+import json, logging, threading, time
+from datetime import datetime, timedelta
+from flask import current_app
+from sqlalchemy import bindparam, func, literal, select
+from sqlalchemy.exc import OperationalError
+
+from models import (db, Audit, ChangeCounter, FlowRollup, Machine, Project, Task, TaskAssignment, TaskTransition,
+                    User, TASK_STATES)
+
+log = logging.getLogger(__name__)
+
+# ----------------------
+# Flow analytics
+# ----------------------
+# Task state changes only exist as Audit diffs ({"before": {...}, "after":
+# {"state": ...}}). refresh() parses the task update rows past a high-water
+# mark (the "analytics" ChangeCounter: the last audit id processed) into
+# TaskTransition facts and adds them to FlowRollup buckets in the same
+# transaction, so catching up after a day of activity reads only that day's
+# audit rows. Each fact carries how long the task sat in its previous state;
+# entries into done also carry lead time (created -> done) and cycle time
+# (first in_progress -> done).
+#
+# Rollups are daily for every dimension and hourly for the shop-wide series.
+# User and machine follow the task's assignments when the transition is
+# processed; time in a state is booked to the bucket where the task left it.
+# WIP is the live count of tasks in WIP_STATES, walked back through the
+# rollups' net flow for history.
+#
+# Audit ids can commit out of order under concurrent writers, so rows
+# younger than SETTLE_SECONDS are left for the next refresh. The JSON
+# endpoints call refresh_if_due() (at most ANALYTICS_REFRESH_ROWS rows every
+# ANALYTICS_REFRESH_SECONDS per process); `python app.py --refresh-analytics`
+# catches up fully, e.g. from cron.
+
+METRICS = ("throughput", "lead_time", "time_in_state", "wip")
+DIMENSIONS = ("all", "project", "customer", "user", "machine")
+HOURLY_DIMENSIONS = ("all",)
+GRAINS = {"hour": timedelta(hours=1), "day": timedelta(days=1), "week": timedelta(days=7)}
+WIP_STATES = ("in_progress", "blocked", "review")
+COLUMNS = ("entered", "exited", "timed", "state_seconds", "lead_count", "lead_seconds", "cycle_count", "cycle_seconds")
+KEY_COLUMNS = ("grain", "bucket", "dim", "key", "state")
+HIGH_WATER_MARK = "analytics"
+BATCH_SIZE = 5000
+SETTLE_SECONDS = 10
+MAX_DAYS = 730
+MAX_ROWS = 100
+
+audit_table = Audit.__table__
+transition_table = TaskTransition.__table__
+rollup_table = FlowRollup.__table__
+counter_table = ChangeCounter.__table__
+
+
+def _floor(at, grain):
+    if grain == "hour":
+        return at.replace(minute=0, second=0, microsecond=0)
+    day = at.replace(hour=0, minute=0, second=0, microsecond=0)
+    return day - timedelta(days=day.weekday()) if grain == "week" else day
+
+
+def _seconds(later, earlier):
+    if later is None or earlier is None or later < earlier:
+        return None
+    return int((later - earlier).total_seconds())
+
+
+def _transition(diff):
+    """(from_state, to_state) for an audit diff that changed a task's state, else None."""
+    try:
+        d = json.loads(diff) if diff else None
+    except ValueError:
+        return None
+    after = d.get("after") if isinstance(d, dict) else None
+    if not isinstance(after, dict) or after.get("state") not in TASK_STATES:
+        return None
+    before = d.get("before") if isinstance(d.get("before"), dict) else {}
+    from_state = before.get("state") if before.get("state") in TASK_STATES else None
+    if from_state == after["state"]:
+        return None  # the HTML edit form always sends a state
+    return from_state, after["state"]
+
+
+# -------- Incremental refresh --------
+def high_water_mark(conn=None):
+    conn = conn or db.session.connection()
+    return conn.execute(select(counter_table.c.value).where(counter_table.c.name == HIGH_WATER_MARK)).scalar() or 0
+
+
+def _advance(conn, old, new):
+    """Move the mark old -> new; False if another process got there first."""
+    res = conn.execute(counter_table.update()
+                       .where(counter_table.c.name == HIGH_WATER_MARK, counter_table.c.value == old)
+                       .values(value=new))
+    if res.rowcount:
+        return True
+    if old == 0 and high_water_mark(conn) == 0:
+        conn.execute(counter_table.insert().values(name=HIGH_WATER_MARK, value=new))
+        return True
+    return False
+
+
+def refresh(limit=None, batch_size=BATCH_SIZE, settle=SETTLE_SECONDS):
+    """Process audit rows past the high-water mark, committing per batch; returns transitions added.
+
+    ``limit`` caps how many audit rows are read in this call.
+    """
+    conn = db.session.connection()
+    mark = high_water_mark(conn)
+    cutoff = datetime.utcnow() - timedelta(seconds=settle)
+    upper = conn.execute(select(func.max(audit_table.c.id))
+                         .where(audit_table.c.id > mark, audit_table.c.at <= cutoff)).scalar()
+    added = read = 0
+    while upper and mark < upper and (limit is None or read < limit):
+        size = batch_size if limit is None else min(batch_size, limit - read)
+        rows = conn.execute(
+            select(audit_table.c.id, audit_table.c.entity_id, audit_table.c.actor_id, audit_table.c.diff,
+                   audit_table.c.at)
+            .where(audit_table.c.id > mark, audit_table.c.id <= upper,
+                   audit_table.c.entity_type == "task", audit_table.c.action == "update")
+            .order_by(audit_table.c.id)
+            .limit(size)
+        ).all()
+        end = rows[-1].id if len(rows) == size else upper
+        if not _advance(conn, mark, end):
+            db.session.rollback()  # another process took this range
+            break
+        added += _ingest(conn, rows)
+        db.session.commit()
+        conn = db.session.connection()
+        read += len(rows)
+        mark = end
+    return added
+
+
+def refresh_if_due():
+    """Throttled refresh() for request handlers; returns transitions added."""
+    state = current_app.extensions.setdefault("analytics", {"lock": threading.Lock(), "next": 0.0})
+    now = time.monotonic()
+    if now < state["next"] or not state["lock"].acquire(blocking=False):
+        return 0
+    try:
+        state["next"] = now + current_app.config["ANALYTICS_REFRESH_SECONDS"]
+        return refresh(limit=current_app.config["ANALYTICS_REFRESH_ROWS"])
+    except OperationalError:
+        # Lost the write lock to another worker's refresh; serve what's there
+        db.session.rollback()
+        log.warning("analytics refresh skipped", exc_info=True)
+        return 0
+    finally:
+        state["lock"].release()
+
+
+def rebuild():
+    """Drop every fact and rollup and reprocess the whole audit log; returns transitions added."""
+    conn = db.session.connection()
+    for table in (transition_table, rollup_table):
+        table.create(conn, checkfirst=True)
+        conn.execute(table.delete())
+    conn.execute(counter_table.delete().where(counter_table.c.name == HIGH_WATER_MARK))
+    db.session.commit()
+    return refresh()
+
+
+def _ingest(conn, rows):
+    """Insert facts and apply rollup deltas for one batch of task update audit rows (oldest first)."""
+    parsed = []
+    for aid, task_id, actor_id, diff, at in rows:
+        change = _transition(diff)
+        if change and task_id is not None and at is not None:
+            parsed.append((aid, task_id, actor_id, at) + change)
+    if not parsed:
+        return 0
+    ids = list({p[1] for p in parsed})
+    tasks = {tid: (created, pid, customer) for tid, created, pid, customer in conn.execute(
+        select(Task.id, Task.created_at, Task.project_id, Project.customer)
+        .outerjoin(Project, Project.id == Task.project_id).where(Task.id.in_(ids)))}
+    last_at = dict(conn.execute(select(transition_table.c.task_id, func.max(transition_table.c.at))
+                                .where(transition_table.c.task_id.in_(ids))
+                                .group_by(transition_table.c.task_id)).all())
+    done_ids = list({p[1] for p in parsed if p[5] == "done"})
+    started = dict(conn.execute(select(transition_table.c.task_id, func.min(transition_table.c.at))
+                                .where(transition_table.c.task_id.in_(done_ids),
+                                       transition_table.c.to_state == "in_progress")
+                                .group_by(transition_table.c.task_id)).all()) if done_ids else {}
+    assigned = {}
+    for tid, uid, mid in conn.execute(select(TaskAssignment.task_id, TaskAssignment.user_id, TaskAssignment.machine_id)
+                                      .where(TaskAssignment.task_id.in_(ids))):
+        keys = assigned.setdefault(tid, set())
+        if uid is not None:
+            keys.add(("user", str(uid)))
+        if mid is not None:
+            keys.add(("machine", str(mid)))
+
+    facts, deltas = [], {}
+    for aid, tid, actor_id, at, from_state, to_state in parsed:
+        created, pid, customer = tasks.get(tid, (None, None, None))
+        in_state = _seconds(at, last_at.get(tid) or created)
+        lead = cycle = None
+        if to_state == "in_progress":
+            started.setdefault(tid, at)
+        elif to_state == "done":
+            lead, cycle = _seconds(at, created), _seconds(at, started.get(tid))
+        last_at[tid] = at
+        facts.append({"audit_id": aid, "task_id": tid, "project_id": pid, "actor_id": actor_id,
+                      "from_state": from_state, "to_state": to_state, "at": at,
+                      "state_seconds": in_state, "lead_seconds": lead, "cycle_seconds": cycle})
+
+        keys = [("all", "")]
+        if pid is not None:
+            keys.append(("project", str(pid)))
+        if customer:
+            keys.append(("customer", customer[:120]))
+        keys += sorted(assigned.get(tid, ()))
+        for grain in ("day", "hour"):
+            bucket = _floor(at, grain)
+            for dim, key in keys:
+                if grain == "hour" and dim not in HOURLY_DIMENSIONS:
+                    continue
+                if from_state:
+                    _add(deltas, (grain, bucket, dim, key, from_state), exited=1, timed=in_state is not None,
+                         state_seconds=in_state or 0)
+                _add(deltas, (grain, bucket, dim, key, to_state), entered=1,
+                     lead_count=lead is not None, lead_seconds=lead or 0,
+                     cycle_count=cycle is not None, cycle_seconds=cycle or 0)
+    conn.execute(transition_table.insert(), facts)
+    _apply(conn, deltas)
+    return len(facts)
+
+
+def _add(deltas, key, **values):
+    bucket = deltas.setdefault(key, dict.fromkeys(COLUMNS, 0))
+    for k, v in values.items():
+        bucket[k] += int(v)
+
+
+def _apply(conn, deltas):
+    """Add {(grain, bucket, dim, key, state): {column: change}} to the rollup; one executemany each for updates and inserts."""
+    have = set()
+    for grain in {k[0] for k in deltas}:
+        buckets = [k[1] for k in deltas if k[0] == grain]
+        # A batch spans a few buckets, so a primary-key range read finds the existing rows
+        have.update(tuple(r) for r in conn.execute(
+            select(*(rollup_table.c[c] for c in KEY_COLUMNS))
+            .where(rollup_table.c.grain == grain, rollup_table.c.bucket.between(min(buckets), max(buckets)))))
+    updates = [{**{f"k_{c}": v for c, v in zip(KEY_COLUMNS, k)}, **{f"d_{c}": d[c] for c in COLUMNS}}
+               for k, d in deltas.items() if k in have]
+    inserts = [{**dict(zip(KEY_COLUMNS, k)), **d} for k, d in deltas.items() if k not in have]
+    if updates:
+        conn.execute(rollup_table.update()
+                     .where(*(rollup_table.c[c] == bindparam(f"k_{c}") for c in KEY_COLUMNS))
+                     .values({c: rollup_table.c[c] + bindparam(f"d_{c}") for c in COLUMNS}), updates)
+    if inserts:
+        conn.execute(rollup_table.insert(), inserts)
+
+
+# -------- Metrics --------
+def _hours(seconds, count):
+    return round(seconds / count / 3600, 2) if count else None
+
+
+def _summaries(states):
+    """Per-metric figures from {state: {column: total}} for one bucket or key."""
+    done = states.get("done", {})
+    return {
+        "throughput": {"done": done.get("entered", 0)},
+        "lead_time": {"done": done.get("entered", 0),
+                      "lead_hours": _hours(done.get("lead_seconds", 0), done.get("lead_count", 0)),
+                      "cycle_hours": _hours(done.get("cycle_seconds", 0), done.get("cycle_count", 0))},
+        "time_in_state": {"states": {s: {"exits": t["exited"], "avg_hours": _hours(t["state_seconds"], t["timed"])}
+                                     for s, t in states.items() if t["exited"]}},
+    }
+
+
+def _totals(into, state, row):
+    t = into.setdefault(state, dict.fromkeys(COLUMNS, 0))
+    for c in COLUMNS:
+        t[c] += row[c] or 0
+
+
+def _window(grain, days, now=None):
+    """Bucket starts covering the last ``days`` days up to the current bucket."""
+    end = _floor(now or datetime.utcnow(), grain)
+    start = _floor(end - timedelta(days=days), grain) + GRAINS[grain]
+    buckets = []
+    while start <= end:
+        buckets.append(start)
+        start += GRAINS[grain]
+    return buckets
+
+
+def live_wip(dim, key=None):
+    """{key: {state: count}} for tasks currently in WIP_STATES."""
+    if dim == "customer":
+        key_col = Project.customer
+    elif dim in ("user", "machine"):
+        key_col = getattr(TaskAssignment, f"{dim}_id")
+    elif dim == "project":
+        key_col = Task.project_id
+    else:
+        key_col = literal("")
+    q = select(key_col, Task.state, func.count(Task.id)).where(Task.state.in_(WIP_STATES))
+    if dim == "customer":
+        q = q.join(Project, Project.id == Task.project_id)
+    elif dim in ("user", "machine"):
+        q = q.join(TaskAssignment, TaskAssignment.task_id == Task.id)
+    if key is not None and dim != "all":
+        q = q.where(key_col == (key if dim == "customer" else int(key)))
+    out = {}
+    for k, state, count in db.session.execute(q.group_by(key_col, Task.state)):
+        if k is not None:
+            out.setdefault(str(k), {})[state] = count
+    return out
+
+
+def series(metric, dim="all", key="", grain="day", days=90):
+    """[{bucket, ...metric figures}] oldest first for one dimension key."""
+    buckets = _window(grain, days)
+    flows = {b: {} for b in buckets}
+    q = (select(rollup_table)
+         .where(rollup_table.c.grain == ("hour" if grain == "hour" else "day"), rollup_table.c.dim == dim,
+                rollup_table.c.key == (key or ""), rollup_table.c.bucket >= buckets[0]))
+    for row in db.session.execute(q).mappings():
+        b = _floor(row["bucket"], grain)
+        if b in flows:
+            _totals(flows[b], row["state"], row)
+    if metric != "wip":
+        return [{"bucket": b.isoformat(), **_summaries(flows[b])[metric]} for b in buckets]
+    # Walk back from the live counts: the level at the end of a bucket is now minus the net flow since
+    level = dict.fromkeys(WIP_STATES, 0)
+    level.update(live_wip(dim, key).get(key or "", {}))
+    out = []
+    for b in reversed(buckets):
+        out.append({"bucket": b.isoformat(), "wip": sum(level.values()), "states": dict(level)})
+        for s in WIP_STATES:
+            t = flows[b].get(s)
+            if t:
+                level[s] -= t["entered"] - t["exited"]
+    return out[::-1]
+
+
+def breakdown(metric, dim, days=90, limit=MAX_ROWS):
+    """Per-key figures over the last ``days`` days (WIP: current), biggest first."""
+    if metric == "wip":
+        rows = [{"key": k, "wip": sum(states.values()), "states": states} for k, states in live_wip(dim).items()]
+        rows.sort(key=lambda r: -r["wip"])
+    else:
+        start = _window("day", days)[0]
+        per_key = {}
+        q = (select(rollup_table.c.key, rollup_table.c.state, *(func.sum(rollup_table.c[c]).label(c) for c in COLUMNS))
+             .where(rollup_table.c.grain == "day", rollup_table.c.dim == dim, rollup_table.c.bucket >= start)
+             .group_by(rollup_table.c.key, rollup_table.c.state))
+        for row in db.session.execute(q).mappings():
+            _totals(per_key.setdefault(row["key"], {}), row["state"], row)
+        rows = []
+        for k, states in per_key.items():
+            figures = _summaries(states)[metric]
+            if metric == "throughput":
+                figures["per_week"] = round(figures["done"] * 7 / days, 2)
+            rows.append({"key": k, **figures})
+        if metric == "time_in_state":
+            rows.sort(key=lambda r: -sum(s["exits"] for s in r["states"].values()))
+        else:
+            rows.sort(key=lambda r: -r["done"])
+    rows = rows[:limit]
+    names = labels(dim, [r["key"] for r in rows])
+    for r in rows:
+        r["label"] = names.get(r["key"], r["key"])
+    return rows
+
+
+def labels(dim, keys):
+    """Display names for dimension keys (project code, user / machine name)."""
+    model, col = {"project": (Project, Project.code), "user": (User, User.name),
+                  "machine": (Machine, Machine.name)}.get(dim, (None, None))
+    ids = [int(k) for k in keys if k.isdigit()]
+    if model is None or not ids:
+        return {}
+    return {str(i): name for i, name in db.session.execute(select(model.id, col).where(model.id.in_(ids)))}
+
+
+def status():
+    mark = high_water_mark()
+    last = db.session.execute(select(func.max(audit_table.c.id))).scalar() or 0
+    return {"audit_id": mark, "behind": last > mark}
@@ -1,14 +1,27 @@
-import os, json, argparse, io
+import os, io, json, argparse
 from datetime import datetime, date, timedelta
 from dotenv import load_dotenv
-from flask import Flask, render_template, request, redirect, url_for, flash, jsonify, send_file
+from flask import Flask, Response, render_template, request, redirect, url_for, flash, jsonify, make_response, stream_with_context
 from flask_login import LoginManager, login_user, logout_user, login_required, current_user
-from werkzeug.security import generate_password_hash, check_password_hash
-from flask_socketio import SocketIO, emit
-from io import StringIO
-import csv
 
-from models import db, User, Machine, Project, Task, TaskAssignment, Audit, Comment, to_date
+from models import db, User, Machine, Project, Task, TaskAssignment, Audit, Comment, TASK_STATES, MACHINE_STATUSES, to_date
+import analytics
+import archive
+import audit
+import auth
+import bulk
+import changelog
+import comments
+import dashboard_data
+import database
+import exports
+import imports
+import migrations
+import profiling
+import realtime
+import rollups
+import scheduling
+import search
 
 # ----------------------
 # App & Config
@@ -20,8 +33,20 @@ def create_app():
     db_url = os.getenv("DATABASE_URL", "sqlite:///machine_shop.db")
     app.config["SQLALCHEMY_DATABASE_URI"] = db_url
     app.config["SQLALCHEMY_TRACK_MODIFICATIONS"] = False
+    database.configure(app)  # DB_POOL_*, SQLITE_*, DATABASE_REPLICA_URL
+    app.config["AUDIT_MODE"] = os.getenv("AUDIT_MODE", "inline")  # inline | background
+    app.config["AUDIT_QUEUE_SIZE"] = int(os.getenv("AUDIT_QUEUE_SIZE", "10000"))
+    app.config["AUDIT_BATCH_SIZE"] = int(os.getenv("AUDIT_BATCH_SIZE", "500"))
+    app.config["ANALYTICS_REFRESH_SECONDS"] = float(os.getenv("ANALYTICS_REFRESH_SECONDS", "60"))
+    app.config["ANALYTICS_REFRESH_ROWS"] = int(os.getenv("ANALYTICS_REFRESH_ROWS", "5000"))  # per-request catch-up cap
 
     db.init_app(app)
+    database.init_app(app, db)
+    audit.init_app(app)
+    auth.init_app(app)  # USER_CACHE_TTL, PASSWORD_HASH_METHOD, LOGIN_CONCURRENCY, LOGIN_QUEUE_TIMEOUT
+    archive.init_app(app)  # AUDIT_RETENTION_DAYS, ARCHIVE_PROJECT_BATCH, ARCHIVE_AUDIT_BATCH, ARCHIVE_PAUSE_SECONDS
+    changelog.init_app(app)  # SYNC_MAX_CHANGES, SYNC_SETTLE_SECONDS, SYNC_RETENTION_DAYS
+    scheduling.init_app(app)  # SHOP_TIMEZONE
 
     # Auth
     login_manager = LoginManager()
@@ -30,10 +55,19 @@ def create_app():
 
     @login_manager.user_loader
     def load_user(user_id):
-        return db.session.get(User, int(user_id))
+        return auth.load_user(int(user_id))
 
     # SocketIO
-    socketio = SocketIO(app, cors_allowed_origins="*", async_mode="eventlet")
+    app.config["SOCKETIO_ASYNC_MODE"] = os.getenv("SOCKETIO_ASYNC_MODE", "eventlet")
+    app.config["SOCKETIO_MESSAGE_QUEUE"] = os.getenv("SOCKETIO_MESSAGE_QUEUE")  # see realtime.py
+    app.config["SOCKETIO_COALESCE_MS"] = int(os.getenv("SOCKETIO_COALESCE_MS", "50"))  # per-room burst window
+    socketio = realtime.create_socketio(app)
+
+    # Opt-in per-request SQL/template/emit instrumentation (PROFILING=1)
+    app.config["PROFILING"] = os.getenv("PROFILING", "0") == "1"
+    app.config["PROFILING_SERVER_TIMING"] = os.getenv("PROFILING_SERVER_TIMING", "0") == "1"
+    app.config["SLOW_REQUEST_MS"] = int(os.getenv("SLOW_REQUEST_MS", "500"))
+    profiling.init_app(app, socketio)
 
     # ------------- Routes -------------
     @app.route("/login", methods=["GET", "POST"])
@@ -41,8 +75,15 @@ def create_app():
         if request.method == "POST":
             email = request.form.get("email", "").strip().lower()
             password = request.form.get("password", "")
-            user = User.query.filter_by(email=email).first()
-            if user and check_password_hash(user.password_hash, password):
+            try:
+                user = auth.authenticate(email, password)
+            except auth.LoginBusy:
+                flash("Too many sign-ins at once, please try again in a few seconds.", "error")
+                resp = make_response(render_template("login.html"), 503)
+                resp.headers["Retry-After"] = "5"
+                return resp
+            if user:
+                db.session.commit()  # keeps a rehashed password
                 login_user(user)
                 return redirect(url_for("dashboard"))
             flash("Invalid credentials", "error")
@@ -56,115 +97,107 @@ def create_app():
 
     @app.route("/")
     @login_required
+    @database.replica_reads
     def dashboard():
         # Optional per-user filter
-        try:
-            filter_user_id = int(request.args.get('user')) if request.args.get('user') else None
-        except Exception:
-            filter_user_id = None
-
-        # Load tasks & assignments for Kanban (optionally filtered by user)
-        base_q = Task.query.join(Project).filter(Project.status != "archived")
-        if filter_user_id:
-            base_q = base_q.join(TaskAssignment).filter(TaskAssignment.user_id == filter_user_id)
-        tasks = base_q.all()
-
-        assignments = {}
-        for t in tasks:
-            assignments[t.id] = TaskAssignment.query.filter_by(task_id=t.id).all()
+        filter_user_id = _filter_user_id()
+        sync_version = changelog.version()  # before the board is read; app.js resyncs from it
+
+        # First page of each Kanban column (optionally filtered by user); the rest loads on scroll
+        columns = {}
+        for state in TASK_STATES:
+            tasks, next_cursor = dashboard_data.kanban_column(state, filter_user_id)
+            columns[state] = {"tasks": tasks, "next": next_cursor}
+        counts = dashboard_data.kanban_counts(filter_user_id)
         # For workload widget (est hours per user, for open tasks)
-        open_tasks = [t for t in tasks if t.state != "done"]
-        workload = {}
-        for t in open_tasks:
-            tas = TaskAssignment.query.filter_by(task_id=t.id).all()
-            for ta in tas:
-                if ta.user:
-                    workload.setdefault(ta.user.name, 0.0)
-                    workload[ta.user.name] += (t.est_hours or 0.0)
-        # Due soon (3 days)
-        today = date.today()
-        due_soon = Task.query.filter(Task.due_date != None, Task.due_date <= today + timedelta(days=3), Task.state != "done").order_by(Task.due_date.asc()).limit(20).all()
-        blocked = Task.query.filter_by(state="blocked").order_by(Task.priority.asc()).all()
+        workload_rows = dashboard_data.workload(filter_user_id)
+        due_soon = dashboard_data.due_soon()
+        blocked, blocked_next = dashboard_data.blocked_page()
 
         users = User.query.order_by(User.name.asc()).all()
         # --- Project progress for initial render ---
-        projects_all = Project.query.order_by(Project.created_at.desc()).all()
-        progress = []
-        for p in projects_all:
-            total = len(p.tasks)
-            done = sum(1 for t in p.tasks if t.state == "done")
-            pct = int(round((done / total) * 100)) if total else 0
-            progress.append({
-                "id": p.id,
-                "code": p.code,
-                "title": p.title,
-                "done": done,
-                "total": total,
-                "pct": pct,
-            })
-
-        return render_template("dashboard.html", tasks=tasks, assignments=assignments, workload=workload, due_soon=due_soon, blocked=blocked, users=users, filter_user_id=filter_user_id, progress=progress)
+        progress = dashboard_data.project_progress()
+
+        return render_template("dashboard.html", columns=columns, counts=counts, workload_rows=workload_rows, due_soon=due_soon, blocked=blocked, users=users, filter_user_id=filter_user_id, progress=progress, sync_version=sync_version, blocked_next=blocked_next)
         
+    @app.route("/dashboard/columns/<state>.json")
+    @login_required
+    @database.replica_reads
+    def dashboard_column_json(state):
+        if state not in TASK_STATES:
+            return jsonify({"error": "unknown state"}), 404
+        try:
+            limit = max(1, min(int(request.args.get("limit") or dashboard_data.KANBAN_PAGE_SIZE), 200))
+            tasks, next_cursor = dashboard_data.kanban_column(state, _filter_user_id(), request.args.get("cursor") or None, limit)
+        except ValueError:
+            return jsonify({"error": "bad cursor or limit"}), 400
+        return jsonify({"items": [dashboard_data.card(t) for t in tasks], "next": next_cursor})
+
     @app.route("/dashboard/widgets")
     @login_required
+    @database.replica_reads
     def dashboard_widgets():
         # same filtering logic as dashboard
+        filter_user_id = _filter_user_id()
+        def render():
+            blocked, blocked_next = dashboard_data.blocked_page()
+            return render_template("_dashboard_widgets.html", due_soon=dashboard_data.due_soon(), blocked=blocked, blocked_next=blocked_next, filter_user_id=filter_user_id)
+        return _conditional(render)
+
+    @app.route("/dashboard/blocked.json")
+    @login_required
+    @database.replica_reads
+    def dashboard_blocked_json():
+        # The blocked widget shows BLOCKED_LIMIT tasks; ?cursor=<next> pages through the rest
         try:
-            filter_user_id = int(request.args.get('user')) if request.args.get('user') else None
-        except Exception:
-            filter_user_id = None
-        base_q = Task.query.join(Project).filter(Project.status != "archived")
-        if filter_user_id:
-            base_q = base_q.join(TaskAssignment).filter(TaskAssignment.user_id == filter_user_id)
-        tasks = base_q.all()
-
-        # assignments (for avatar initials in blocked list if needed)
-        assignments = {}
-        for t in tasks:
-            assignments[t.id] = TaskAssignment.query.filter_by(task_id=t.id).all()
-
-        # workload from open tasks only
-        open_tasks = [t for t in tasks if t.state != "done"]
-        workload = {}
-        for t in open_tasks:
-            tas = TaskAssignment.query.filter_by(task_id=t.id).all()
-            for ta in tas:
-                if ta.user:
-                    workload.setdefault(ta.user.name, 0.0)
-                    workload[ta.user.name] += (t.est_hours or 0.0)
-
-        # due soon / blocked
-        from datetime import date, timedelta
-        today = date.today()
-        due_soon = Task.query.filter(Task.due_date != None, Task.due_date <= today + timedelta(days=3), Task.state != "done").order_by(Task.due_date.asc()).limit(20).all()
-        blocked = Task.query.filter_by(state="blocked").order_by(Task.priority.asc()).all()
-
-        return render_template("_dashboard_widgets.html", due_soon=due_soon, blocked=blocked, filter_user_id=filter_user_id)
-
-
-    @app.route("/projects", methods=["GET", "POST"])
+            tasks, next_cursor = dashboard_data.blocked_page(request.args.get("cursor") or None)
+        except ValueError:
+            return jsonify({"error": "bad cursor"}), 400
+        return jsonify({"items": [dashboard_data.task_item(t) for t in tasks], "next": next_cursor})
+
+
+    @app.route("/projects")
     @login_required
+    @database.replica_reads
     def projects():
-        if request.method == "POST":
-            code = request.form.get("code").strip()
-            title = request.form.get("title").strip()
-            customer = request.form.get("customer", "").strip()
-            rev = request.form.get("rev", "").strip()
-            due_date = to_date(request.form.get("due_date"))
-            priority = int(request.form.get("priority") or 3)
-            p = Project(code=code, title=title, customer=customer, rev=rev, due_date=due_date, priority=priority, created_by=current_user.id)
-            db.session.add(p)
-            db.session.commit()
-            _audit("project", p.id, "create", {"code": code, "title": title})
-            return redirect(url_for("projects"))
-        items = Project.query.order_by(Project.created_at.desc()).all()
-        return render_template("projects.html", projects=items)
+        search = (request.args.get("q") or "").strip()
+        sort = request.args.get("sort", "created")
+        direction = "asc" if request.args.get("dir") == "asc" else "desc"
+        try:
+            page = max(1, int(request.args.get("page") or 1))
+        except ValueError:
+            page = 1
+        sync_version = changelog.version()
+        rows, total = dashboard_data.projects_page(search, sort, direction, page)
+        pages = max(1, -(-total // dashboard_data.PROJECTS_PER_PAGE))
+        return render_template("projects.html", rows=rows, total=total, page=page, pages=pages,
+                               search=search, sort=sort, direction=direction, sync_version=sync_version)
+
+    @app.route("/projects", methods=["POST"])
+    @login_required
+    def create_project():
+        code = request.form.get("code").strip()
+        title = request.form.get("title").strip()
+        customer = request.form.get("customer", "").strip()
+        rev = request.form.get("rev", "").strip()
+        due_date = to_date(request.form.get("due_date"))
+        priority = int(request.form.get("priority") or 3)
+        p = Project(code=code, title=title, customer=customer, rev=rev, due_date=due_date, priority=priority, created_by=current_user.id)
+        db.session.add(p)
+        db.session.flush()
+        _audit("project", p.id, "create", {"code": code, "title": title})
+        db.session.commit()
+        return redirect(url_for("projects"))
 
     @app.route("/projects/<int:pid>", methods=["GET", "POST"])
     @login_required
     def project_detail(pid):
         p = db.session.get(Project, pid)
         if not p:
+            # Moved to the archive: shown read-only
+            p, tasks = archive.load_project(pid) if request.method == "GET" else (None, [])
+            if p:
+                return render_template("project_detail.html", project=p, tasks=tasks, archived=True)
             flash("Project not found", "error")
             return redirect(url_for("projects"))
         if request.method == "POST":
@@ -177,8 +210,9 @@ def create_app():
             due_date = to_date(request.form.get("due_date"))
             t = Task(project_id=p.id, title=title, description=description, state=state, priority=priority, est_hours=est_hours, due_date=due_date, created_by=current_user.id)
             db.session.add(t)
-            db.session.commit()
+            db.session.flush()
             _audit("task", t.id, "create", {"title": title, "project_id": p.id})
+            db.session.commit()
             return redirect(url_for("project_detail", pid=pid))
 
         tasks = Task.query.filter_by(project_id=p.id).order_by(Task.created_at.desc()).all()
@@ -193,6 +227,7 @@ def create_app():
         if not t:
             return "Not Found", 404
         old = {"state": t.state, "priority": t.priority, "due_date": str(t.due_date) if t.due_date else None, "title": t.title}
+        before = {"state": t.state, "due_date": t.due_date}
         if request.method == "PATCH":
             data = request.get_json(force=True, silent=True) or {}
             changed = {}
@@ -208,9 +243,9 @@ def create_app():
             if "due_date" in data:
                 t.due_date = to_date(data["due_date"])
                 changed["due_date"] = str(t.due_date) if t.due_date else None
-            db.session.commit()
             _audit("task", t.id, "update", {"before": old, "after": changed})
-            socketio.emit("task_updated", {"id": t.id, **changed})
+            db.session.commit()
+            _publish([t], [{"id": t.id, **changed}], dashboard_data.task_delta(t, before))
             return "", 204
         else:
             # HTML form submit (edit minimal fields)
@@ -218,9 +253,9 @@ def create_app():
             t.state = request.form.get("state", t.state)
             t.priority = int(request.form.get("priority", t.priority))
             t.due_date = to_date(request.form.get("due_date")) or t.due_date
-            db.session.commit()
             _audit("task", t.id, "update", {"before": old, "after": {"state": t.state}})
-            socketio.emit("task_updated", {"id": t.id, "state": t.state})
+            db.session.commit()
+            _publish([t], [{"id": t.id, "state": t.state}], dashboard_data.task_delta(t, before))
             return redirect(request.referrer or url_for("dashboard"))
 
     @app.route("/tasks/<int:tid>/assign", methods=["POST"])
@@ -245,8 +280,9 @@ def create_app():
                 db.session.add(ta)
                 created += 1
         if created:
-            db.session.commit()
             _audit("task", t.id, "assign", {"user_ids": user_ids, "machine_id": machine_id})
+            db.session.commit()
+            _emit_assignees(t)
         return redirect(request.referrer or url_for("project_detail", pid=t.project_id))
 
     @app.route("/tasks/<int:tid>/assignments/<int:aid>/delete", methods=["POST"])
@@ -257,11 +293,176 @@ def create_app():
         ta = db.session.get(TaskAssignment, aid)
         if not ta or ta.task_id != t.id:
             return "Not Found", 404
+        removed_user_id = ta.user_id
         db.session.delete(ta)
-        db.session.commit()
         _audit("task", t.id, "unassign", {"assignment_id": aid})
+        db.session.commit()
+        _emit_assignees(t, removed_user_id)
         return redirect(request.referrer or url_for("project_detail", pid=t.project_id))
 
+    # -------- Bulk operations --------
+    @app.route("/tasks/bulk", methods=["POST"])
+    @login_required
+    def bulk_update_tasks():
+        # {"tasks": [{"id", ...changes}]} or {"ids": [...], "set": {...changes}}
+        data = request.get_json(force=True, silent=True) or {}
+        items = data.get("tasks") if isinstance(data, dict) else data
+        if items is None and isinstance(data, dict) and "ids" in data:
+            items = [{**(data.get("set") or {}), "id": i} for i in data.get("ids") or []]
+        if not isinstance(items, list):
+            return jsonify({"errors": [{"row": None, "field": "tasks", "error": "expected a list"}]}), 400
+        tasks, befores, removed, changes, errors = bulk.update_tasks(items, actor_id=current_user.id)
+        if errors:
+            return jsonify({"errors": errors}), 400
+        ids = [t.id for t in tasks]
+        db.session.commit()
+        _emit_bulk(ids, befores, removed, changes)
+        return jsonify({"updated": len(ids)})
+
+    @app.route("/projects/<int:pid>/tasks/bulk", methods=["POST"])
+    @login_required
+    def bulk_create_tasks(pid):
+        # {"tasks": [{"title", ...}], "skip_invalid": false}; errors are reported per row
+        p = db.session.get(Project, pid)
+        if not p:
+            return jsonify({"errors": [{"row": None, "field": "project", "error": "not found"}]}), 404
+        data = request.get_json(force=True, silent=True) or {}
+        items = data.get("tasks") if isinstance(data, dict) else data
+        if not isinstance(items, list):
+            return jsonify({"errors": [{"row": None, "field": "tasks", "error": "expected a list"}]}), 400
+        skip_invalid = isinstance(data, dict) and bool(data.get("skip_invalid"))
+        ids, errors = bulk.create_tasks(p, items, actor_id=current_user.id, skip_invalid=skip_invalid)
+        if not ids:
+            return jsonify({"created": [], "errors": errors}), 400
+        db.session.commit()
+        _emit_bulk(ids)
+        return jsonify({"created": ids, "errors": errors}), 201
+
+    @app.route("/import/<kind>", methods=["POST"])
+    @login_required
+    def import_rows(kind):
+        # Multipart "file" upload or a raw CSV / JSON body; ?format=csv|json overrides the guess
+        if current_user.role not in ("manager", "admin"):
+            return jsonify({"error": "forbidden"}), 403
+        if kind not in imports.KINDS:
+            return jsonify({"error": f"kind must be one of {', '.join(imports.KINDS)}"}), 404
+        upload = request.files.get("file")
+        stream = upload.stream if upload else request.stream
+        fmt = request.args.get("format") or imports.guess_format(
+            upload.filename if upload else "", "json" if request.mimetype.endswith("json") else "csv")
+        try:
+            chunk_size = int(request.args.get("chunk_size") or imports.CHUNK_SIZE)
+            commit_every = int(request.args.get("commit_every") or imports.COMMIT_EVERY)
+        except ValueError:
+            return jsonify({"error": "chunk_size and commit_every must be integers"}), 400
+        text = io.TextIOWrapper(stream, encoding="utf-8-sig", newline="")
+        try:
+            # Stops early on unreadable input or a refused write; "aborted" says where
+            report = imports.import_file(text, kind, fmt, chunk_size=max(chunk_size, 1),
+                                         commit_every=commit_every, actor_id=current_user.id)
+        finally:
+            text.detach()
+        if report["inserted"]:
+            socketio.emit("dashboard_changed", {"kind": kind, "inserted": report["inserted"]},
+                          to=[realtime.DASHBOARD, realtime.SHOP])
+        return jsonify(report), 422 if report.get("aborted") else 200
+
+    # -------- Machines & schedule --------
+    @app.route("/machines")
+    @login_required
+    def machines():
+        return render_template("machines.html", rows=scheduling.machine_load(), statuses=MACHINE_STATUSES)
+
+    @app.route("/machines/load.json")
+    @login_required
+    def machine_load_json():
+        days = request.args.get("days", type=int) or scheduling.LOAD_WINDOW_DAYS
+        return jsonify({"window_days": days, "machines": scheduling.machine_load(days=min(days, 90))})
+
+    @app.route("/machines/<int:mid>/schedule.json")
+    @login_required
+    def machine_schedule_json(mid):
+        entries = scheduling.machine_schedule(mid)
+        if entries is None:
+            return jsonify({"error": "not found"}), 404
+        offset = max(request.args.get("offset", type=int) or 0, 0)
+        limit = min(max(request.args.get("limit", type=int) or 100, 1), 500)
+        page = entries[offset:offset + limit]
+        info = {tid: (title, code) for tid, title, code in db.session.query(Task.id, Task.title, Project.code)
+                .join(Project, Project.id == Task.project_id).filter(Task.id.in_([e[0] for e in page]))}
+        items = [{"task_id": tid, "code": info.get(tid, ("", ""))[1], "title": info.get(tid, ("", ""))[0],
+                  "state": state, "start": scheduling.shop_isoformat(start) if start else None,
+                  "end": scheduling.shop_isoformat(end) if end else None, "late": late}
+                 for tid, start, end, late, state in page]
+        return jsonify({"total": len(entries), "offset": offset, "items": items})
+
+    @app.route("/machines/<int:mid>/status", methods=["POST"])
+    @login_required
+    def machine_status(mid):
+        m = db.session.get(Machine, mid)
+        if not m:
+            return "Not Found", 404
+        status = request.form.get("status")
+        if status not in MACHINE_STATUSES:
+            flash("Unknown machine status", "error")
+            return redirect(url_for("machines"))
+        if status != m.status:
+            _audit("machine", m.id, "update", {"before": {"status": m.status}, "after": {"status": status}})
+            m.status = status
+            db.session.commit()
+        return redirect(url_for("machines"))
+
+    # -------- Search --------
+    @app.route("/search")
+    @login_required
+    @database.replica_reads
+    def search_page():
+        q, kind, offset = _search_args()
+        items, next_offset, truncated = search.search(q, kind, offset) if q else ([], None, False)
+        return render_template("search.html", q=q, kind=kind, kinds=search.KINDS, items=items,
+                               offset=offset, next_offset=next_offset, page_size=search.PAGE_SIZE,
+                               truncated=truncated, rank_limit=search.RANK_LIMIT)
+
+    @app.route("/search.json")
+    @login_required
+    @database.replica_reads
+    def search_json():
+        q, kind, offset = _search_args()
+        limit = min(max(request.args.get("limit", type=int) or search.PAGE_SIZE, 1), 100)
+        items, next_offset, truncated = search.search(q, kind, offset, limit)
+        return jsonify({"items": [{**i, "snippet": str(i["snippet"])} for i in items], "next": next_offset,
+                        "truncated": truncated})
+
+    # -------- Analytics --------
+    @app.route("/analytics/<metric>.json")
+    @login_required
+    def analytics_json(metric):
+        # Without a key, dim=project/customer/user/machine lists every key's figures over the window
+        if metric not in analytics.METRICS:
+            return jsonify({"error": "unknown metric"}), 404
+        dim = request.args.get("dim", "all")
+        key = request.args.get("key")
+        grain = request.args.get("grain", "week" if metric == "throughput" else "day")
+        days = min(max(request.args.get("days", type=int) or 90, 1), analytics.MAX_DAYS)
+        if dim not in analytics.DIMENSIONS or grain not in analytics.GRAINS:
+            return jsonify({"error": "bad dim or grain"}), 400
+        if key and dim in ("project", "user", "machine") and not key.isdigit():
+            return jsonify({"error": "bad key"}), 400
+        if grain == "hour" and dim not in analytics.HOURLY_DIMENSIONS:
+            return jsonify({"error": "hourly figures are shop-wide only"}), 400
+        analytics.refresh_if_due()
+        out = {"metric": metric, "dim": dim, "days": days}
+        if dim != "all" and not key:
+            out["rows"] = analytics.breakdown(metric, dim, days)
+        else:
+            if grain == "hour":
+                days = out["days"] = min(days, 31)
+            out.update(key=key, grain=grain, series=analytics.series(metric, dim, key or "", grain, days))
+            if key:
+                out["label"] = analytics.labels(dim, [key]).get(key, key)
+        out["as_of"] = analytics.status()
+        return jsonify(out)
+
     @app.route("/users", methods=["GET", "POST"])
     @login_required
     def users():
@@ -273,10 +474,11 @@ def create_app():
             email = request.form.get("email").strip().lower()
             role = request.form.get("role", "engineer")
             password = request.form.get("password", "Password")
-            u = User(name=name, email=email, role=role, password_hash=generate_password_hash(password))
+            u = User(name=name, email=email, role=role, password_hash=auth.hash_password(password))
             db.session.add(u)
-            db.session.commit()
+            db.session.flush()
             _audit("user", u.id, "create", {"name": name, "email": email, "role": role})
+            db.session.commit()
             return redirect(url_for("users"))
         items = User.query.order_by(User.created_at.desc()).all()
         return render_template("users.html", users=items)
@@ -295,9 +497,9 @@ def create_app():
             flash("You cannot delete your own account while logged in.", "error")
             return redirect(url_for("users"))
         db.session.delete(u)
+        _audit("user", uid, "delete", {"id": uid})
         db.session.commit()
         flash(f"User {u.name} deleted", "info")
-        _audit("user", uid, "delete", {"id": uid})
         return redirect(url_for("users"))
 
     @app.route("/projects/<int:pid>/delete", methods=["POST"])
@@ -311,25 +513,72 @@ def create_app():
             flash("Project not found", "error")
             return redirect(url_for("projects"))
         db.session.delete(p)
+        _audit("project", pid, "delete", {"id": pid})
         db.session.commit()
         flash(f"Project {p.code} deleted", "info")
-        _audit("project", pid, "delete", {"id": pid})
         return redirect(url_for("projects"))
 
+    @app.route("/audit")
+    @login_required
+    def audit_history():
+        # Filters: entity_type, entity_id, actor, action, since, until, field, value
+        # Paging: ?cursor=<next from previous page>&limit=N, or ?stream=1 for NDJSON of the whole range
+        # Diffs carry user names, emails and role changes: managers and admins only
+        if current_user.role not in ("manager", "admin"):
+            return jsonify({"error": "forbidden"}), 403
+        args = request.args
+        try:
+            entity_id = int(args["entity_id"]) if args.get("entity_id") else None
+            actor_id = int(args["actor"]) if args.get("actor") else None
+            limit = max(1, min(int(args.get("limit") or 100), 1000))
+        except ValueError:
+            return jsonify({"error": "entity_id, actor and limit must be integers"}), 400
+        q = audit.history_query(
+            entity_type=args.get("entity_type") or None, entity_id=entity_id, actor_id=actor_id,
+            action=args.get("action") or None, since=_parse_dt(args.get("since")), until=_parse_dt(args.get("until")),
+            field=args.get("field") or None, value=args.get("value"),
+            cursor=audit.decode_cursor(args.get("cursor")),
+        )
+        if args.get("stream"):
+            def rows():
+                for a in db.session.scalars(q.execution_options(yield_per=1000)):
+                    yield json.dumps(audit.serialize(a)) + "\n"
+            return Response(stream_with_context(rows()), mimetype="application/x-ndjson")
+        items = db.session.scalars(q.limit(limit + 1)).all()
+        more = len(items) > limit
+        items = items[:limit]
+        return jsonify({
+            "items": [audit.serialize(a) for a in items],
+            "next": audit.encode_cursor(items[-1]) if more else None,
+        })
+
+    @app.route("/admin/audit-writer.json")
+    @login_required
+    def audit_writer_stats():
+        if current_user.role not in ("manager", "admin"):
+            return jsonify({"error": "forbidden"}), 403
+        writer = app.extensions.get("audit_writer")
+        return jsonify({"mode": app.config["AUDIT_MODE"], **(writer.stats() if writer else {})})
+
     # -------- Comments --------
     @app.route("/tasks/<int:tid>/comments.json")
     @login_required
     def task_comments_json(tid):
+        # Newest page first; ?cursor=<next> pages back through older comments and
+        # ?since=<last_id> returns only comments posted after it (call again while a full page comes back)
         t = db.session.get(Task, tid)
         if not t:
             return jsonify({"error":"not found"}), 404
-        items = Comment.query.filter_by(task_id=tid).order_by(Comment.created_at.asc()).all()
-        return jsonify([{
-            "id": c.id,
-            "user": c.user.name if c.user else "Unknown",
-            "body": c.body,
-            "created_at": c.created_at.strftime("%Y-%m-%d %H:%M")
-        } for c in items])
+        limit = request.args.get("limit", type=int) or comments.PAGE_SIZE
+        try:
+            items, cursor, last = comments.page(tid, request.args.get("cursor") or None,
+                                                request.args.get("since", type=int), limit)
+        except ValueError:
+            return jsonify({"error": "bad cursor"}), 400
+        resp = jsonify({"items": items, "next": cursor, "last_id": last})
+        resp.set_etag(f"{tid}-{last}-{request.query_string.decode() or '-'}")
+        resp.headers["Cache-Control"] = "private, no-cache"
+        return resp.make_conditional(request)
 
     @app.route("/tasks/<int:tid>/comment", methods=["POST"])
     @login_required
@@ -343,106 +592,162 @@ def create_app():
             return redirect(request.referrer or url_for("dashboard"))
         c = Comment(task_id=tid, user_id=current_user.id, body=body)
         db.session.add(c)
-        db.session.commit()
         _audit("task", tid, "comment", {"by": current_user.id})
+        db.session.commit()
         try:
-            app.socketio.emit("task_commented", {"task_id": tid, "by": current_user.name, "body": body})
+            # Ids only: clients fetch the new comment with comments.json?since=<their last id>
+            _publish([t], comments=[{"task_id": tid, "id": c.id, "by": current_user.name}])
         except Exception:
             pass
         return redirect(request.referrer or url_for("dashboard"))
 
     @app.route("/export/tasks.csv")
     @login_required
+    @database.replica_reads
     def export_tasks_csv():
-        si = StringIO()
-        writer = csv.writer(si, lineterminator='\n')
-        writer.writerow(["Project", "Task", "State", "Assignees", "Priority", "Est Hours", "Due Date", "Created"])
-        tasks = Task.query.order_by(Task.created_at.desc()).all()
-        for t in tasks:
-            assignees = ", ".join([ta.user.name for ta in TaskAssignment.query.filter_by(task_id=t.id).all() if ta.user])
-            writer.writerow([t.project.code if t.project else "", t.title, t.state, assignees, t.priority, t.est_hours, t.due_date or "", t.created_at.strftime("%Y-%m-%d %H:%M")])
-        data = si.getvalue().encode('utf-8')
-        bio = io.BytesIO(data)
-        bio.seek(0)
-        return send_file(
-            bio,
+        # Optional slices: ?project=<code>&state=<state>&assignee=<user id>&from=<date>&to=<date>
+        try:
+            assignee = int(request.args.get("assignee")) if request.args.get("assignee") else None
+        except ValueError:
+            assignee = None
+        query = exports.task_export_query(
+            project=request.args.get("project") or None,
+            state=request.args.get("state") or None,
+            assignee=assignee,
+            created_from=to_date(request.args.get("from")),
+            created_to=to_date(request.args.get("to")),
+            archived=archive.ready(),
+        )
+        filename = f"tasks_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv"
+        return Response(
+            stream_with_context(exports.iter_csv(query)),
             mimetype="text/csv",
-            as_attachment=True,
-            download_name=f"tasks_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv"
+            headers={"Content-Disposition": f"attachment; filename={filename}"},
         )
 
     @app.route("/dashboard/progress")
     @login_required
+    @database.replica_reads
     def dashboard_progress():
         # Compute per-project progress (overall, not filtered by user)
-        projs = Project.query.order_by(Project.created_at.desc()).all()
-        progress = []
-        for p in projs:
-            total = len(p.tasks)
-            done = sum(1 for t in p.tasks if t.state == "done")
-            pct = int(round((done / total) * 100)) if total else 0
-            progress.append({
-                "id": p.id,
-                "code": p.code,
-                "title": p.title,
-                "done": done,
-                "total": total,
-                "pct": pct
-            })
-        return render_template("_dashboard_progress.html", progress=progress)
+        return _conditional(lambda: render_template("_dashboard_progress.html", progress=dashboard_data.project_progress()))
+
+    @app.route("/sync")
+    @login_required
+    @database.replica_reads
+    def sync():
+        # ?since=<version>[&user=<id>]: compacted changes since that version, or a full snapshot (changelog.py)
+        resp = jsonify(changelog.sync(request.args.get("since", type=int), _filter_user_id()))
+        resp.headers["Cache-Control"] = "private, no-store"
+        return resp
 
     @app.route("/dashboard/progress.json")
     @login_required
+    @database.replica_reads
     def dashboard_progress_json():
-        projs = Project.query.order_by(Project.created_at.desc()).all()
-        out = []
-        for p in projs:
-            total = len(p.tasks)
-            done = sum(1 for t in p.tasks if t.state == "done")
-            pct = int(round((done / total) * 100)) if total else 0
-            out.append({"id": p.id, "code": p.code, "title": p.title, "done": done, "total": total, "pct": pct})
-        return jsonify(out)
+        return _conditional(lambda: jsonify(dashboard_data.project_progress()))
 
     @app.route("/dashboard/workload")
     @login_required
+    @database.replica_reads
     def dashboard_workload():
         # respect user filter if present
+        filter_user_id = _filter_user_id()
+        # Hours + Count per user over open tasks, sorted by hours desc
+        return _conditional(lambda: render_template("_dashboard_workload.html", workload_rows=dashboard_data.workload(filter_user_id), filter_user_id=filter_user_id))
+
+    # ------------- Helpers -------------
+    def _parse_dt(s):
+        if not s:
+            return None
         try:
-            filter_user_id = int(request.args.get('user')) if request.args.get('user') else None
+            return datetime.fromisoformat(s)
+        except ValueError:
+            d = to_date(s)
+            return datetime.combine(d, datetime.min.time()) if d else None
+
+    def _conditional(render):
+        # ETag = dashboard change counter + day (due-soon window) + query args;
+        # a matching If-None-Match is answered without reading any task data.
+        etag = f"{rollups.current_version()}-{date.today():%Y%m%d}-{request.query_string.decode() or '-'}"
+        if request.if_none_match.contains(etag):
+            resp = make_response("", 304)
+        else:
+            resp = make_response(render())
+        resp.set_etag(etag)
+        resp.headers["Cache-Control"] = "private, no-cache"
+        return resp
+
+    def _emit_assignees(t, removed_user_id=None):
+        # Workload changes only; the card itself stays in its column
+        assignees = [{"name": ta.user.name} for ta in t.assignments if ta.user]
+        removed = [removed_user_id] if removed_user_id else []
+        _publish([t], [{"id": t.id, "assignees": assignees}], dashboard_data.task_delta(t, user_ids=removed), removed)
+
+    def _emit_bulk(task_ids, befores=(), removed_user_ids=(), changes=None):
+        # One event for the whole batch; tasks reloaded in one query after the commit expired them
+        changes = changes or {}
+        tasks = Task.query.filter(Task.id.in_(task_ids)).all()
+        names = {}
+        reassigned = [tid for tid, c in changes.items() if c.get("assignees")]
+        if reassigned:
+            for tid, name in (db.session.query(TaskAssignment.task_id, User.name).join(User)
+                              .filter(TaskAssignment.task_id.in_(reassigned)).order_by(TaskAssignment.id)):
+                names.setdefault(tid, []).append({"name": name})
+        items = []
+        for tid, c in changes.items():
+            item = {"id": tid, **{k: v for k, v in c.items() if k != "assignees"}}
+            if c.get("assignees"):
+                item["assignees"] = names.get(tid, [])
+            items.append(item)
+        _publish(tasks, items, dashboard_data.tasks_delta(tasks, befores, removed_user_ids), removed_user_ids)
+
+    def _publish(tasks, items=(), delta=None, removed_user_ids=(), comments=()):
+        # Each room gets what its page shows (realtime.py): the unfiltered dashboard every
+        # card and the whole delta, SHOP the shop-wide widgets, project:<id> and user:<id>
+        # the cards and comment ids of their tasks (user rooms also the workload rows)
+        rooms = app.extensions["realtime"]
+        delta = delta or {}
+        if items or delta:
+            rooms.publish(realtime.DASHBOARD, items, delta)
+        shop = {k: delta[k] for k in realtime.SHOP_KEYS if k in delta}
+        if shop:
+            rooms.publish(realtime.SHOP, delta=shop)
+        project_of = {t.id: t.project_id for t in tasks}
+        users_of = {}
+        for tid, uid in (db.session.query(TaskAssignment.task_id, TaskAssignment.user_id)
+                         .filter(TaskAssignment.task_id.in_(project_of), TaskAssignment.user_id.isnot(None))):
+            users_of.setdefault(tid, set()).add(uid)
+        removed = set(removed_user_ids)
+        by_project = {}
+        by_user = {uid: ([], []) for uid in removed.union(*users_of.values())}
+        for i, (entries, key) in enumerate(((items, "id"), (comments, "task_id"))):
+            for e in entries:
+                by_project.setdefault(project_of[e[key]], ([], []))[i].append(e)
+                for uid in users_of.get(e[key], set()) | removed:
+                    by_user[uid][i].append(e)
+        for pid, (cards, posted) in by_project.items():
+            rooms.publish(realtime.project_room(pid), cards, comments=posted)
+        workload = {"workload": delta["workload"]} if delta.get("workload") else None
+        for uid, (cards, posted) in by_user.items():
+            if cards or posted or workload:
+                rooms.publish(realtime.user_room(uid), cards, workload, posted)
+
+    def _search_args():
+        kind = request.args.get("kind")
+        offset = max(request.args.get("offset", type=int) or 0, 0)
+        return (request.args.get("q") or "").strip(), kind if kind in search.KINDS else None, offset
+
+    def _filter_user_id():
+        try:
+            return int(request.args.get('user')) if request.args.get('user') else None
         except Exception:
-            filter_user_id = None
-
-        base_q = Task.query.join(Project).filter(Project.status != "archived")
-        if filter_user_id:
-            base_q = base_q.join(TaskAssignment).filter(TaskAssignment.user_id == filter_user_id)
-        tasks = base_q.all()
-
-        # Open tasks only for workload
-        open_tasks = [t for t in tasks if t.state != "done"]
-
-        # Hours + Count per user
-        workload_hours = {}
-        workload_counts = {}
-        for t in open_tasks:
-            tas = TaskAssignment.query.filter_by(task_id=t.id).all()
-            for ta in tas:
-                if ta.user:
-                    name = ta.user.name
-                    workload_hours[name] = workload_hours.get(name, 0.0) + (t.est_hours or 0.0)
-                    workload_counts[name] = workload_counts.get(name, 0) + 1
-
-        # Sort by hours desc
-        items = sorted(workload_hours.items(), key=lambda kv: kv[1], reverse=True)
-        rows = [(name, workload_counts.get(name, 0), hrs) for name, hrs in items]
-        return render_template("_dashboard_workload.html", workload_rows=rows, filter_user_id=filter_user_id)
+            return None
 
-    # ------------- Helpers -------------
     def _audit(entity_type, entity_id, action, diff_dict):
-        a = Audit(entity_type=entity_type, entity_id=entity_id, action=action,
-                  actor_id=current_user.id if current_user.is_authenticated else None,
-                  diff=json.dumps(diff_dict))
-        db.session.add(a)
-        db.session.commit()
+        # Part of the caller's unit of work: call before db.session.commit()
+        audit.record(entity_type, entity_id, action, diff_dict,
+                     actor_id=current_user.id if current_user.is_authenticated else None)
 
     # Expose socketio on app for run()
     app.socketio = socketio
@@ -453,15 +758,20 @@ def create_app():
 # ----------------------
 def init_db(app):
     with app.app_context():
-        db.drop_all()
-        db.create_all()
+        with db.engine.begin() as conn:
+            archive.create_schema(conn)
+        # The primary only: a replica is a copy of it (database.sync_sqlite_replica)
+        db.drop_all(bind_key=None)
+        db.create_all(bind_key=None)
+        with db.engine.begin() as conn:
+            migrations.stamp(conn)
+            search.create(conn)
 
 def seed_demo(app):
-    from werkzeug.security import generate_password_hash
     with app.app_context():
-        admin = User(name="Admin", email="admin@example.com", role="admin", password_hash=generate_password_hash("Password"))
-        eng = User(name="Alex Eng", email="alex@example.com", role="engineer", password_hash=generate_password_hash("Password"))
-        prog = User(name="Sam Prog", email="sam@example.com", role="programmer", password_hash=generate_password_hash("Password"))
+        admin = User(name="Admin", email="admin@example.com", role="admin", password_hash=auth.hash_password("Password"))
+        eng = User(name="Alex Eng", email="alex@example.com", role="engineer", password_hash=auth.hash_password("Password"))
+        prog = User(name="Sam Prog", email="sam@example.com", role="programmer", password_hash=auth.hash_password("Password"))
         db.session.add_all([admin, eng, prog])
 
         m1 = Machine(name="Haas VF2", type="Mill", status="available")
@@ -491,13 +801,76 @@ if __name__ == "__main__":
     parser = argparse.ArgumentParser()
     parser.add_argument("--initdb", action="store_true", help="Drop & create tables")
     parser.add_argument("--seed", action="store_true", help="Seed demo data")
+    parser.add_argument("--migrate", action="store_true", help="Apply pending schema migrations in place")
+    parser.add_argument("--check-indexes", action="store_true", help="EXPLAIN the hot dashboard queries (SQLite) and exit")
+    parser.add_argument("--reindex-audit", action="store_true", help="Backfill the audit field index and exit")
+    parser.add_argument("--rebuild-progress", action="store_true", help="Recompute project progress rollups and exit")
+    parser.add_argument("--verify-progress", action="store_true", help="Check project progress rollups for drift and exit")
+    parser.add_argument("--rebuild-search", action="store_true", help="Re-index projects, tasks and comments for search and exit")
+    parser.add_argument("--refresh-analytics", action="store_true", help="Process new audit rows into the analytics rollups and exit")
+    parser.add_argument("--rebuild-analytics", action="store_true", help="Recompute analytics facts and rollups from the whole audit log and exit")
+    parser.add_argument("--archive", action="store_true", help="Move archived projects and old audit rows to the archive tables and exit")
+    parser.add_argument("--prune-changelog", action="store_true", help="Drop change-log rows older than SYNC_RETENTION_DAYS and exit")
+    parser.add_argument("--sync-replica", action="store_true", help="Copy a SQLite primary onto its DATABASE_REPLICA_URL file and exit")
     args = parser.parse_args()
 
     app = create_app()
     if args.initdb:
         init_db(app)
+    if args.migrate:
+        with app.app_context():
+            for version, description in migrations.upgrade():
+                print(f"Applied migration {version}: {description}")
+    if args.check_indexes:
+        with app.app_context():
+            results = migrations.explain_hot_queries()
+        for name, plan, ok in results:
+            print(f"{'ok  ' if ok else 'SCAN'} {name}: {' | '.join(plan)}")
+        raise SystemExit(0 if all(ok for _, _, ok in results) else 1)
     if args.seed:
         seed_demo(app)
+    if args.reindex_audit:
+        with app.app_context():
+            print(f"Indexed changes for {audit.reindex_changes()} audit rows")
+        raise SystemExit(0)
+    if args.rebuild_progress:
+        with app.app_context():
+            print(f"Rebuilt progress for {rollups.rebuild_all()} projects")
+        raise SystemExit(0)
+    if args.verify_progress:
+        with app.app_context():
+            drift = rollups.verify()
+        for pid, col, stored, actual in drift:
+            print(f"project {pid}: {col} stored={stored} actual={actual}")
+        print("Progress rollups OK" if not drift else f"{len(drift)} drifted counters")
+        raise SystemExit(1 if drift else 0)
+    if args.refresh_analytics or args.rebuild_analytics:
+        with app.app_context():
+            added = analytics.rebuild() if args.rebuild_analytics else analytics.refresh()
+            print(f"Added {added} task transitions; audit high-water mark {analytics.high_water_mark()}")
+        raise SystemExit(0)
+    if args.archive:
+        with app.app_context():
+            moved = archive.run()
+        print(f"Archived {moved['projects']} projects and {moved['audits']} audit rows")
+        raise SystemExit(0)
+    if args.prune_changelog:
+        with app.app_context():
+            removed = changelog.prune()
+        print(f"Pruned {removed} change-log rows")
+        raise SystemExit(0)
+    if args.sync_replica:
+        replica = os.getenv("DATABASE_REPLICA_URL")
+        if not replica or not replica.startswith("sqlite") or not app.config["SQLALCHEMY_DATABASE_URI"].startswith("sqlite"):
+            raise SystemExit("--sync-replica needs SQLite DATABASE_URL and DATABASE_REPLICA_URL")
+        print(f"Replica {database.sync_sqlite_replica(app.config['SQLALCHEMY_DATABASE_URI'], replica)} synced")
+        raise SystemExit(0)
+    if args.rebuild_search:
+        with app.app_context():
+            count = search.rebuild() if search.enabled() else None
+            db.session.commit()
+        print(f"Indexed {count} rows for search" if count is not None else "No search index (run --migrate on SQLite)")
+        raise SystemExit(0)
 
     # Run with eventlet for Socket.IO
     app.socketio.run(app, host="0.0.0.0", port=5000, debug=True)
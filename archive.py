@@ -0,0 +1,214 @@
+import os, time
+from datetime import datetime, timedelta
+from flask import current_app
+from sqlalchemy import func, inspect, select, text
+
+from models import (db, User, Machine, Project, ProjectProgress, Task, TaskAssignment, Comment, Audit, AuditChange,
+                    archive_project, archive_task, archive_task_assignment, archive_comment, archive_audit,
+                    archive_audit_change)
+from database import ARCHIVE
+import analytics
+import changelog
+import comments
+import rollups
+import search
+
+# ----------------------
+# Hot/cold archival
+# ----------------------
+# run() moves archived projects -- with their tasks, assignments and
+# comments -- and audit rows older than AUDIT_RETENTION_DAYS out of the live
+# tables into the cold copies in models.py (the "archive" schema: an
+# ATTACHed SQLite file, see database.py, or a real schema elsewhere), so the
+# live tables and their indexes only hold current work.
+#
+# Each batch is one short transaction that copies rows and then deletes
+# them from the live tables, followed by ARCHIVE_PAUSE_SECONDS so waiting
+# writers get the lock. A copy first clears any rows with the same ids, so a
+# batch interrupted between the two databases' commits is simply redone.
+# The newest row of each table stays live (SQLite hands out max(id) + 1 and
+# would otherwise reuse an archived id), and audit rows wait until
+# analytics has read them.
+#
+# Core deletes skip the flush hooks, so the progress rollup, search index,
+# comment cache and change log (as tombstones) are updated here. Archived
+# projects stay searchable; their tasks and comments leave the index.
+# project_detail and the CSV export read through to the archive.
+
+PROJECT_TABLES = ((Comment.__table__, archive_comment), (TaskAssignment.__table__, archive_task_assignment),
+                  (Task.__table__, archive_task), (Project.__table__, archive_project))
+AUDIT_TABLES = ((AuditChange.__table__, archive_audit_change), (Audit.__table__, archive_audit))
+ARCHIVE_TABLES = (archive_project, archive_task, archive_task_assignment, archive_comment, archive_audit,
+                  archive_audit_change)
+
+
+def init_app(app):
+    app.config.setdefault("AUDIT_RETENTION_DAYS", int(os.getenv("AUDIT_RETENTION_DAYS", "365")))
+    app.config.setdefault("ARCHIVE_PROJECT_BATCH", int(os.getenv("ARCHIVE_PROJECT_BATCH", "50")))
+    app.config.setdefault("ARCHIVE_AUDIT_BATCH", int(os.getenv("ARCHIVE_AUDIT_BATCH", "5000")))
+    app.config.setdefault("ARCHIVE_PAUSE_SECONDS", float(os.getenv("ARCHIVE_PAUSE_SECONDS", "0.05")))
+
+
+def _state():
+    return current_app.extensions.setdefault("archive", {})
+
+
+def ready(conn=None):
+    """True when the archive tables exist; checked once per process."""
+    state = _state()
+    if "ready" not in state:
+        conn = conn or db.session.connection()
+        state["ready"] = inspect(conn).has_table(archive_project.name, schema=ARCHIVE)
+    return state["ready"]
+
+
+def create_schema(conn):
+    # SQLite ATTACHes it on connect (database.py)
+    if conn.dialect.name != "sqlite":
+        conn.execute(text(f"CREATE SCHEMA IF NOT EXISTS {ARCHIVE}"))
+
+
+def create(conn):
+    """Create the archive schema and tables."""
+    create_schema(conn)
+    for table in ARCHIVE_TABLES:
+        table.create(conn, checkfirst=True)
+    _state()["ready"] = True
+
+
+# -------- Moving rows --------
+def _move(conn, live, cold, where):
+    """Copy the live rows matching ``where`` into ``cold``, replacing same-id copies, then delete them; returns rows moved."""
+    ids = select(live.c.id).where(where)
+    conn.execute(cold.delete().where(cold.c.id.in_(ids)))
+    conn.execute(cold.insert().from_select([c.name for c in live.columns], select(live).where(where)))
+    return conn.execute(live.delete().where(where)).rowcount
+
+
+def _newest_projects(conn):
+    """Projects holding the newest project / task / assignment / comment row, kept live for one more run."""
+    task, assignment, comment = Task.__table__, TaskAssignment.__table__, Comment.__table__
+    newest = lambda t: select(func.max(t.c.id)).scalar_subquery()
+    tids = conn.execute(select(
+        newest(task),
+        select(assignment.c.task_id).where(assignment.c.id == newest(assignment)).scalar_subquery(),
+        select(comment.c.task_id).where(comment.c.id == newest(comment)).scalar_subquery())).one()
+    keep = set(conn.execute(select(task.c.project_id).where(task.c.id.in_([t for t in tids if t]))).scalars())
+    keep.add(conn.execute(select(func.max(Project.id))).scalar())
+    return keep
+
+
+def archive_projects(batch_size=None, pause=None, limit=None):
+    """Move archived projects and their tasks, assignments and comments; returns projects moved."""
+    cfg = current_app.config
+    batch_size = batch_size or cfg["ARCHIVE_PROJECT_BATCH"]
+    pause = cfg["ARCHIVE_PAUSE_SECONDS"] if pause is None else pause
+    task, comment = Task.__table__, Comment.__table__
+    moved = 0
+    while limit is None or moved < limit:
+        conn = db.session.connection()
+        keep = _newest_projects(conn)
+        pids = list(conn.execute(select(Project.id).where(Project.status == "archived", Project.id.notin_(keep))
+                                 .order_by(Project.id).limit(batch_size if limit is None
+                                                             else min(batch_size, limit - moved))).scalars())
+        if not pids:
+            break
+        task_projects = dict(conn.execute(select(task.c.id, task.c.project_id)
+                                          .where(task.c.project_id.in_(pids))).all())
+        tids = list(task_projects)
+        cids = list(conn.execute(select(comment.c.id).where(comment.c.task_id.in_(tids))).scalars()) if tids else []
+        in_tasks = task.c.project_id.in_(pids)
+        for live, cold in PROJECT_TABLES:
+            if live is Project.__table__:
+                where = live.c.id.in_(pids)
+            elif live is task:
+                where = in_tasks
+            else:
+                where = live.c.task_id.in_(select(task.c.id).where(in_tasks))
+            _move(conn, live, cold, where)
+        conn.execute(ProjectProgress.__table__.delete().where(ProjectProgress.project_id.in_(pids)))
+        for kind, ids in (("task", tids), ("comment", cids)):
+            for i in range(0, len(ids), 5000):
+                search.unindex(conn, kind, ids[i:i + 5000])
+        changelog.record(conn, "project", pids)
+        changelog.record(conn, "task", tids, task_projects)
+        changelog.record(conn, "comment", cids)
+        rollups._bump(conn, "dashboard")
+        db.session.commit()
+        comments.invalidate(tids)
+        moved += len(pids)
+        if pause:
+            time.sleep(pause)
+    return moved
+
+
+def archive_audits(retention_days=None, batch_size=None, pause=None):
+    """Move audit rows (and their field index) older than the retention window; returns rows moved."""
+    cfg = current_app.config
+    retention_days = cfg["AUDIT_RETENTION_DAYS"] if retention_days is None else retention_days
+    batch_size = batch_size or cfg["ARCHIVE_AUDIT_BATCH"]
+    pause = cfg["ARCHIVE_PAUSE_SECONDS"] if pause is None else pause
+    cutoff = datetime.utcnow() - timedelta(days=retention_days)
+    audit = Audit.__table__
+    moved = 0
+    while True:
+        conn = db.session.connection()
+        # Analytics parses audit rows past its high-water mark, so only rows it has seen may leave
+        upper = min(analytics.high_water_mark(conn), (conn.execute(select(func.max(audit.c.id))).scalar() or 1) - 1)
+        ids = list(conn.execute(select(audit.c.id).where(audit.c.at < cutoff, audit.c.id <= upper)
+                                .order_by(audit.c.at, audit.c.id).limit(batch_size)).scalars())
+        if not ids:
+            break
+        _move(conn, AuditChange.__table__, archive_audit_change, AuditChange.__table__.c.audit_id.in_(ids))
+        _move(conn, audit, archive_audit, audit.c.id.in_(ids))
+        db.session.commit()
+        moved += len(ids)
+        if pause:
+            time.sleep(pause)
+    return moved
+
+
+def run(pause=None):
+    """Archive projects, then audit rows; returns {"projects": n, "audits": n}."""
+    if not ready():
+        raise RuntimeError("archive tables missing; run `python app.py --migrate`")
+    return {"projects": archive_projects(pause=pause), "audits": archive_audits(pause=pause)}
+
+
+# -------- Read-through --------
+def load_project(pid):
+    """(Project, [Task]) for an archived job as transient, read-only objects; (None, []) if it isn't there either.
+
+    Tasks come newest first with ``assignments`` (and their live users and
+    machines) filled in, like the live project page.
+    """
+    if not ready():
+        return None, []
+    row = db.session.execute(select(archive_project).where(archive_project.c.id == pid)).mappings().first()
+    if row is None:
+        return None, []
+    tasks = [Task(**r) for r in db.session.execute(
+        select(archive_task).where(archive_task.c.project_id == pid)
+        .order_by(archive_task.c.created_at.desc())).mappings()]
+    links = db.session.execute(select(archive_task_assignment).where(
+        archive_task_assignment.c.task_id.in_([t.id for t in tasks]))).mappings().all() if tasks else []
+    users = {u.id: u for u in User.query.filter(User.id.in_({a["user_id"] for a in links}))} if links else {}
+    machines = {m.id: m for m in Machine.query.filter(Machine.id.in_({a["machine_id"] for a in links}))} if links else {}
+    by_task = {}
+    for a in links:
+        ta = TaskAssignment(**a)
+        ta.user, ta.machine = users.get(a["user_id"]), machines.get(a["machine_id"])
+        by_task.setdefault(a["task_id"], []).append(ta)
+    for t in tasks:
+        t.assignments = by_task.get(t.id, [])
+    return Project(**row), tasks
+
+
+def stats():
+    """Live vs archived row counts per table."""
+    out = {}
+    for live, cold in PROJECT_TABLES + AUDIT_TABLES:
+        out[live.name] = {"live": db.session.execute(select(func.count()).select_from(live)).scalar(),
+                          "archived": db.session.execute(select(func.count()).select_from(cold)).scalar()
+                          if ready() else 0}
+    return out
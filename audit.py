@@ -0,0 +1,267 @@
+import atexit, json, logging, queue, threading
+from datetime import datetime
+from flask import current_app, has_app_context
+from sqlalchemy import event, and_, or_, select
+
+from models import db, Audit, AuditChange, insert_ids
+
+log = logging.getLogger(__name__)
+
+# ----------------------
+# Audit pipeline
+# ----------------------
+# AUDIT_MODE=inline      Audit rows join the caller's transaction (default).
+# AUDIT_MODE=background  Rows are staged on the session and, once the caller
+#                        commits, handed to AuditWriter which batch-inserts
+#                        them from a worker thread. Rolled-back work never
+#                        reaches the queue.
+
+audit_table = Audit.__table__
+change_table = AuditChange.__table__
+
+
+def diff_changes(diff_dict):
+    """[(field, value)] an entry changed: the "after" side of updates, else scalar keys."""
+    if not isinstance(diff_dict, dict):
+        return []
+    fields = diff_dict.get("after") if isinstance(diff_dict.get("after"), dict) else diff_dict
+    out = []
+    for k, v in fields.items():
+        if isinstance(v, (dict, list)):
+            continue
+        out.append((k[:50], None if v is None else str(v)[:200]))
+    return out
+
+
+def init_app(app):
+    app.config.setdefault("AUDIT_MODE", "inline")
+    app.config.setdefault("AUDIT_QUEUE_SIZE", 10000)
+    app.config.setdefault("AUDIT_BATCH_SIZE", 500)
+    app.config.setdefault("AUDIT_FLUSH_INTERVAL", 0.5)
+    if app.config["AUDIT_MODE"] == "background":
+        writer = AuditWriter(app, max_queue=app.config["AUDIT_QUEUE_SIZE"],
+                             batch_size=app.config["AUDIT_BATCH_SIZE"],
+                             flush_interval=app.config["AUDIT_FLUSH_INTERVAL"])
+        app.extensions["audit_writer"] = writer
+        atexit.register(writer.close)
+
+
+def record(entity_type, entity_id, action, diff_dict, actor_id=None):
+    """Add one audit entry to the current unit of work; call before commit."""
+    row = {"entity_type": entity_type, "entity_id": entity_id, "action": action,
+           "actor_id": actor_id, "diff": json.dumps(diff_dict), "at": datetime.utcnow()}
+    changes = diff_changes(diff_dict)
+    if current_app.extensions.get("audit_writer"):
+        db.session.info.setdefault("pending_audits", []).append((row, changes))
+    else:
+        a = Audit(**row)
+        a.changes = [AuditChange(field=f, value=v, at=row["at"]) for f, v in changes]
+        db.session.add(a)
+
+
+def record_many(entries, actor_id=None):
+    """Add several (entity_type, entity_id, action, diff_dict) entries with one batch insert; call before commit."""
+    at = datetime.utcnow()
+    rows = [({"entity_type": et, "entity_id": eid, "action": action, "actor_id": actor_id,
+              "diff": json.dumps(diff_dict), "at": at}, diff_changes(diff_dict))
+            for et, eid, action, diff_dict in entries]
+    if not rows:
+        return
+    if current_app.extensions.get("audit_writer"):
+        db.session.info.setdefault("pending_audits", []).extend(rows)
+    else:
+        _insert(db.session.connection(), rows)
+
+
+def _insert(conn, rows):
+    # rows are (audit row dict, [(field, value)]) pairs
+    ids = insert_ids(conn, audit_table, [r for r, _ in rows])
+    changes = [{"audit_id": aid, "field": f, "value": v, "at": r["at"]}
+               for aid, (r, fields) in zip(ids, rows) for f, v in fields]
+    if changes:
+        conn.execute(change_table.insert(), changes)
+
+
+@event.listens_for(db.session, "after_commit")
+def _enqueue_committed(session):
+    rows = session.info.pop("pending_audits", None)
+    if rows and has_app_context():
+        current_app.extensions["audit_writer"].submit(rows)
+
+
+@event.listens_for(db.session, "after_soft_rollback")
+def _discard_rolled_back(session, previous_transaction):
+    session.info.pop("pending_audits", None)
+
+
+class AuditWriter:
+    """Bounded queue drained by one thread that inserts audit rows in batches."""
+
+    def __init__(self, app, max_queue=10000, batch_size=500, flush_interval=0.5, put_timeout=1.0):
+        self.app = app
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.put_timeout = put_timeout
+        self.queue = queue.Queue(maxsize=max_queue)
+        self.stats_lock = threading.Lock()
+        self.counters = {"enqueued": 0, "written": 0, "batches": 0, "failed": 0,
+                         "blocked_puts": 0, "sync_fallbacks": 0, "max_depth": 0}
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="audit-writer", daemon=True)
+        self._thread.start()
+
+    def _count(self, **incs):
+        with self.stats_lock:
+            for k, v in incs.items():
+                self.counters[k] += v
+
+    def submit(self, rows):
+        for row in rows:
+            try:
+                self.queue.put_nowait(row)
+            except queue.Full:
+                # Backpressure: wait briefly for the writer, then write inline
+                self._count(blocked_puts=1)
+                try:
+                    self.queue.put(row, timeout=self.put_timeout)
+                except queue.Full:
+                    self._count(sync_fallbacks=1)
+                    self._write([row])
+                    continue
+            self._count(enqueued=1)
+        depth = self.queue.qsize()
+        with self.stats_lock:
+            self.counters["max_depth"] = max(self.counters["max_depth"], depth)
+
+    def _drain(self, block):
+        batch = []
+        try:
+            batch.append(self.queue.get(timeout=self.flush_interval) if block else self.queue.get_nowait())
+            while len(batch) < self.batch_size:
+                batch.append(self.queue.get_nowait())
+        except queue.Empty:
+            pass
+        return batch
+
+    def _write(self, rows):
+        try:
+            with self.app.app_context():
+                with db.engine.begin() as conn:
+                    _insert(conn, rows)
+            self._count(written=len(rows), batches=1)
+        except Exception:
+            self._count(failed=len(rows))
+            log.exception("Failed to write %d audit rows", len(rows))
+
+    def _run(self):
+        while not self._stop.is_set():
+            batch = self._drain(block=True)
+            if batch:
+                self._write(batch)
+
+    def flush(self):
+        """Write everything queued so far from the calling thread."""
+        while True:
+            batch = self._drain(block=False)
+            if not batch:
+                return
+            self._write(batch)
+
+    def close(self, timeout=5.0):
+        self._stop.set()
+        self._thread.join(timeout)
+        self.flush()
+
+    def stats(self):
+        with self.stats_lock:
+            return {**self.counters, "depth": self.queue.qsize(), "capacity": self.queue.maxsize}
+
+
+# -------- History queries --------
+def history_query(entity_type=None, entity_id=None, actor_id=None, action=None,
+                  since=None, until=None, field=None, value=None, cursor=None):
+    """Audit rows newest first, ordered on (at, id) so pages can resume from a cursor.
+
+    With a ``field`` filter the walk happens on AuditChange's (field, value, at)
+    index instead, so both forms seek straight to the cursor.
+    """
+    q = select(Audit)
+    at_col, id_col = Audit.at, Audit.id
+    if field:
+        q = q.join(AuditChange, AuditChange.audit_id == Audit.id).where(AuditChange.field == field)
+        if value is not None:
+            q = q.where(AuditChange.value == value)
+        at_col, id_col = AuditChange.at, AuditChange.audit_id
+    if entity_type:
+        q = q.where(Audit.entity_type == entity_type)
+    if entity_id is not None:
+        q = q.where(Audit.entity_id == entity_id)
+    if actor_id is not None:
+        q = q.where(Audit.actor_id == actor_id)
+    if action:
+        q = q.where(Audit.action == action)
+    if since:
+        q = q.where(Audit.at >= since)
+    if until:
+        q = q.where(Audit.at < until)
+    if cursor:
+        at, aid = cursor
+        # The leading at <= bound lets the planner seek the index
+        q = q.where(at_col <= at, or_(at_col < at, and_(at_col == at, id_col < aid)))
+    return q.order_by(at_col.desc(), id_col.desc())
+
+
+def encode_cursor(a):
+    return f"{a.at.isoformat()}_{a.id}"
+
+
+def decode_cursor(s):
+    """Parse a cursor from encode_cursor(); None if missing or malformed."""
+    if not s:
+        return None
+    try:
+        at, aid = s.rsplit("_", 1)
+        return datetime.fromisoformat(at), int(aid)
+    except ValueError:
+        return None
+
+
+def serialize(a):
+    try:
+        diff = json.loads(a.diff) if a.diff else None
+    except ValueError:
+        diff = a.diff
+    return {"id": a.id, "entity_type": a.entity_type, "entity_id": a.entity_id, "action": a.action,
+            "actor_id": a.actor_id, "at": a.at.isoformat(), "diff": diff}
+
+
+def reindex_changes(batch_size=5000):
+    """Backfill AuditChange for audit rows written before it existed; returns rows indexed."""
+    indexed = 0
+    last_id = 0
+    conn = db.session.connection()
+    change_table.create(conn, checkfirst=True)
+    while True:
+        rows = conn.execute(
+            select(audit_table.c.id, audit_table.c.diff, audit_table.c.at)
+            .where(audit_table.c.id > last_id)
+            .where(~select(change_table.c.id).where(change_table.c.audit_id == audit_table.c.id).exists())
+            .order_by(audit_table.c.id)
+            .limit(batch_size)
+        ).all()
+        if not rows:
+            break
+        changes = []
+        for aid, diff, at in rows:
+            try:
+                fields = diff_changes(json.loads(diff) if diff else None)
+            except ValueError:
+                fields = []
+            changes.extend({"audit_id": aid, "field": f, "value": v, "at": at} for f, v in fields)
+        if changes:
+            conn.execute(change_table.insert(), changes)
+        db.session.commit()
+        conn = db.session.connection()
+        indexed += len(rows)
+        last_id = rows[-1][0]
+    return indexed
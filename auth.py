@@ -0,0 +1,157 @@
+import os, threading, time
+from flask import current_app
+from sqlalchemy import event
+from sqlalchemy.orm import make_transient_to_detached
+from werkzeug.security import generate_password_hash, check_password_hash
+
+from models import db, User
+
+# ----------------------
+# Sign-in and session users
+# ----------------------
+# load_user() runs on every authenticated request, so users are cached per
+# process for USER_CACHE_TTL seconds and re-attached to the request's session
+# without a query. The after_flush hook drops a cached user when this process
+# edits or deletes it; other workers see the change once the TTL expires.
+#
+# Password hashes use PASSWORD_HASH_METHOD (any werkzeug method string); a
+# login with a hash made under another method rehashes it transparently.
+# Hash checks run through a bounded queue: at most LOGIN_CONCURRENCY at once,
+# off the event loop when eventlet is patched in, and a login that waits
+# longer than LOGIN_QUEUE_TIMEOUT is turned away with LoginBusy, so a
+# shift-change burst can't starve every other request.
+
+CACHED_COLUMNS = [c.key for c in User.__table__.columns if c.key != "password_hash"]
+
+
+class LoginBusy(Exception):
+    """No hash-check slot came free within LOGIN_QUEUE_TIMEOUT."""
+
+
+def init_app(app):
+    app.config.setdefault("USER_CACHE_TTL", float(os.getenv("USER_CACHE_TTL", "30")))
+    app.config.setdefault("PASSWORD_HASH_METHOD", os.getenv("PASSWORD_HASH_METHOD", "scrypt"))
+    app.config.setdefault("LOGIN_CONCURRENCY", int(os.getenv("LOGIN_CONCURRENCY", str(os.cpu_count() or 2))))
+    app.config.setdefault("LOGIN_QUEUE_TIMEOUT", float(os.getenv("LOGIN_QUEUE_TIMEOUT", "10")))
+    # werkzeug expands defaults ("scrypt" -> "scrypt:32768:8:1"); compare stored hashes against that
+    method = generate_password_hash("", app.config["PASSWORD_HASH_METHOD"]).split("$", 1)[0]
+    app.extensions["auth"] = {
+        "method": method,
+        "dummy_hash": generate_password_hash(os.urandom(8).hex(), app.config["PASSWORD_HASH_METHOD"]),
+        "users": {}, "lock": threading.Lock(),
+        "slots": threading.BoundedSemaphore(max(app.config["LOGIN_CONCURRENCY"], 1)),
+        "stats": {"logins": 0, "failed": 0, "busy": 0, "rehashed": 0, "waiting": 0, "max_waiting": 0,
+                  "cache_hits": 0, "cache_misses": 0},
+    }
+
+
+def _state():
+    return current_app.extensions["auth"]
+
+
+def _count(state, key, n=1):
+    # Stats are shared by every request thread (and the eventlet tpool workers)
+    with state["lock"]:
+        state["stats"][key] += n
+        return state["stats"][key]
+
+
+# -------- Session users --------
+def load_user(user_id):
+    """The signed-in User for this request, from the cache when it's fresh."""
+    state = _state()
+    entry = state["users"].get(user_id)
+    if entry and entry[0] > time.monotonic():
+        _count(state, "cache_hits")
+        user = User(**entry[1])
+        make_transient_to_detached(user)
+        return db.session.merge(user, load=False)
+    _count(state, "cache_misses")
+    user = db.session.get(User, user_id)
+    if user is not None:
+        values = {key: getattr(user, key) for key in CACHED_COLUMNS}
+        with state["lock"]:
+            state["users"][user_id] = (time.monotonic() + current_app.config["USER_CACHE_TTL"], values)
+    return user
+
+
+def forget_users(user_ids):
+    state = current_app.extensions.get("auth")
+    if not state:
+        return
+    with state["lock"]:
+        for uid in user_ids:
+            state["users"].pop(uid, None)
+
+
+@event.listens_for(db.session, "after_flush")
+def _drop_changed_users(session, flush_context):
+    ids = {obj.id for obj in (*session.dirty, *session.deleted) if isinstance(obj, User)}
+    if ids:
+        forget_users(ids)
+
+
+# -------- Passwords --------
+def hash_password(password):
+    return generate_password_hash(password, current_app.config["PASSWORD_HASH_METHOD"])
+
+
+def needs_rehash(pwhash):
+    return pwhash.split("$", 1)[0] != _state()["method"]
+
+
+def _run_hash(fn, *args):
+    # The hashes release the GIL; under eventlet, a real thread keeps the hub free meanwhile
+    try:
+        from eventlet import patcher, tpool
+        if patcher.is_monkey_patched("thread"):
+            return tpool.execute(fn, *args)
+    except ImportError:
+        pass
+    return fn(*args)
+
+
+def authenticate(email, password):
+    """The User for these credentials, or None; raises LoginBusy when the queue is full.
+
+    Unknown emails are checked against a dummy hash so they take as long as
+    a wrong password. A correct password stored under another hash method
+    is rehashed (the caller commits).
+    """
+    state = _state()
+    method = current_app.config["PASSWORD_HASH_METHOD"]
+    row = db.session.query(User.id, User.password_hash).filter_by(email=email).first()
+    db.session.rollback()  # don't hold a pooled connection while queued
+    with state["lock"]:
+        stats = state["stats"]
+        stats["waiting"] += 1
+        stats["max_waiting"] = max(stats["max_waiting"], stats["waiting"])
+    try:
+        acquired = state["slots"].acquire(timeout=current_app.config["LOGIN_QUEUE_TIMEOUT"])
+    finally:
+        _count(state, "waiting", -1)
+    if not acquired:
+        _count(state, "busy")
+        raise LoginBusy()
+    new_hash = None
+    try:
+        ok = _run_hash(check_password_hash, row.password_hash if row else state["dummy_hash"], password)
+        if ok and needs_rehash(row.password_hash):
+            new_hash = _run_hash(generate_password_hash, password, method)
+    finally:
+        state["slots"].release()
+    if not ok:
+        _count(state, "failed")
+        return None
+    user = db.session.get(User, row.id)
+    if new_hash and user is not None:
+        user.password_hash = new_hash
+        _count(state, "rehashed")
+    _count(state, "logins")
+    return user
+
+
+def stats():
+    state = _state()
+    with state["lock"]:
+        return dict(state["stats"], cached_users=len(state["users"]))
@@ -0,0 +1,127 @@
+"""Flow analytics: full backfill vs one day's incremental refresh, and endpoint reads.
+
+Generates a shop with datagen, then walks --tasks tasks through their
+lifecycle (backlog -> ready -> in_progress [-> blocked -> in_progress] ->
+review -> done) over --days days as task update audit rows, in a throwaway
+SQLite database. Times:
+
+  backfill     refresh() over every day but the last (empty high-water mark)
+  one_day      refresh() after the last day's audit rows land
+  rebuild      facts and rollups recomputed from the whole audit log
+  <endpoint>   median time of the metric queries behind /analytics/*.json
+
+    python bench/analytics.py --tasks 100000 --days 365
+"""
+import argparse, json, os, random, statistics, sys, tempfile, time
+from datetime import datetime, timedelta
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+PATH = ["backlog", "ready", "in_progress", "review", "done"]
+
+
+def lifecycle(rnd, start, now):
+    """[(at, before, after)] for one task, stopping at a random step or at ``now``."""
+    out, at, state = [], start, "backlog"
+    steps = PATH[1:rnd.randint(2, len(PATH))] if rnd.random() < 0.3 else PATH[1:]
+    for nxt in steps:
+        if nxt == "review" and rnd.random() < 0.15:
+            at += timedelta(hours=rnd.expovariate(1 / 8))
+            out.append((at, state, "blocked"))
+            at += timedelta(hours=rnd.expovariate(1 / 24))
+            out.append((at, "blocked", "in_progress"))
+            state = "in_progress"
+        at += timedelta(hours=rnd.expovariate(1 / 36))
+        out.append((at, state, nxt))
+        state = nxt
+    return [e for e in out if e[0] < now]
+
+
+def timed(fn, repeat):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        times.append((time.perf_counter() - start) * 1000)
+    return statistics.median(times)
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--tasks", type=int, default=100000)
+    ap.add_argument("--days", type=int, default=365)
+    ap.add_argument("--repeat", type=int, default=5)
+    ap.add_argument("--seed", type=int, default=42)
+    args = ap.parse_args()
+
+    os.environ["DATABASE_URL"] = f"sqlite:///{tempfile.mkdtemp()}/bench.db"
+    import app as appmod
+    import analytics, datagen
+    from models import db, Audit, FlowRollup, Task
+    app = appmod.create_app()
+    appmod.init_db(app)
+    rnd = random.Random(args.seed)
+    now = datetime.utcnow() - timedelta(minutes=1)
+    cut = now - timedelta(days=1)
+
+    with app.app_context():
+        datagen.generate(users=200, machines=100, projects=max(args.tasks // 25, 1), tasks=args.tasks,
+                         comments=0, audits=0, archived_ratio=0, seed=args.seed)
+        created, events = [], []
+        for tid in range(1, args.tasks + 1):
+            start = now - timedelta(days=args.days * rnd.random())
+            created.append({"tid": tid, "created": start})
+            events += [(at, tid, before, after) for at, before, after in lifecycle(rnd, start, now)]
+        events.sort()
+        task_table = Task.__table__
+        db.session.execute(task_table.update().where(task_table.c.id == db.bindparam("tid"))
+                           .values(created_at=db.bindparam("created")), created)
+
+        def audit_rows(evs):
+            return [{"entity_type": "task", "entity_id": tid, "action": "update", "actor_id": 1 + tid % 200,
+                     "diff": json.dumps({"before": {"state": before}, "after": {"state": after}}), "at": at}
+                    for at, tid, before, after in evs]
+        old = [e for e in events if e[0] < cut]
+        new = [e for e in events if e[0] >= cut]
+        for i in range(0, len(old), 20000):
+            db.session.execute(Audit.__table__.insert(), audit_rows(old[i:i + 20000]))
+        db.session.commit()
+        print(f"{args.tasks} tasks, {len(events)} transitions over {args.days} days ({len(new)} on the last day)")
+
+        results = {}
+        start = time.perf_counter()
+        added = analytics.refresh(settle=0)
+        results["backfill"] = (time.perf_counter() - start) * 1000
+        print(f"backfill     {added:>8} transitions  {results['backfill']:9.0f} ms  "
+              f"({added / (results['backfill'] / 1000):,.0f}/s)")
+
+        db.session.execute(Audit.__table__.insert(), audit_rows(new))
+        db.session.commit()
+        start = time.perf_counter()
+        added = analytics.refresh(settle=0)
+        results["one_day"] = (time.perf_counter() - start) * 1000
+        print(f"one_day      {added:>8} transitions  {results['one_day']:9.0f} ms")
+
+        start = time.perf_counter()
+        added = analytics.rebuild()
+        results["rebuild"] = (time.perf_counter() - start) * 1000
+        print(f"rebuild      {added:>8} transitions  {results['rebuild']:9.0f} ms")
+        print(f"rollup rows  {db.session.query(FlowRollup).count():>8}")
+
+        reads = {
+            "throughput_weekly": lambda: analytics.series("throughput", grain="week", days=365),
+            "lead_time_project": lambda: analytics.series("lead_time", "project", "1", days=90),
+            "wip_user_series": lambda: analytics.series("wip", "user", "1", days=90),
+            "lead_time_by_customer": lambda: analytics.breakdown("lead_time", "customer", 90),
+            "throughput_by_project": lambda: analytics.breakdown("throughput", "project", 90),
+            "time_in_state_by_user": lambda: analytics.breakdown("time_in_state", "user", 90),
+            "wip_by_machine": lambda: analytics.breakdown("wip", "machine"),
+            "hourly_24h": lambda: analytics.series("time_in_state", grain="hour", days=1),
+        }
+        for name, fn in reads.items():
+            print(f"{name:22} {timed(fn, args.repeat):8.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+"""Dashboard latency as history piles up: kept live vs archived.
+
+Builds the same shop twice in throwaway SQLite databases. Each step adds
+--step-projects finished, archived projects (--tasks-per-project done tasks
+each, with assignments, comments and two-year-old audit rows) to both. The
+"live" database keeps everything in the hot tables. The "archived" one runs
+archive.run() after each step, with analytics marked caught up so old audit
+rows may leave. After every step it times the dashboard routes in both.
+
+    python bench/archive.py --steps 4 --step-projects 2500
+"""
+import argparse, json, os, random, statistics, sys, tempfile, time
+from datetime import datetime, timedelta
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+ROUTES = ["/", "/dashboard/columns/done.json", "/dashboard/widgets", "/dashboard/progress.json",
+          "/dashboard/workload", "/projects"]
+
+
+def add_history(db, models, projects, per_project, rnd, users):
+    """Insert finished, archived jobs; returns rows inserted."""
+    Project, Task, TaskAssignment, Comment, Audit = models
+    long_ago = datetime.utcnow() - timedelta(days=730)
+    p0 = (db.session.query(db.func.max(Project.id)).scalar() or 0) + 1
+    t0 = (db.session.query(db.func.max(Task.id)).scalar() or 0) + 1
+    p_rows, t_rows, a_rows, c_rows, au_rows = [], [], [], [], []
+    for i in range(projects):
+        pid = p0 + i
+        at = long_ago - timedelta(hours=rnd.randint(0, 24 * 365))
+        p_rows.append({"id": pid, "code": f"OLD-{pid:07d}", "title": f"Closed job {pid}", "customer": "Acme",
+                       "status": "archived", "priority": 3, "created_at": at})
+        for j in range(per_project):
+            tid = t0 + i * per_project + j
+            t_rows.append({"id": tid, "project_id": pid, "title": f"Op {j}", "state": "done", "priority": 3,
+                           "est_hours": 2.0, "created_at": at, "updated_at": at + timedelta(days=3)})
+            a_rows.append({"task_id": tid, "user_id": 1 + tid % users, "assigned_at": at})
+            c_rows.append({"task_id": tid, "user_id": 1 + tid % users, "body": "done and shipped", "created_at": at})
+            au_rows += [{"entity_type": "task", "entity_id": tid, "action": "update", "actor_id": 1,
+                         "diff": json.dumps({"before": {"state": s}, "after": {"state": n}}), "at": at}
+                        for s, n in (("ready", "in_progress"), ("in_progress", "done"))]
+    for model, rows in ((Project, p_rows), (Task, t_rows), (TaskAssignment, a_rows), (Comment, c_rows), (Audit, au_rows)):
+        for k in range(0, len(rows), 20000):
+            db.session.execute(model.__table__.insert(), rows[k:k + 20000])
+    db.session.commit()
+    return sum(map(len, (p_rows, t_rows, a_rows, c_rows, au_rows)))
+
+
+def timed(client, url, repeat):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        assert client.get(url).status_code == 200, url
+        times.append((time.perf_counter() - start) * 1000)
+    return statistics.median(times)
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--steps", type=int, default=4)
+    ap.add_argument("--step-projects", type=int, default=2500)
+    ap.add_argument("--tasks-per-project", type=int, default=20)
+    ap.add_argument("--repeat", type=int, default=5)
+    ap.add_argument("--seed", type=int, default=42)
+    args = ap.parse_args()
+
+    os.environ["SOCKETIO_ASYNC_MODE"] = "threading"
+    import app as appmod
+    import analytics, archive, datagen, rollups
+    from models import db, ChangeCounter, Project, Task, TaskAssignment, Comment, Audit
+    models = (Project, Task, TaskAssignment, Comment, Audit)
+
+    apps = {}
+    for name in ("live", "archived"):
+        os.environ["DATABASE_URL"] = f"sqlite:///{tempfile.mkdtemp()}/{name}.db"
+        app = appmod.create_app()
+        appmod.init_db(app)
+        with app.app_context():
+            datagen.generate(users=200, machines=50, projects=2000, tasks=40000, comments=40000, audits=40000,
+                             archived_ratio=0, seed=args.seed)
+        client = app.test_client()
+        client.post("/login", data={"email": "user1@shop.example", "password": "Password"})
+        apps[name] = (app, client, random.Random(args.seed))
+
+    header = f"{'history rows':>12} {'db':9} " + " ".join(f"{u.strip('/')[:18] or 'dashboard':>18}" for u in ROUTES)
+    print(header)
+    history = 0
+    for step in range(args.steps + 1):
+        if step:
+            for name, (app, _, rnd) in apps.items():
+                with app.app_context():
+                    added = add_history(db, models, args.step_projects, args.tasks_per_project, rnd, 200)
+                    rollups.rebuild_all()
+                    if name == "archived":
+                        # Mark analytics caught up (bench shortcut) so the old audit rows are eligible
+                        db.session.merge(ChangeCounter(name=analytics.HIGH_WATER_MARK,
+                                                       value=db.session.query(db.func.max(Audit.id)).scalar()))
+                        db.session.commit()
+                        start = time.perf_counter()
+                        moved = archive.run(pause=0)
+                        took = time.perf_counter() - start
+            history += added
+            print(f"  step {step}: +{added} history rows; archived {moved['projects']} projects and "
+                  f"{moved['audits']} audit rows in {took:.1f}s")
+        for name, (app, client, _) in apps.items():
+            ms = [timed(client, url, args.repeat) for url in ROUTES]
+            print(f"{history:>12} {name:9} " + " ".join(f"{m:15.1f} ms" for m in ms))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+"""/audit page latency at increasing depth (keyset pagination).
+
+Seeds --rows audit entries (1 in 5 a transition to 'blocked'), then times one
+page at several depths by starting from the cursor of the row at that depth.
+
+    python bench/audit_pages.py --rows 1000000
+"""
+import argparse, json, os, statistics, sys, tempfile, time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--rows", type=int, default=1000000)
+    ap.add_argument("--limit", type=int, default=100)
+    ap.add_argument("--repeat", type=int, default=20)
+    args = ap.parse_args()
+
+    os.environ["DATABASE_URL"] = f"sqlite:///{tempfile.mkdtemp()}/bench.db"
+    import app as appmod, audit
+    from models import db, Audit
+    app = appmod.create_app()
+    appmod.init_db(app)
+    appmod.seed_demo(app)
+
+    t0 = datetime(2024, 1, 1)
+    states = ["ready", "in_progress", "review", "done", "blocked"]
+    with app.app_context():
+        chunk = 20000
+        for start in range(0, args.rows, chunk):
+            rows = []
+            for i in range(start, min(start + chunk, args.rows)):
+                diff = {"before": {"state": "backlog"}, "after": {"state": states[i % 5]}}
+                rows.append({"id": i + 1, "entity_type": "task", "entity_id": 1 + i % 5000, "action": "update",
+                             "actor_id": 1 + i % 3, "diff": json.dumps(diff), "at": t0 + timedelta(seconds=i)})
+            db.session.execute(audit.audit_table.insert(), rows)
+            db.session.execute(audit.change_table.insert(), [
+                {"audit_id": r["id"], "field": "state", "value": states[(r["id"] - 1) % 5], "at": r["at"]}
+                for r in rows])
+            db.session.commit()
+        db.session.execute(db.text("ANALYZE"))
+        db.session.commit()
+
+    client = app.test_client()
+    client.post("/login", data={"email": "admin@example.com", "password": "Password"})
+    print(f"rows={args.rows} limit={args.limit}")
+    for label, extra, total in (("all", "", args.rows), ("state=blocked", "&field=state&value=blocked", args.rows // 5)):
+        for depth in (0, total // 100, total // 10, total // 2, total - args.limit * 2):
+            cursor = ""
+            if depth:
+                with app.app_context():
+                    q = audit.history_query(field="state" if extra else None, value="blocked" if extra else None)
+                    # locating the start row is setup, not part of the timed page
+                    a = db.session.scalars(q.offset(depth - 1).limit(1)).first()
+                    cursor = "&cursor=" + audit.encode_cursor(a)
+            times = []
+            for _ in range(args.repeat):
+                s = time.perf_counter()
+                resp = client.get(f"/audit?limit={args.limit}{extra}{cursor}")
+                times.append(time.perf_counter() - s)
+                assert len(resp.get_json()["items"]) == args.limit
+            print(f"  {label:14} depth={depth:>9} median_ms={statistics.median(times) * 1000:.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+"""Opening a long comment thread: old full load vs paged + cached reads.
+
+Creates one task with --comments comments from --users users in a
+throwaway SQLite database, then times:
+
+  full_load    every comment with a lazy user load each (the old route)
+  head_cold    newest page, cache empty
+  head_warm    newest page again, nothing posted
+  after_post   newest page after one new comment
+  since        only comments newer than the previous last id
+  older_page   one page back from the newest
+
+    python bench/comment_thread.py --comments 5000
+"""
+import argparse, os, statistics, sys, tempfile, time
+from datetime import datetime
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+
+def timed(fn, repeat, setup=None):
+    times = []
+    for _ in range(repeat):
+        if setup:
+            setup()
+        start = time.perf_counter()
+        fn()
+        times.append((time.perf_counter() - start) * 1000)
+    return statistics.median(times)
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--comments", type=int, default=5000)
+    ap.add_argument("--users", type=int, default=50)
+    ap.add_argument("--repeat", type=int, default=7)
+    args = ap.parse_args()
+
+    os.environ["DATABASE_URL"] = f"sqlite:///{tempfile.mkdtemp()}/bench.db"
+    import app as appmod
+    import comments
+    from models import db, Comment, Project, Task, User
+    app = appmod.create_app()
+    appmod.init_db(app)
+
+    with app.app_context():
+        db.session.add_all([User(name=f"User {i}", email=f"u{i}@shop.example", password_hash="x")
+                            for i in range(args.users)])
+        db.session.add(Project(code="JOB-1", title="Long job"))
+        db.session.flush()
+        db.session.add(Task(project_id=1, title="Long-running task"))
+        db.session.commit()
+        now = datetime.utcnow()
+        db.session.execute(Comment.__table__.insert(), [
+            {"task_id": 1, "user_id": 1 + i % args.users, "body": f"Comment {i}", "created_at": now}
+            for i in range(args.comments)])
+        db.session.commit()
+
+        def full_load():
+            db.session.expire_all()
+            [{"id": c.id, "user": c.user.name if c.user else "Unknown", "body": c.body,
+              "created_at": c.created_at.strftime("%Y-%m-%d %H:%M")}
+             for c in Comment.query.filter_by(task_id=1).order_by(Comment.created_at.asc()).all()]
+
+        def drop_cache():
+            comments.invalidate([1])
+
+        def post():
+            db.session.add(Comment(task_id=1, user_id=1, body="new"))
+            db.session.commit()
+
+        results = {
+            "full_load": timed(full_load, args.repeat),
+            "head_cold": timed(lambda: comments.page(1), args.repeat, setup=drop_cache),
+            "head_warm": timed(lambda: comments.page(1), args.repeat),
+        }
+        comments.page(1)
+        # A post from another worker: this process's cache only sees the new max(id)
+        results["after_post"] = timed(lambda: comments.page(1), args.repeat, setup=lambda: (
+            db.session.execute(Comment.__table__.insert().values(task_id=1, user_id=1, body="new", created_at=now)),
+            db.session.commit()))
+        last = comments.last_id(1)
+        post()
+        results["since"] = timed(lambda: comments.page(1, since=last), args.repeat)
+        _, cursor, _ = comments.page(1)
+        results["older_page"] = timed(lambda: comments.page(1, cursor=cursor), args.repeat)
+
+    print(f"{args.comments} comments on one task")
+    for name, ms in results.items():
+        print(f"{name:12} {ms:8.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,60 @@
+"""Peak memory of /export/tasks.csv as the task count grows.
+
+Each size runs in a fresh subprocess so ru_maxrss is not carried over.
+
+    python bench/export_memory.py --rows 10000 100000 300000
+"""
+import argparse, os, resource, subprocess, sys, tempfile, time, tracemalloc
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def run_one(rows):
+    os.environ["DATABASE_URL"] = f"sqlite:///{tempfile.mkdtemp()}/bench.db"
+    import app as appmod
+    from models import db, Task, TaskAssignment
+    app = appmod.create_app()
+    appmod.init_db(app)
+    appmod.seed_demo(app)
+    with app.app_context():
+        now = datetime.utcnow()
+        first = db.session.query(db.func.max(Task.id)).scalar() + 1
+        chunk = 10000
+        for start in range(0, rows, chunk):
+            n = min(chunk, rows - start)
+            db.session.execute(Task.__table__.insert(), [
+                {"project_id": 1 + i % 2, "title": f"Op {start + i}", "state": "ready", "priority": 3,
+                 "est_hours": 1.0, "created_at": now} for i in range(n)])
+        db.session.execute(TaskAssignment.__table__.insert(), [
+            {"task_id": tid, "user_id": 1 + tid % 3} for tid in range(first, first + rows, 7)])
+        db.session.commit()
+
+    client = app.test_client()
+    client.post("/login", data={"email": "admin@example.com", "password": "Password"})
+    rss_before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    tracemalloc.start()
+    t0 = time.perf_counter()
+    resp = client.get("/export/tasks.csv", buffered=False)
+    size = sum(len(chunk) for chunk in resp.response)
+    elapsed = time.perf_counter() - t0
+    _, peak = tracemalloc.get_traced_memory()
+    rss_after = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    print(f"rows={rows} bytes={size} secs={elapsed:.2f} py_peak_kb={peak // 1024} "
+          f"maxrss_growth_kb={rss_after - rss_before}")
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--rows", type=int, nargs="+", default=[10000, 50000, 200000])
+    ap.add_argument("--one", action="store_true", help=argparse.SUPPRESS)
+    args = ap.parse_args()
+    if args.one:
+        run_one(args.rows[0])
+        return
+    for rows in args.rows:
+        subprocess.run([sys.executable, __file__, "--one", "--rows", str(rows)], check=True)
+
+
+if __name__ == "__main__":
+    main()
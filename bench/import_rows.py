@@ -0,0 +1,78 @@
+"""Throughput and memory of imports.py on a generated task file.
+
+Writes a CSV (or JSON Lines) file of --rows tasks spread over existing
+projects, imports it into a throwaway SQLite database and reports rows/s and
+peak RSS. Run at two sizes to see that memory does not grow with the file:
+
+    python bench/import_rows.py --rows 100000
+    python bench/import_rows.py --rows 1000000 --format json
+"""
+import argparse, csv, json, os, random, resource, sys, tempfile, time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+STATES = ["backlog", "ready", "in_progress", "blocked", "review", "done"]
+
+
+def write_file(path, fmt, rows, codes, emails, machines, seed):
+    rnd = random.Random(seed)
+    with open(path, "w", newline="") as f:
+        writer = csv.writer(f) if fmt == "csv" else None
+        if writer:
+            writer.writerow(["project_code", "title", "state", "priority", "est_hours", "due_date", "assignees", "machine"])
+        for i in range(rows):
+            row = [rnd.choice(codes), f"OP{i % 90 + 1}0", rnd.choice(STATES), rnd.randint(1, 5),
+                   round(rnd.uniform(0.5, 12), 1), f"2026-{rnd.randint(1, 12):02d}-{rnd.randint(1, 28):02d}",
+                   rnd.choice(emails) if rnd.random() < 0.7 else "", rnd.choice(machines) if rnd.random() < 0.5 else ""]
+            if i % 1000 == 999:
+                row[0] = "JOB-MISSING"  # a sprinkle of rejected rows
+            if writer:
+                writer.writerow(row)
+            else:
+                f.write(json.dumps(dict(zip(["project_code", "title", "state", "priority", "est_hours",
+                                             "due_date", "assignees", "machine"], row))) + "\n")
+
+
+def peak_rss_mb():
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--rows", type=int, default=100000)
+    ap.add_argument("--format", choices=("csv", "json"), default="csv")
+    ap.add_argument("--chunk-size", type=int, default=5000)
+    ap.add_argument("--commit-every", type=int, default=50000)
+    ap.add_argument("--seed", type=int, default=42)
+    args = ap.parse_args()
+
+    tmp = tempfile.mkdtemp()
+    os.environ["DATABASE_URL"] = f"sqlite:///{tmp}/bench.db"
+    import app as appmod
+    import datagen, imports
+    from models import db, Project, User, Machine
+    app = appmod.create_app()
+    appmod.init_db(app)
+    with app.app_context():
+        datagen.generate(users=200, machines=50, projects=2000, tasks=0, comments=0, audits=0, seed=args.seed)
+        codes = [c for (c,) in db.session.query(Project.code)]
+        emails = [e for (e,) in db.session.query(User.email)]
+        machines = [n for (n,) in db.session.query(Machine.name)]
+
+    path = os.path.join(tmp, f"tasks.{'csv' if args.format == 'csv' else 'jsonl'}")
+    started = time.perf_counter()
+    write_file(path, args.format, args.rows, codes, emails, machines, args.seed)
+    print(f"wrote {args.rows} rows ({os.path.getsize(path) / 1e6:.0f} MB) in {time.perf_counter() - started:.1f}s")
+
+    rss_before = peak_rss_mb()
+    with app.app_context(), open(path, newline="") as f:
+        report = imports.import_file(f, "tasks", args.format, chunk_size=args.chunk_size,
+                                     commit_every=args.commit_every)
+    print(f"imported {report['inserted']} / {report['rows']} rows, {report['error_count']} rejected, "
+          f"{report['seconds']:.1f}s, {report['rows_per_sec']:.0f} rows/s")
+    print(f"peak RSS {peak_rss_mb():.0f} MB (before import {rss_before:.0f} MB)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,146 @@
+"""A shift-change burst: N simultaneous logins against one eventlet worker.
+
+Starts the app under eventlet (as gunicorn runs it) on a throwaway SQLite
+database with one user per login, then fires --logins logins at once while a
+signed-in probe keeps polling /dashboard/progress.json. Reports login
+latency percentiles, how many were turned away (503), and the probe's
+latency during the burst -- the number that shows whether sign-ins starve
+everything else.
+
+    python bench/logins.py --logins 300
+    python bench/logins.py --logins 300 --method pbkdf2:sha256:100000
+    python bench/logins.py --logins 300 --inline    # old path: hashes run on the event loop
+"""
+import argparse, http.client, multiprocessing, os, socket, statistics, sys, tempfile, threading, time
+from urllib.parse import urlencode
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def serve(env, port, users, inline):
+    import eventlet, eventlet.wsgi
+    eventlet.monkey_patch()
+    os.environ.update(env)
+    import app as appmod
+    import auth
+    from models import db, User
+    from werkzeug.security import generate_password_hash
+    app = appmod.create_app()
+    appmod.init_db(app)
+    with app.app_context():
+        # Hashed once under the default method, so every first login also rehashes when --method differs
+        pw = generate_password_hash("Password")
+        db.session.execute(User.__table__.insert(), [
+            {"name": f"Operator {i}", "email": f"op{i}@shop.example", "role": "operator", "password_hash": pw,
+             "is_active": True} for i in range(users)])
+        db.session.commit()
+    if inline:
+        auth._run_hash = lambda fn, *args: fn(*args)
+        app.extensions["auth"]["slots"] = threading.BoundedSemaphore(10000)
+    # gunicorn's listen backlog; eventlet.listen()'s default of 50 resets a burst this size
+    eventlet.wsgi.server(eventlet.listen(("127.0.0.1", port), backlog=2048), app, log_output=False)
+
+
+def login(port, email, timeout=120):
+    conn = http.client.HTTPConnection("127.0.0.1", port, timeout=timeout)
+    body = urlencode({"email": email, "password": "Password"})
+    conn.request("POST", "/login", body, {"Content-Type": "application/x-www-form-urlencoded"})
+    resp = conn.getresponse()
+    resp.read()
+    cookie = (resp.getheader("Set-Cookie") or "").split(";", 1)[0]
+    conn.close()
+    return resp.status, cookie
+
+
+def pct(values, p):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p / 100))] if values else float("nan")
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--logins", type=int, default=300)
+    ap.add_argument("--method", help="PASSWORD_HASH_METHOD (default: werkzeug's scrypt)")
+    ap.add_argument("--concurrency", type=int, help="LOGIN_CONCURRENCY (default: CPU count)")
+    ap.add_argument("--queue-timeout", type=float, default=30, help="LOGIN_QUEUE_TIMEOUT seconds")
+    ap.add_argument("--inline", action="store_true", help="Check hashes on the event loop with no queue")
+    args = ap.parse_args()
+
+    port = free_port()
+    env = {"DATABASE_URL": f"sqlite:///{tempfile.mkdtemp()}/bench.db", "SOCKETIO_ASYNC_MODE": "eventlet",
+           "LOGIN_QUEUE_TIMEOUT": str(args.queue_timeout)}
+    if args.method:
+        env["PASSWORD_HASH_METHOD"] = args.method
+    if args.concurrency:
+        env["LOGIN_CONCURRENCY"] = str(args.concurrency)
+    server = multiprocessing.Process(target=serve, args=(env, port, args.logins + 1, args.inline), daemon=True)
+    server.start()
+    deadline = time.time() + 60
+    while True:
+        try:
+            status, cookie = login(port, f"op{args.logins}@shop.example")
+            break
+        except OSError:
+            if time.time() > deadline:
+                raise
+            time.sleep(0.2)
+
+    probe_ms, stop = [], threading.Event()
+
+    def probe():
+        conn = http.client.HTTPConnection("127.0.0.1", port, timeout=120)
+        while not stop.is_set():
+            start = time.perf_counter()
+            conn.request("GET", "/dashboard/progress.json", headers={"Cookie": cookie})
+            conn.getresponse().read()
+            probe_ms.append((time.perf_counter() - start) * 1000)
+            time.sleep(0.05)
+
+    results, gate = [], threading.Barrier(args.logins + 1)
+
+    def one(i):
+        gate.wait()
+        start = time.perf_counter()
+        try:
+            status, _ = login(port, f"op{i}@shop.example")
+        except OSError:
+            status = "error"
+        results.append((status, (time.perf_counter() - start) * 1000))
+
+    threads = [threading.Thread(target=one, args=(i,)) for i in range(args.logins)]
+    for t in threads:
+        t.start()
+    prober = threading.Thread(target=probe)
+    prober.start()
+    time.sleep(0.3)
+    idle = list(probe_ms)
+    started = time.perf_counter()
+    gate.wait()
+    for t in threads:
+        t.join()
+    total = time.perf_counter() - started
+    stop.set()
+    prober.join()
+    server.terminate()
+
+    ok = [ms for status, ms in results if status == 302]
+    busy = sum(1 for status, _ in results if status == 503)
+    errors = sum(1 for status, _ in results if status == "error")
+    during = probe_ms[len(idle):]
+    print(f"{args.logins} logins ({'inline' if args.inline else 'queued'}, method {args.method or 'scrypt'}) "
+          f"in {total:.1f}s: {len(ok)} ok, {busy} busy (503), {errors} connection errors")
+    print(f"login ms   p50 {pct(ok, 50):8.0f}  p95 {pct(ok, 95):8.0f}  max {max(ok, default=float('nan')):8.0f}")
+    print(f"probe ms   idle p50 {statistics.median(idle) if idle else float('nan'):6.1f}   "
+          f"during burst p50 {pct(during, 50):7.1f}  p95 {pct(during, 95):7.1f}  max {max(during, default=float('nan')):7.1f}"
+          f"  ({len(during)} requests)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+"""Which engine serves each page, with two SQLite files as primary and replica.
+
+Builds a primary with --tasks tasks, copies it to the replica
+(database.sync_sqlite_replica, as `app.py --sync-replica` does), then
+requests each page and counts the statements each engine ran. Read-only
+pages should run entirely on the replica; a write, and the next
+REPLICA_STICKY_SECONDS of that browser's reads, stay on the primary.
+
+    python bench/replica_routing.py --tasks 20000
+"""
+import argparse, os, sys, tempfile, time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--tasks", type=int, default=20000)
+    args = ap.parse_args()
+
+    d = tempfile.mkdtemp()
+    os.environ.update(DATABASE_URL=f"sqlite:///{d}/primary.db", DATABASE_REPLICA_URL=f"sqlite:///{d}/replica.db",
+                      REPLICA_STICKY_SECONDS="1")
+    import app as appmod
+    import database, datagen
+    from models import db
+    from sqlalchemy import event
+    app = appmod.create_app()
+    appmod.init_db(app)
+    with app.app_context():
+        datagen.generate(users=50, machines=20, projects=max(args.tasks // 25, 1), tasks=args.tasks,
+                         comments=args.tasks, audits=0)
+        db.session.execute(db.text("UPDATE user SET email = 'admin@example.com', role = 'admin' WHERE id = 1"))
+        db.session.commit()
+        engines = dict(db.engines)
+    database.sync_sqlite_replica(os.environ["DATABASE_URL"], os.environ["DATABASE_REPLICA_URL"])
+
+    counts = {}
+    for key, engine in engines.items():
+        name = key or "primary"
+        event.listen(engine, "before_cursor_execute",
+                     lambda *a, name=name: counts.__setitem__(name, counts.get(name, 0) + 1))
+
+    client = app.test_client()
+    client.post("/login", data={"email": "admin@example.com", "password": "Password"})
+    time.sleep(1.1)  # past the login's stickiness
+
+    def hit(label, method, url, **kw):
+        counts.clear()
+        start = time.perf_counter()
+        status = getattr(client, method)(url, **kw).status_code
+        ms = (time.perf_counter() - start) * 1000
+        print(f"{label:28} {status}  {ms:7.1f} ms  primary {counts.get('primary', 0):3}  replica {counts.get('replica', 0):3}")
+
+    hit("GET /", "get", "/")
+    hit("GET /projects", "get", "/projects?q=JOB")
+    hit("GET /dashboard/progress.json", "get", "/dashboard/progress.json")
+    hit("GET /search.json", "get", "/search.json?q=mill")
+    hit("GET /export/tasks.csv", "get", "/export/tasks.csv?state=blocked")
+    hit("GET /projects/1 (primary)", "get", "/projects/1")
+    hit("PATCH /tasks/1", "patch", "/tasks/1", json={"state": "review"})
+    hit("GET / right after write", "get", "/")
+    time.sleep(1.1)
+    hit("GET / after stickiness", "get", "/")
+
+
+if __name__ == "__main__":
+    main()
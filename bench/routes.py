@@ -0,0 +1,198 @@
+"""End-to-end route benchmark through Flask's test client.
+
+Runs every route against DATABASE_URL (fill it with datagen.py first), or
+against a throwaway SQLite database generated at --scale when --generate is
+given. Writes a JSON report with latency percentiles, statements per request
+and peak Python memory per route; --compare prints the change against an
+earlier report. --profiling both runs every route with PROFILING off and
+then on, against the same database, and prints the instrumentation
+overhead per route.
+
+    python datagen.py --initdb --projects 20000 --tasks 500000
+    python bench/routes.py --out before.json
+    ... change code ...
+    python bench/routes.py --out after.json --compare before.json
+    python bench/routes.py --generate small --profiling both
+"""
+import argparse, json, os, platform, random, statistics, subprocess, sys, tempfile, time, tracemalloc
+from datetime import datetime
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+SCALES = {
+    "small": dict(users=50, machines=20, projects=500, tasks=10000, comments=20000, audits=40000),
+    "medium": dict(users=200, machines=80, projects=5000, tasks=100000, comments=200000, audits=400000),
+    "large": dict(users=500, machines=200, projects=20000, tasks=500000, comments=1000000, audits=2000000),
+}
+
+
+def percentile(values, pct):
+    values = sorted(values)
+    k = (len(values) - 1) * pct / 100
+    lo, hi = int(k), min(int(k) + 1, len(values) - 1)
+    return values[lo] + (values[hi] - values[lo]) * (k - lo)
+
+
+def routes(rnd, ids):
+    """(name, method, url factory, kwargs factory) for every route worth timing."""
+    pid = lambda: rnd.choice(ids["projects"])
+    tid = lambda: rnd.choice(ids["tasks"])
+    uid = lambda: rnd.choice(ids["users"])
+    return [
+        ("dashboard", "GET", lambda: "/", None),
+        ("dashboard_user", "GET", lambda: f"/?user={uid()}", None),
+        ("widgets", "GET", lambda: "/dashboard/widgets", None),
+        ("workload", "GET", lambda: "/dashboard/workload", None),
+        ("progress", "GET", lambda: "/dashboard/progress", None),
+        ("progress_json", "GET", lambda: "/dashboard/progress.json", None),
+        ("column_ready", "GET", lambda: "/dashboard/columns/ready.json", None),
+        ("projects", "GET", lambda: "/projects", None),
+        ("project_detail", "GET", lambda: f"/projects/{pid()}", None),
+        ("comments_json", "GET", lambda: f"/tasks/{tid()}/comments.json", None),
+        ("comment_add", "POST", lambda: f"/tasks/{tid()}/comment", lambda: {"data": {"body": "bench note"}}),
+        ("task_patch", "PATCH", lambda: f"/tasks/{tid()}",
+         lambda: {"json": {"state": rnd.choice(["ready", "in_progress", "review"])}}),
+        ("audit_page", "GET", lambda: "/audit?limit=100", None),
+        ("export_project", "GET", lambda: f"/export/tasks.csv?project=JOB-{pid():06d}", None),
+        ("export_full", "GET", lambda: "/export/tasks.csv", None),
+    ]
+
+
+def git_rev():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except Exception:
+        return None
+
+
+def run(app, iterations, only, seed):
+    from sqlalchemy import event
+    from models import db, User, Project, Task
+
+    with app.app_context():
+        admin = User.query.filter_by(role="admin").order_by(User.id).first()
+        ids = {
+            "projects": [i for (i,) in db.session.query(Project.id).order_by(db.func.random()).limit(500)],
+            "tasks": [i for (i,) in db.session.query(Task.id).order_by(db.func.random()).limit(2000)],
+            "users": [i for (i,) in db.session.query(User.id).limit(500)],
+        }
+        statements = [0]
+        event.listen(db.engine, "before_cursor_execute", lambda *a, **k: statements.__setitem__(0, statements[0] + 1))
+
+    client = app.test_client()
+    # Generated users share the password "Password"
+    client.post("/login", data={"email": admin.email, "password": "Password"})
+    rnd = random.Random(seed)
+    results = {}
+    for name, method, url, kwargs in routes(rnd, ids):
+        if only and name not in only:
+            continue
+        n = 1 if name == "export_full" else iterations
+
+        def call():
+            resp = client.open(url(), method=method, **(kwargs() if kwargs else {}))
+            size = len(resp.get_data())
+            assert resp.status_code < 400, (name, resp.status_code)
+            return size
+
+        call()  # warm-up
+        times, counts, size = [], [], 0
+        for _ in range(n):
+            statements[0] = 0
+            start = time.perf_counter()
+            size = call()
+            times.append((time.perf_counter() - start) * 1000)
+            counts.append(statements[0])
+        tracemalloc.start()
+        call()
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        results[name] = {
+            "n": n,
+            "p50_ms": round(percentile(times, 50), 2),
+            "p90_ms": round(percentile(times, 90), 2),
+            "p99_ms": round(percentile(times, 99), 2),
+            "max_ms": round(max(times), 2),
+            "mean_ms": round(statistics.fmean(times), 2),
+            "queries": max(counts),
+            "peak_kb": peak // 1024,
+            "bytes": size,
+        }
+        print(f"{name:16} p50={results[name]['p50_ms']:9.2f}ms p99={results[name]['p99_ms']:9.2f}ms "
+              f"queries={results[name]['queries']:5} peak={results[name]['peak_kb']:7}KB", flush=True)
+    return results
+
+
+def compare(report, baseline):
+    print(f"\nvs {baseline.get('commit')} ({baseline.get('created')})")
+    for name, cur in report["routes"].items():
+        old = baseline.get("routes", {}).get(name)
+        if not old:
+            continue
+        ratio = cur["p50_ms"] / old["p50_ms"] if old["p50_ms"] else float("inf")
+        print(f"{name:16} p50 {old['p50_ms']:9.2f} -> {cur['p50_ms']:9.2f}ms ({ratio:5.2f}x)  "
+              f"queries {old['queries']} -> {cur['queries']}  peak {old['peak_kb']} -> {cur['peak_kb']}KB")
+
+
+def overhead(off, on):
+    print("\nprofiling overhead (PROFILING=0 -> 1)")
+    for name, old in off.items():
+        cur = on.get(name)
+        if cur:
+            print(f"{name:16} p50 {old['p50_ms']:9.2f} -> {cur['p50_ms']:9.2f}ms ({cur['p50_ms'] - old['p50_ms']:+7.2f}ms)  "
+                  f"p99 {old['p99_ms']:9.2f} -> {cur['p99_ms']:9.2f}ms")
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--generate", choices=sorted(SCALES), help="Benchmark a fresh SQLite database at this scale")
+    ap.add_argument("--iterations", type=int, default=20)
+    ap.add_argument("--only", nargs="*", help="Route names to run (default: all)")
+    ap.add_argument("--seed", type=int, default=42)
+    ap.add_argument("--out", help="Write the JSON report here")
+    ap.add_argument("--compare", help="Earlier JSON report to diff against")
+    ap.add_argument("--profiling", choices=["off", "on", "both"],
+                    help="Force PROFILING off or on; 'both' runs each and reports the overhead (default: env)")
+    args = ap.parse_args()
+
+    if args.generate:
+        os.environ["DATABASE_URL"] = f"sqlite:///{tempfile.mkdtemp()}/bench.db"
+    import app as appmod
+    import datagen
+    apps = []
+    for flag in {"off": ["0"], "on": ["1"], "both": ["0", "1"]}.get(args.profiling, [None]):
+        if flag is not None:
+            os.environ["PROFILING"] = flag
+        apps.append(appmod.create_app())
+    app = apps[0]
+    if args.generate:
+        appmod.init_db(app)
+        with app.app_context():
+            datagen.generate(seed=args.seed, **SCALES[args.generate])
+
+    report = {
+        "commit": git_rev(),
+        "created": datetime.utcnow().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "database": app.config["SQLALCHEMY_DATABASE_URI"].split("://")[0],
+        "scale": args.generate,
+        "iterations": args.iterations,
+        "profiling": app.config["PROFILING"],
+        "routes": run(app, args.iterations, args.only, args.seed),
+    }
+    if len(apps) > 1:
+        print("\nPROFILING=1")
+        report["routes_profiled"] = run(apps[1], args.iterations, args.only, args.seed)
+        overhead(report["routes"], report["routes_profiled"])
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(report, f, indent=2, sort_keys=True)
+    if args.compare:
+        with open(args.compare) as f:
+            compare(report, json.load(f))
+
+
+if __name__ == "__main__":
+    main()
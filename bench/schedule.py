@@ -0,0 +1,96 @@
+"""Full vs incremental machine scheduling at floor scale.
+
+Generates --machines machines and --tasks tasks into a throwaway SQLite
+database (all tasks open and all projects active, so every assigned task is
+queued), then times:
+
+  full         cold solve of every machine
+  warm         read with nothing changed
+  task_change  one task's priority edited, then read
+  status       one machine set to setup, then read
+  forced_full  same data, full re-solve forced through the "schedule" counter
+
+    python bench/schedule.py --machines 200 --tasks 50000
+"""
+import argparse, os, random, statistics, sys, tempfile, time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+
+def timed(fn, repeat):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        times.append((time.perf_counter() - start) * 1000)
+    return statistics.median(times)
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--machines", type=int, default=200)
+    ap.add_argument("--tasks", type=int, default=50000)
+    ap.add_argument("--repeat", type=int, default=5)
+    ap.add_argument("--seed", type=int, default=42)
+    args = ap.parse_args()
+
+    os.environ["DATABASE_URL"] = f"sqlite:///{tempfile.mkdtemp()}/bench.db"
+    import app as appmod
+    import datagen, rollups, scheduling
+    from models import db, Machine, Project, Task, TaskAssignment
+    app = appmod.create_app()
+    appmod.init_db(app)
+    rnd = random.Random(args.seed)
+
+    with app.app_context():
+        datagen.generate(users=200, machines=args.machines, projects=max(args.tasks // 20, 1), tasks=args.tasks,
+                         comments=0, audits=0, archived_ratio=0, seed=args.seed)
+        db.session.execute(db.update(Task).where(Task.state == "done").values(state="ready"))
+        db.session.execute(db.update(Machine).values(status="available"))
+        rollups.rebuild_all()
+        scheduling.touch(db.session.connection(), everything=True)
+        db.session.commit()
+        queued = db.session.query(db.func.count(db.distinct(TaskAssignment.task_id))).filter(
+            TaskAssignment.machine_id.isnot(None)).scalar()
+        task_ids = [t for (t,) in db.session.query(TaskAssignment.task_id).filter(TaskAssignment.machine_id.isnot(None))]
+        stats = lambda: dict(app.extensions["schedule"]["stats"])
+        print(f"{args.machines} machines, {args.tasks} tasks, {queued} queued on machines")
+
+        results = {}
+        results["full"] = timed(lambda: (scheduling.touch(db.session.connection(), everything=True),
+                                         db.session.commit(), scheduling.floor()), 1)
+
+        results["warm"] = timed(scheduling.floor, args.repeat)
+
+        def task_change():
+            t = db.session.get(Task, rnd.choice(task_ids))
+            t.priority = rnd.randint(1, 5)
+            db.session.commit()
+            scheduling.floor()
+        before = stats()
+        results["task_change"] = timed(task_change, args.repeat)
+        solved_per_change = (stats()["machine_solves"] - before["machine_solves"]) / args.repeat
+
+        def status_change():
+            m = db.session.get(Machine, rnd.randint(1, args.machines))
+            m.status = "setup" if m.status == "available" else "available"
+            db.session.commit()
+            scheduling.floor()
+        results["status"] = timed(status_change, args.repeat)
+
+        def forced_full():
+            scheduling.touch(db.session.connection(), everything=True)
+            db.session.commit()
+            scheduling.floor()
+        results["forced_full"] = timed(forced_full, args.repeat)
+
+        load = scheduling.machine_load()
+    for name, ms in results.items():
+        print(f"{name:12} {ms:9.1f} ms")
+    print(f"machines re-solved per task change: {solved_per_change:.1f}")
+    print(f"late tasks: {sum(r['late'] for r in load)}, busiest machine load: {max(r['load_pct'] or 0 for r in load)}%")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+"""Search latency at shop scale.
+
+Generates --tasks tasks and --comments comments into a throwaway SQLite
+database (datagen builds the FTS5 index at the end), then times search()
+for a mix of queries -- job code prefixes, rare and common words, several
+words, a kind filter, a deep page -- plus the flush cost of re-indexing one
+edited task and one new comment.
+
+    python bench/search.py --tasks 500000 --comments 2000000
+"""
+import argparse, os, random, statistics, sys, tempfile, time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+
+def timed(fn, repeat):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        times.append((time.perf_counter() - start) * 1000)
+    return statistics.median(times)
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--projects", type=int, default=20000)
+    ap.add_argument("--tasks", type=int, default=500000)
+    ap.add_argument("--comments", type=int, default=2000000)
+    ap.add_argument("--repeat", type=int, default=5)
+    ap.add_argument("--seed", type=int, default=42)
+    args = ap.parse_args()
+
+    os.environ["DATABASE_URL"] = f"sqlite:///{tempfile.mkdtemp()}/bench.db"
+    import app as appmod
+    import datagen, search
+    from models import db, Comment, Task
+    app = appmod.create_app()
+    appmod.init_db(app)
+    rnd = random.Random(args.seed)
+
+    with app.app_context(), app.test_request_context():
+        started = time.perf_counter()
+        datagen.generate(users=200, machines=50, projects=args.projects, tasks=args.tasks,
+                         comments=args.comments, audits=0, seed=args.seed,
+                         report=lambda table, n, secs: print(f"  {table:22} {n:>9} rows  {secs:7.1f}s"))
+        print(f"generated in {time.perf_counter() - started:.0f}s")
+
+        code = f"JOB-{args.projects // 2:06d}"
+        queries = {
+            "code_exact": (code, None, 0),
+            "code_prefix": (code[:-2], None, 0),
+            "rare_word": ("revised", None, 0),
+            "two_words": ("tool broke", None, 0),
+            "common_word": ("note", None, 0),
+            "task_only": ("finish mill", "task", 0),
+            "deep_page": ("deburr", None, 2000),
+            "no_match": ("zzzyx", None, 0),
+        }
+        print(f"{'query':12} {'ms':>8}  hits  first")
+        for name, (q, kind, offset) in queries.items():
+            ms = timed(lambda: search.search(q, kind, offset), args.repeat)
+            items, _, _ = search.search(q, kind, offset)
+            first = f"{items[0]['kind']} {items[0]['id']}" if items else "-"
+            print(f"{name:12} {ms:8.1f}  {len(items):4}  {first}")
+
+        def edit_task():
+            t = db.session.get(Task, rnd.randint(1, args.tasks))
+            t.title = f"Finish mill OP{rnd.randint(1, 9)}0"
+            db.session.commit()
+
+        def add_comment():
+            db.session.add(Comment(task_id=rnd.randint(1, args.tasks), user_id=1, body="Chatter on finish pass"))
+            db.session.commit()
+        print(f"{'edit_task':12} {timed(edit_task, args.repeat):8.1f}  (flush + re-index + commit)")
+        print(f"{'add_comment':12} {timed(add_comment, args.repeat):8.1f}  (flush + index + commit)")
+
+
+if __name__ == "__main__":
+    main()
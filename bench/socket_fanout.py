@@ -0,0 +1,72 @@
+"""Server CPU per task update with N connected Socket.IO clients.
+
+"before" replays the old client behaviour (every client re-fetches widgets,
+workload and progress.json after each task update event); "after" is the
+current behaviour where the delta is computed once and pushed. Every client
+is an unfiltered dashboard, so each one receives every update.
+
+    python bench/socket_fanout.py --clients 200 --tasks 2000 --updates 20
+"""
+import argparse, os, sys, tempfile, time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def build(tasks):
+    os.environ["DATABASE_URL"] = f"sqlite:///{tempfile.mkdtemp()}/bench.db"
+    os.environ["SOCKETIO_COALESCE_MS"] = "0"  # one event per update, counted right after the request
+    import app as appmod
+    from models import db, Task, TaskAssignment
+    app = appmod.create_app()
+    appmod.init_db(app)
+    appmod.seed_demo(app)
+    with app.app_context():
+        for i in range(tasks):
+            t = Task(project_id=1 + i % 2, title=f"Op {i}", state="ready", est_hours=1.5, created_by=1)
+            db.session.add(t)
+            db.session.flush()
+            db.session.add(TaskAssignment(task_id=t.id, user_id=1 + i % 3))
+        db.session.commit()
+    return app
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--clients", type=int, default=200)
+    ap.add_argument("--tasks", type=int, default=2000)
+    ap.add_argument("--updates", type=int, default=20)
+    args = ap.parse_args()
+
+    app = build(args.tasks)
+    http = app.test_client()
+    http.post("/login", data={"email": "admin@example.com", "password": "Password"})
+    clients = [app.socketio.test_client(app, flask_test_client=http, auth={"view": "dashboard"})
+               for _ in range(args.clients)]
+    states = ["in_progress", "blocked"]
+
+    def update(i):
+        http.patch("/tasks/1", json={"state": states[i % 2]})
+        received = sum(len(c.get_received()) for c in clients)
+        assert received == len(clients), received
+
+    start = time.process_time()
+    for i in range(args.updates):
+        update(i)
+        for _ in clients:
+            http.get("/dashboard/widgets")
+            http.get("/dashboard/workload")
+            http.get("/dashboard/progress.json")
+    before = (time.process_time() - start) / args.updates
+
+    start = time.process_time()
+    for i in range(args.updates):
+        update(i)
+    after = (time.process_time() - start) / args.updates
+
+    print(f"clients={args.clients} tasks={args.tasks} updates={args.updates}")
+    print(f"before: {before * 1000:.1f} ms CPU per update (client re-fetch)")
+    print(f"after:  {after * 1000:.1f} ms CPU per update (pushed delta)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+"""Socket.IO messages sent per task update: global fan-out vs rooms.
+
+Connects --clients logged-in Socket.IO test clients to one app with a
+datagen shop of --projects jobs, then PATCHes random tasks and counts the
+tasks_updated messages the clients received, plus server CPU per update:
+
+  broadcast  every client is an unfiltered dashboard, i.e. what every client
+             received when updates went to everyone
+  projects   clients spread evenly over the job pages (project:<id> rooms)
+  mixed      90% job pages, 8% dashboards filtered to one user, 2% unfiltered
+             dashboards
+  burst      --burst updates to one job inside one coalescing window
+             (SOCKETIO_COALESCE_MS, default 50): messages per job-page client
+
+    python bench/socket_rooms.py --clients 1000 --projects 100
+"""
+import argparse, os, random, sys, tempfile, time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--clients", type=int, default=1000)
+    ap.add_argument("--projects", type=int, default=100)
+    ap.add_argument("--users", type=int, default=50)
+    ap.add_argument("--updates", type=int, default=50)
+    ap.add_argument("--burst", type=int, default=20)
+    ap.add_argument("--window-ms", type=int, default=50)
+    ap.add_argument("--seed", type=int, default=42)
+    args = ap.parse_args()
+
+    os.environ["DATABASE_URL"] = f"sqlite:///{tempfile.mkdtemp()}/bench.db"
+    os.environ["SOCKETIO_ASYNC_MODE"] = "threading"
+    os.environ["SOCKETIO_COALESCE_MS"] = "0"  # counted right after each request; the burst run opens a window
+    import app as appmod
+    import datagen
+    from models import db, Task
+    app = appmod.create_app()
+    appmod.init_db(app)
+    rnd = random.Random(args.seed)
+    with app.app_context():
+        datagen.generate(users=args.users, machines=20, projects=args.projects, tasks=args.projects * 20,
+                         comments=0, audits=0, archived_ratio=0, seed=args.seed)
+        tasks = db.session.query(Task.id, Task.project_id).all()
+    http = app.test_client()
+    http.post("/login", data={"email": "user1@shop.example", "password": "Password"})
+
+    def connect(views):
+        return [app.socketio.test_client(app, flask_test_client=http, auth=v) for v in views]
+
+    def run(clients, picks):
+        for c in clients:
+            c.get_received()
+        received, cpu = 0, 0.0
+        for i, tid in enumerate(picks):
+            start = time.process_time()
+            http.patch(f"/tasks/{tid}", json={"state": ("in_progress", "review")[i % 2]})
+            cpu += time.process_time() - start
+            received += sum(len(c.get_received()) for c in clients)
+        return received / len(picks), cpu / len(picks) * 1000
+
+    page = lambda i: {"view": "project", "project": 1 + i % args.projects}
+    scenarios = {
+        "broadcast": [{"view": "dashboard"}] * args.clients,
+        "projects": [page(i) for i in range(args.clients)],
+        "mixed": [page(i) if i % 50 < 45 else {"view": "dashboard", "user": 1 + i % args.users} if i % 50 < 49
+                  else {"view": "dashboard"} for i in range(args.clients)],
+    }
+    picks = [rnd.choice(tasks).id for _ in range(args.updates)]
+    print(f"{args.clients} clients, {args.projects} projects, {len(tasks)} tasks, {args.updates} updates")
+    print(f"{'scenario':10} {'msgs/update':>12} {'cpu ms/update':>14}")
+    for name, views in scenarios.items():
+        clients = connect(views)
+        msgs, cpu = run(clients, picks)
+        print(f"{name:10} {msgs:12.1f} {cpu:14.1f}")
+        for c in clients:
+            c.disconnect()
+
+    # Burst: one job's tasks updated back to back inside one window
+    emitter = app.extensions["realtime"]
+    emitter.window = args.window_ms / 1000
+    clients = connect(scenarios["projects"])
+    pid = 1 + rnd.randrange(args.projects)
+    mine = [c for c, v in zip(clients, scenarios["projects"]) if v["project"] == pid]
+    job_tasks = [t.id for t in tasks if t.project_id == pid]
+    for c in clients:
+        c.get_received()
+    for i in range(args.burst):
+        http.patch(f"/tasks/{job_tasks[i % len(job_tasks)]}", json={"state": ("in_progress", "review")[i % 2]})
+    time.sleep(emitter.window * 3)
+    got = [len(c.get_received()) for c in mine]
+    print(f"burst      {args.burst} updates to one job in {args.window_ms} ms windows -> "
+          f"{sum(got) / len(mine):.1f} messages per job-page client ({len(mine)} clients)")
+
+
+if __name__ == "__main__":
+    main()
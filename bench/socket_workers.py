@@ -0,0 +1,132 @@
+"""Check that a task update handled by one worker reaches a client on another.
+
+Starts two worker processes sharing a database and SOCKETIO_MESSAGE_QUEUE
+(a temporary SQLite queue by default, or e.g. --queue redis://localhost:6379/0).
+Worker B serves Socket.IO on a local port and a websocket client connects to
+it as a logged-in unfiltered dashboard; worker A PATCHes a task through its
+own app. The client on B must receive the tasks_updated event that A emitted
+to the dashboard room.
+
+    python bench/socket_workers.py [--queue redis://localhost:6379/0]
+"""
+import argparse, json, multiprocessing, os, socket, sys, tempfile, time, urllib.parse, urllib.request
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+
+def _app(env):
+    os.environ.update(env)
+    import app as appmod
+    return appmod, appmod.create_app()
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def worker_b(env, port):
+    _, app = _app(env)
+    app.socketio.run(app, host="127.0.0.1", port=port, allow_unsafe_werkzeug=True, log_output=False)
+
+
+def worker_a(env):
+    _, app = _app(env)
+    client = app.test_client()
+    client.post("/login", data={"email": "admin@example.com", "password": "Password"})
+    resp = client.patch("/tasks/1", json={"state": "review"})
+    assert resp.status_code < 400, resp.status_code
+
+
+def login(port, timeout=10):
+    """Session cookie for the demo admin on worker B."""
+    form = urllib.parse.urlencode({"email": "admin@example.com", "password": "Password"}).encode()
+    cookies = urllib.request.HTTPCookieProcessor()
+    opener = urllib.request.build_opener(cookies)
+    deadline = time.time() + timeout
+    while True:
+        try:
+            opener.open(f"http://127.0.0.1:{port}/login", form, timeout)
+            break
+        except OSError:
+            if time.time() > deadline:
+                raise
+            time.sleep(0.2)
+    return "; ".join(f"{c.name}={c.value}" for c in cookies.cookiejar)
+
+
+def connect(port, timeout=10, view=None):
+    """Engine.IO v4 websocket handshake + default namespace connect as ``view`` (default: the dashboard)."""
+    import simple_websocket
+    cookie = login(port, timeout)
+    ws = simple_websocket.Client.connect(f"ws://127.0.0.1:{port}/socket.io/?EIO=4&transport=websocket",
+                                         headers={"Cookie": cookie})
+    # Connect the namespace before reading the open packet: when it arrives in the same read as the
+    # handshake response, simple_websocket only surfaces it once more data follows
+    ws.send("40" + json.dumps(view or {"view": "dashboard"}))
+    assert ws.receive(timeout).startswith("0")  # engine.io open
+    assert ws.receive(timeout).startswith("40")  # namespace connected
+    return ws
+
+
+def wait_for(ws, event, timeout):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        msg = ws.receive(max(deadline - time.time(), 0.01))
+        if msg is None:
+            continue
+        if msg == "2":
+            ws.send("3")  # pong
+        elif msg.startswith("42"):
+            name, *args = json.loads(msg[2:])
+            if name == event:
+                return args[0] if args else None
+    return None
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--queue", help="SOCKETIO_MESSAGE_QUEUE (default: a temporary SQLite queue)")
+    ap.add_argument("--timeout", type=float, default=10)
+    args = ap.parse_args()
+
+    tmp = tempfile.mkdtemp()
+    env = {
+        "DATABASE_URL": f"sqlite:///{tmp}/shop.db",
+        "SOCKETIO_MESSAGE_QUEUE": args.queue or f"sqlite:///{tmp}/socketio.db",
+        "SOCKETIO_ASYNC_MODE": "threading",
+    }
+    appmod, app = _app(env)
+    appmod.init_db(app)
+    appmod.seed_demo(app)
+
+    ctx = multiprocessing.get_context("spawn")
+    port = free_port()
+    b = ctx.Process(target=worker_b, args=(env, port), daemon=True)
+    b.start()
+    try:
+        ws = connect(port, args.timeout)
+        started = time.perf_counter()
+        a = ctx.Process(target=worker_a, args=(env,))
+        a.start()
+        payload = wait_for(ws, "tasks_updated", args.timeout)
+        elapsed = (time.perf_counter() - started) * 1000
+        a.join(args.timeout)
+        ws.close()
+    finally:
+        b.terminate()
+        b.join(5)
+
+    backend = env["SOCKETIO_MESSAGE_QUEUE"].split(":")[0]
+    if payload and payload["tasks"] == [{"id": 1, "state": "review"}]:
+        print(f"ok: client on worker B got tasks_updated from worker A via {backend} in {elapsed:.0f}ms "
+              f"(includes A's startup)")
+        return 0
+    print(f"FAIL: client on worker B got {payload!r} via {backend}")
+    return 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
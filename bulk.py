@@ -0,0 +1,248 @@
+from datetime import datetime
+from sqlalchemy.orm import selectinload
+
+from models import db, User, Machine, Task, TaskAssignment, TASK_STATES, to_date, insert_ids
+import audit
+import changelog
+import rollups
+import scheduling
+import search
+
+# ----------------------
+# Bulk task operations
+# ----------------------
+# Both entry points validate the whole batch first, then apply it to the
+# current session with one statement per kind of change and one audit batch
+# insert. They never commit: the route commits once and emits one coalesced
+# socket event. Errors are {"row": index, "id": task id, "field", "error"}.
+# New task and assignment rows go in as core batch inserts, which bypass the
+# flush hooks, so the progress rollup, change counters and search index are
+# updated here.
+
+MAX_ROWS = 1000
+TITLE_MAX = 200
+TASK_DEFAULTS = {"description": "", "state": "backlog", "priority": 3, "est_hours": 0.0, "due_date": None}
+
+task_table = Task.__table__
+assignment_table = TaskAssignment.__table__
+
+
+def _error(errors, row, field, message, task_id=None):
+    e = {"row": row, "field": field, "error": message}
+    if task_id is not None:
+        e["id"] = task_id
+    errors.append(e)
+
+
+def _int_list(value):
+    if value is None:
+        return []
+    if not isinstance(value, list):
+        value = [value]
+    return [int(v) for v in value]
+
+
+def _clean(data, row, errors, creating=False, task_id=None):
+    """Validated column values plus assign/unassign user ids for one row."""
+    values = {}
+    if creating or "title" in data:
+        title = (data.get("title") or "").strip()
+        if not title:
+            _error(errors, row, "title", "required", task_id)
+        elif len(title) > TITLE_MAX:
+            _error(errors, row, "title", f"longer than {TITLE_MAX} characters", task_id)
+        else:
+            values["title"] = title
+    if creating and "description" in data:
+        values["description"] = (data.get("description") or "").strip()
+    if "state" in data:
+        if data["state"] in TASK_STATES:
+            values["state"] = data["state"]
+        else:
+            _error(errors, row, "state", f"must be one of {', '.join(TASK_STATES)}", task_id)
+    if "priority" in data:
+        try:
+            priority = int(data["priority"])
+            if not 1 <= priority <= 5:
+                raise ValueError
+            values["priority"] = priority
+        except (TypeError, ValueError):
+            _error(errors, row, "priority", "must be an integer from 1 to 5", task_id)
+    if "est_hours" in data:
+        try:
+            hours = float(data["est_hours"] or 0.0)
+            if hours < 0:
+                raise ValueError
+            values["est_hours"] = hours
+        except (TypeError, ValueError):
+            _error(errors, row, "est_hours", "must be a non-negative number", task_id)
+    if "due_date" in data:
+        raw = data["due_date"]
+        due = to_date(raw)
+        if raw and due is None:
+            _error(errors, row, "due_date", "expected YYYY-MM-DD or MM/DD/YYYY", task_id)
+        else:
+            values["due_date"] = due
+
+    links = {}
+    for key in ("assign", "unassign"):
+        try:
+            links[key] = _int_list(data.get(key))
+        except (TypeError, ValueError):
+            _error(errors, row, key, "must be a list of user ids", task_id)
+            links[key] = []
+    links["machine_id"] = None
+    if data.get("machine_id") not in (None, ""):
+        try:
+            links["machine_id"] = int(data["machine_id"])
+        except (TypeError, ValueError):
+            _error(errors, row, "machine_id", "must be a machine id", task_id)
+    return values, links
+
+
+def _check_refs(rows, errors):
+    """One query each for every user / machine id referenced by the batch."""
+    user_ids = {u for _, _, links in rows for key in ("assign", "unassign") for u in links[key]}
+    machine_ids = {links["machine_id"] for _, _, links in rows if links["machine_id"] is not None}
+    known_users = {i for (i,) in db.session.query(User.id).filter(User.id.in_(user_ids))} if user_ids else set()
+    known_machines = ({i for (i,) in db.session.query(Machine.id).filter(Machine.id.in_(machine_ids))}
+                      if machine_ids else set())
+    for row, task_id, links in rows:
+        for key in ("assign", "unassign"):
+            missing = [u for u in links[key] if u not in known_users]
+            if missing:
+                _error(errors, row, key, f"unknown user ids {missing}", task_id)
+        if links["machine_id"] is not None and links["machine_id"] not in known_machines:
+            _error(errors, row, "machine_id", f"unknown machine id {links['machine_id']}", task_id)
+
+
+def _date_str(d):
+    return str(d) if d else None
+
+
+def update_tasks(items, actor_id=None):
+    """Apply per-task changes [{"id", state/priority/due_date/title, assign, unassign, machine_id}].
+
+    All or nothing: returns (tasks, befores, removed_user_ids, changes, errors)
+    and leaves the session untouched when ``errors`` is non-empty.
+    """
+    errors = []
+    if not items:
+        _error(errors, None, "tasks", "no tasks given")
+    elif len(items) > MAX_ROWS:
+        _error(errors, None, "tasks", f"at most {MAX_ROWS} tasks per request")
+    if errors:
+        return [], [], set(), {}, errors
+
+    parsed = []
+    for row, data in enumerate(items):
+        try:
+            task_id = int(data["id"])
+        except (KeyError, TypeError, ValueError):
+            _error(errors, row, "id", "required")
+            continue
+        values, links = _clean(data, row, errors, task_id=task_id)
+        parsed.append((row, task_id, values, links))
+    ids = [task_id for _, task_id, _, _ in parsed]
+    tasks = {t.id: t for t in Task.query.filter(Task.id.in_(ids)).options(selectinload(Task.assignments))} if ids else {}
+    for row, task_id, _, _ in parsed:
+        if task_id not in tasks:
+            _error(errors, row, "id", "task not found", task_id)
+    _check_refs([(row, task_id, links) for row, task_id, _, links in parsed], errors)
+    if errors:
+        return [], [], set(), {}, errors
+
+    touched, befores, removed, changes, entries, links_added, pending = {}, [], set(), {}, [], [], set()
+    for row, task_id, values, links in parsed:
+        t = tasks[task_id]
+        old = {"state": t.state, "priority": t.priority, "due_date": _date_str(t.due_date), "title": t.title}
+        if task_id not in touched:
+            befores.append({"state": t.state, "due_date": t.due_date})
+        touched[task_id] = t
+        changed = {}
+        for key, value in values.items():
+            # Only real changes are written, so an unchanged row keeps its updated_at and stays out of the log
+            if getattr(t, key) == value:
+                continue
+            setattr(t, key, value)
+            changed[key] = _date_str(value) if key == "due_date" else value
+        if changed:
+            entries.append(("task", t.id, "update", {"before": old, "after": changed}))
+            changes.setdefault(task_id, {}).update(changed)
+
+        current = {ta.user_id: ta for ta in t.assignments}
+        added = [u for u in dict.fromkeys(links["assign"]) if u not in current and (task_id, u) not in pending]
+        pending.update((task_id, u) for u in added)
+        links_added += [{"task_id": t.id, "user_id": uid, "machine_id": links["machine_id"]} for uid in added]
+        if added:
+            entries.append(("task", t.id, "assign", {"user_ids": added, "machine_id": links["machine_id"]}))
+        dropped = [u for u in dict.fromkeys(links["unassign"]) if u in current and u not in added]
+        for uid in dropped:
+            t.assignments.remove(current[uid])
+        if dropped:
+            entries.append(("task", t.id, "unassign", {"user_ids": dropped}))
+            removed.update(dropped)
+        if added or dropped:
+            changes.setdefault(task_id, {})["assignees"] = True
+
+    db.session.flush()
+    if links_added:
+        conn = db.session.connection()
+        conn.execute(assignment_table.insert(), links_added)
+        rollups._bump(conn, "dashboard")
+        scheduling.touch(conn, {link["machine_id"] for link in links_added})
+        changelog.record(conn, "task", [link["task_id"] for link in links_added])
+    audit.record_many(entries, actor_id=actor_id)
+    return list(touched.values()), befores, removed, changes, []
+
+
+def create_tasks(project, items, actor_id=None, skip_invalid=False):
+    """Create tasks for ``project`` from [{"title", description, state, priority, est_hours, due_date, assign, machine_id}].
+
+    Returns (new task ids, errors). With ``skip_invalid`` the valid rows are
+    still created; otherwise any error leaves the session untouched.
+    """
+    errors = []
+    if not items:
+        _error(errors, None, "tasks", "no tasks given")
+    elif len(items) > MAX_ROWS:
+        _error(errors, None, "tasks", f"at most {MAX_ROWS} tasks per request")
+    if errors:
+        return [], errors
+
+    parsed = []
+    for row, data in enumerate(items):
+        if not isinstance(data, dict):
+            _error(errors, row, "row", "expected an object")
+            continue
+        values, links = _clean(data, row, errors, creating=True)
+        parsed.append((row, values, links))
+    _check_refs([(row, None, links) for row, _, links in parsed], errors)
+    if errors and not skip_invalid:
+        return [], errors
+    bad_rows = {e["row"] for e in errors}
+    parsed = [p for p in parsed if p[0] not in bad_rows]
+    if not parsed:
+        return [], errors
+
+    now = datetime.utcnow()
+    conn = db.session.connection()
+    ids = insert_ids(conn, task_table, [
+        {**TASK_DEFAULTS, **values, "project_id": project.id, "created_by": actor_id, "created_at": now, "updated_at": now}
+        for _, values, _ in parsed])
+    links_added, entries = [], []
+    for tid, (_, values, links) in zip(ids, parsed):
+        entries.append(("task", tid, "create", {"title": values["title"], "project_id": project.id}))
+        users = list(dict.fromkeys(links["assign"]))
+        if users:
+            links_added += [{"task_id": tid, "user_id": uid, "machine_id": links["machine_id"]} for uid in users]
+            entries.append(("task", tid, "assign", {"user_ids": users, "machine_id": links["machine_id"]}))
+    if links_added:
+        conn.execute(assignment_table.insert(), links_added)
+        scheduling.touch(conn, {link["machine_id"] for link in links_added})
+    rollups._rebuild(conn, [project.id])
+    search.index(conn, "task", ids, new=True)
+    changelog.record(conn, "task", ids)
+    rollups._bump(conn, "dashboard")
+    audit.record_many(entries, actor_id=actor_id)
+    return ids, errors
@@ -0,0 +1,225 @@
+import os
+from datetime import datetime, timedelta
+from flask import current_app
+from sqlalchemy import event, func, inspect, select
+from sqlalchemy.orm import joinedload, selectinload
+
+from models import db, User, Project, Task, TaskAssignment, Comment, ChangeLog, ChangeCounter, TASK_STATES
+import dashboard_data
+
+# ----------------------
+# Change log & delta sync
+# ----------------------
+# Every write to a project, task, task assignment or comment appends a
+# ChangeLog row (entity type + id) in the same transaction; the row id is
+# the sync version. Assignments are logged as their task, whose entry
+# carries the assignees. Task rows also keep the task's project (old and new
+# on a move) so a tombstone still says whose progress changed. The
+# after_flush hook below covers ORM writes; core bulk paths (bulk.py,
+# imports.py, archive.py) call record() themselves.
+#
+# sync(since) compacts the rows after ``since`` to one entry per entity,
+# read from its current row: the latest state, or a tombstone when the row
+# is gone (deleted or archived). Clients that are behind the pruned floor,
+# more than SYNC_MAX_CHANGES entities behind, or have no version yet get
+# {"full": true} and a snapshot of the dashboard instead.
+#
+# The version handed back stops at the newest row older than
+# SYNC_SETTLE_SECONDS: with concurrent writers a lower id can commit after a
+# higher one is read, so newer entries are sent again on the next sync
+# (applying an entry twice is harmless). prune() drops rows older than
+# SYNC_RETENTION_DAYS and raises the floor.
+
+LOGGED = {Project: "project", Task: "task", Comment: "comment"}
+FLOOR = "sync_floor"  # ChangeCounter: highest pruned version
+PRUNE_BATCH = 5000
+
+log_table = ChangeLog.__table__
+counter_table = ChangeCounter.__table__
+
+
+def init_app(app):
+    app.config.setdefault("SYNC_MAX_CHANGES", int(os.getenv("SYNC_MAX_CHANGES", "500")))
+    app.config.setdefault("SYNC_SETTLE_SECONDS", float(os.getenv("SYNC_SETTLE_SECONDS", "5")))
+    app.config.setdefault("SYNC_RETENTION_DAYS", int(os.getenv("SYNC_RETENTION_DAYS", "7")))
+
+
+# -------- Writing --------
+def record(conn, kind, ids, project_ids=None):
+    """Log writes to ``ids`` of one kind ("project", "task", "comment") made outside the ORM.
+
+    ``project_ids`` maps task ids to their project, for tasks that are being removed.
+    """
+    now, project_ids = datetime.utcnow(), project_ids or {}
+    rows = [{"entity_type": kind, "entity_id": i, "project_id": project_ids.get(i), "at": now}
+            for i in dict.fromkeys(ids)]
+    if rows:
+        conn.execute(log_table.insert(), rows)
+
+
+def _task_projects(task, values):
+    # Current project plus the one it left; loaded values only, like the rest of the hook
+    state = inspect(task)
+    ids = {values.get("project_id"), *state.attrs.project_id.history.deleted}
+    ids.update(inspect(p).dict.get("id") for p in state.attrs.project.history.deleted if p is not None)
+    ids.discard(None)
+    return ids or {None}
+
+
+@event.listens_for(db.session, "after_flush")
+def _log_changes(session, flush_context):
+    changed = set()
+    for obj in (*session.new, *session.dirty, *session.deleted):
+        if obj in session.dirty and not session.is_modified(obj):
+            continue
+        # Loaded values only: a deleted row can't be refreshed
+        values = inspect(obj).dict
+        if isinstance(obj, TaskAssignment) and values.get("task_id"):
+            changed.add(("task", values["task_id"], None))
+        elif isinstance(obj, Task) and values.get("id"):
+            changed.update(("task", values["id"], pid) for pid in _task_projects(obj, values))
+        elif type(obj) in LOGGED and values.get("id"):
+            changed.add((LOGGED[type(obj)], values["id"], None))
+    if changed:
+        now = datetime.utcnow()
+        session.connection().execute(log_table.insert(), [
+            {"entity_type": kind, "entity_id": i, "project_id": pid, "at": now}
+            for kind, i, pid in sorted(changed, key=lambda c: (c[0], c[1], c[2] or 0))])
+
+
+# -------- Reading --------
+def _floor(conn):
+    return conn.execute(select(counter_table.c.value).where(counter_table.c.name == FLOOR)).scalar() or 0
+
+
+def _newest_before(conn, cutoff):
+    # ix_change_log_at walks back from the cutoff; ids follow ``at`` closely enough for a version
+    return conn.execute(select(log_table.c.id).where(log_table.c.at < cutoff)
+                        .order_by(log_table.c.at.desc()).limit(1)).scalar()
+
+
+def version(conn=None):
+    """Current settled sync version; read it before the data it versions."""
+    conn = conn or db.session.connection()
+    cutoff = datetime.utcnow() - timedelta(seconds=current_app.config["SYNC_SETTLE_SECONDS"])
+    return max(_newest_before(conn, cutoff) or 0, _floor(conn))
+
+
+def _iso(d):
+    return d.isoformat() if d else None
+
+
+# Dates go out as ISO (YYYY-MM-DD) across the whole payload; app.js formats them for display
+def _task_entry(t):
+    return {**dashboard_data.card(t), "due": _iso(t.due_date), "state": t.state, "project_id": t.project_id,
+            "assignee_ids": [a.user_id for a in t.assignments if a.user_id],
+            "board": bool(t.project) and t.project.status != "archived"}
+
+
+def _load(kind, ids):
+    """{id: entry data} for the ``ids`` of one kind that still exist."""
+    if kind == "task":
+        q = Task.query.options(joinedload(Task.project), selectinload(Task.assignments).joinedload(TaskAssignment.user))
+        return {t.id: _task_entry(t) for t in q.filter(Task.id.in_(ids))}
+    if kind == "project":
+        return {p.id: {"code": p.code, "title": p.title, "customer": p.customer, "status": p.status,
+                       "due": _iso(p.due_date)}
+                for p in Project.query.filter(Project.id.in_(ids))}
+    # Ids only, like the socket events: clients fetch bodies from comments.json
+    return {cid: {"task_id": tid, "by": name} for cid, tid, name in db.session.query(
+        Comment.id, Comment.task_id, User.name).outerjoin(User, User.id == Comment.user_id).filter(Comment.id.in_(ids))}
+
+
+def _widget_item(t):
+    return {**dashboard_data.task_item(t), "due": _iso(t.due_date)}
+
+
+def _widgets(filter_user_id, project_ids=None):
+    blocked, blocked_next = dashboard_data.blocked_page()
+    return {
+        "progress": dashboard_data.project_progress(project_ids),
+        "workload": [{"name": name, "count": count, "hours": hrs}
+                     for name, count, hrs in dashboard_data.workload(filter_user_id)],
+        "due_soon": [_widget_item(t) for t in dashboard_data.due_soon()],
+        "blocked": [_widget_item(t) for t in blocked],
+        "blocked_next": blocked_next,
+    }
+
+
+def snapshot(filter_user_id=None, current=None):
+    """Everything the dashboard shows: first page of each Kanban column, counts and widgets."""
+    current = version() if current is None else current
+    columns = {}
+    for state in TASK_STATES:
+        tasks, next_cursor = dashboard_data.kanban_column(state, filter_user_id)
+        columns[state] = {"items": [_task_entry(t) for t in tasks], "next": next_cursor}
+    return {"full": True, "version": current, "columns": columns,
+            "counts": dashboard_data.kanban_counts(filter_user_id), "delta": _widgets(filter_user_id)}
+
+
+def _touched_projects(conn, since, changes):
+    """Projects whose progress the ``changes`` may have moved; None when a tombstone's is unknown."""
+    logged = conn.execute(select(log_table.c.entity_id, log_table.c.project_id).distinct().where(
+        log_table.c.id > since, log_table.c.entity_type == "task", log_table.c.project_id.isnot(None))).all()
+    projects = {pid for _, pid in logged}
+    known = {i for i, _ in logged}
+    for c in changes:
+        if c["type"] == "project":
+            projects.add(c["id"])
+        elif c["type"] == "task" and "data" in c:
+            projects.add(c["data"]["project_id"])
+        elif c["type"] == "task" and c["id"] not in known:
+            return None  # logged before migration 9, or by a core path that didn't pass project_ids
+    return projects
+
+
+def sync(since, filter_user_id=None):
+    """Compacted changes after version ``since``; a snapshot() when that can't be answered."""
+    cfg = current_app.config
+    conn = db.session.connection()
+    current = version(conn)
+    newest = conn.execute(select(func.max(log_table.c.id))).scalar() or 0
+    if since is None or since < _floor(conn) or since > newest:
+        return snapshot(filter_user_id, current)
+    latest = func.max(log_table.c.id)
+    rows = conn.execute(select(log_table.c.entity_type, log_table.c.entity_id).where(log_table.c.id > since)
+                        .group_by(log_table.c.entity_type, log_table.c.entity_id).order_by(latest)
+                        .limit(cfg["SYNC_MAX_CHANGES"] + 1)).all()
+    if len(rows) > cfg["SYNC_MAX_CHANGES"]:
+        return snapshot(filter_user_id, current)
+    by_kind = {}
+    for kind, i in rows:
+        by_kind.setdefault(kind, []).append(i)
+    found = {kind: _load(kind, ids) for kind, ids in by_kind.items()}
+    changes = []
+    for kind, i in rows:
+        data = found[kind].get(i)
+        changes.append({"type": kind, "id": i, "data": data} if data is not None
+                       else {"type": kind, "id": i, "deleted": True})
+    out = {"full": False, "version": max(current, since), "changes": changes}
+    if "task" in by_kind or "project" in by_kind:
+        out["delta"] = _widgets(filter_user_id, _touched_projects(conn, since, changes))
+    return out
+
+
+# -------- Maintenance --------
+def prune(retention_days=None):
+    """Drop log rows older than the retention window and raise the floor; returns rows removed."""
+    days = current_app.config["SYNC_RETENTION_DAYS"] if retention_days is None else retention_days
+    conn = db.session.connection()
+    upto = _newest_before(conn, datetime.utcnow() - timedelta(days=days))
+    removed = 0
+    if upto and upto > _floor(conn):
+        # Raise the floor first: a client between the old floor and ``upto`` must get a snapshot
+        res = conn.execute(counter_table.update().where(counter_table.c.name == FLOOR).values(value=upto))
+        if res.rowcount == 0:
+            conn.execute(counter_table.insert().values(name=FLOOR, value=upto))
+        while True:
+            batch = select(log_table.c.id).where(log_table.c.id <= upto).order_by(log_table.c.id).limit(PRUNE_BATCH)
+            n = conn.execute(log_table.delete().where(log_table.c.id.in_(batch))).rowcount
+            db.session.commit()
+            removed += n
+            if n < PRUNE_BATCH:
+                break
+            conn = db.session.connection()
+    return removed
@@ -0,0 +1,121 @@
+import threading
+from collections import OrderedDict
+from flask import current_app
+from sqlalchemy import event, func, select
+
+from models import db, User, Comment
+
+# ----------------------
+# Comment threads
+# ----------------------
+# Threads are read newest page first: page() returns up to `limit` comments
+# in posting order, a cursor for the page before them, and the thread's
+# last comment id. Clients that saw a comment id in a `tasks_updated` event
+# ask for `since=<last id>` and get only what was posted after it.
+#
+# The newest page of recently read threads is cached per process. The
+# after_flush hook drops a thread when this process writes to it; other
+# workers' comments are noticed by comparing the cached last id with the
+# thread's max(id), an index-only lookup, and only the new rows are read.
+
+PAGE_SIZE = 50
+MAX_PAGE = 200
+MAX_CACHED_THREADS = 1000
+
+
+def serialize(cid, body, created_at, user):
+    return {"id": cid, "user": user or "Unknown", "body": body,
+            "created_at": created_at.strftime("%Y-%m-%d %H:%M") if created_at else None}
+
+
+def page_query(task_id, before=None, after=None, limit=PAGE_SIZE):
+    """Comments with users joined: newest ``limit`` before ``before``, or the first ``limit`` after ``after``."""
+    q = (select(Comment.id, Comment.body, Comment.created_at, User.name)
+         .outerjoin(User, User.id == Comment.user_id)
+         .where(Comment.task_id == task_id))
+    if after is not None:
+        return q.where(Comment.id > after).order_by(Comment.id.asc()).limit(limit)
+    if before is not None:
+        q = q.where(Comment.id < before)
+    return q.order_by(Comment.id.desc()).limit(limit)
+
+
+def _rows(task_id, before=None, after=None, limit=PAGE_SIZE):
+    """Serialized page_query() rows, oldest first."""
+    rows = db.session.execute(page_query(task_id, before, after, limit)).all()
+    return [serialize(*r) for r in (rows if after is not None else reversed(rows))]
+
+
+def last_id(task_id):
+    return db.session.execute(select(func.max(Comment.id)).where(Comment.task_id == task_id)).scalar() or 0
+
+
+def _page(items, limit, last):
+    """(items, cursor for the page before, last id) from up to limit + 1 rows."""
+    more = len(items) > limit
+    items = items[-limit:] if more else items
+    return items, (str(items[0]["id"]) if more else None), last
+
+
+# -------- Cache --------
+def _app_cache():
+    return current_app.extensions.setdefault("comments", {
+        "lock": threading.Lock(), "threads": OrderedDict(), "stats": {"hits": 0, "appends": 0, "misses": 0}})
+
+
+def page(task_id, cursor=None, since=None, limit=PAGE_SIZE):
+    """One page of a thread: (items oldest first, cursor for older comments or None, last comment id).
+
+    ``cursor`` is a value returned by an earlier call; ``since`` is a comment
+    id, returning everything newer (up to ``limit``) with no older cursor.
+    Raises ValueError for a malformed cursor.
+    """
+    limit = max(1, min(limit, MAX_PAGE))
+    if since is not None:
+        items = _rows(task_id, after=since, limit=limit)
+        return items, None, items[-1]["id"] if items else since
+    if cursor:
+        before = int(cursor)
+        return _page(_rows(task_id, before=before, limit=limit + 1), limit, None)
+
+    # Newest page: served from the cache while nothing was posted since
+    cache = _app_cache()
+    last = last_id(task_id)
+    with cache["lock"]:
+        entry = cache["threads"].get(task_id)
+        if entry is not None:
+            cache["threads"].move_to_end(task_id)
+            if entry["last_id"] == last:
+                cache["stats"]["hits"] += 1
+                return _page(entry["items"], limit, last)
+    new = _rows(task_id, after=entry["last_id"], limit=MAX_PAGE + 1) if entry and entry["last_id"] < last else None
+    if new is not None and len(new) <= MAX_PAGE:
+        items = entry["items"] + new
+        cache["stats"]["appends"] += 1
+    else:
+        items = _rows(task_id, limit=MAX_PAGE + 1)
+        cache["stats"]["misses"] += 1
+    items = items[-(MAX_PAGE + 1):]
+    last = items[-1]["id"] if items else 0
+    with cache["lock"]:
+        cache["threads"][task_id] = {"last_id": last, "items": items}
+        cache["threads"].move_to_end(task_id)
+        while len(cache["threads"]) > MAX_CACHED_THREADS:
+            cache["threads"].popitem(last=False)
+    return _page(items, limit, last)
+
+
+def invalidate(task_ids):
+    cache = current_app.extensions.get("comments")
+    if not cache:
+        return
+    with cache["lock"]:
+        for tid in task_ids:
+            cache["threads"].pop(tid, None)
+
+
+@event.listens_for(db.session, "after_flush")
+def _drop_changed_threads(session, flush_context):
+    task_ids = {obj.task_id for obj in (*session.new, *session.dirty, *session.deleted) if isinstance(obj, Comment)}
+    if task_ids:
+        invalidate(task_ids)
@@ -0,0 +1,285 @@
+from datetime import date, datetime, timedelta
+from sqlalchemy import func, literal_column, or_
+from sqlalchemy.orm import joinedload, selectinload
+
+from models import db, User, Project, ProjectProgress, Task, TaskAssignment, TASK_STATES
+
+# ----------------------
+# Dashboard data access
+# ----------------------
+# Every helper here issues a fixed number of statements regardless of how
+# many tasks exist, so the dashboard routes never fall back to per-task
+# lazy loads.
+
+DUE_SOON_DAYS = 3
+DUE_SOON_LIMIT = 20
+KANBAN_PAGE_SIZE = 25
+DONE_WINDOW_DAYS = 14
+BLOCKED_LIMIT = 20
+NO_DUE_DATE = date(9999, 12, 31)  # sorts undated tasks after every real due date
+# Spelled as a literal so it matches the ix_task_board_order expression
+BOARD_DUE = func.coalesce(Task.due_date, literal_column("'9999-12-31'"))
+
+
+def _active_tasks_query(filter_user_id=None):
+    q = Task.query.join(Project).filter(Project.status != "archived")
+    if filter_user_id:
+        q = q.filter(Task.id.in_(
+            db.select(TaskAssignment.task_id).where(TaskAssignment.user_id == filter_user_id)
+        ))
+    return q
+
+
+def kanban_column_query(state, filter_user_id=None, cursor=None, limit=KANBAN_PAGE_SIZE):
+    """The statement behind kanban_column(): ``limit`` + 1 rows after ``cursor``.
+
+    Open columns walk ix_task_board_order (state, priority, BOARD_DUE, id) and
+    the done column ix_task_state_updated, so neither sorts in a temp B-tree.
+    """
+    q = (_active_tasks_query(filter_user_id)
+         .filter(Task.state == state)
+         .options(joinedload(Task.project),
+                  selectinload(Task.assignments).joinedload(TaskAssignment.user)))
+    if state == "done":
+        q = q.filter(Task.updated_at >= datetime.utcnow() - timedelta(days=DONE_WINDOW_DAYS))
+        if cursor:
+            at, tid = cursor.rsplit("_", 1)
+            at = datetime.fromisoformat(at)
+            q = q.filter(Task.updated_at <= at, or_(Task.updated_at < at, Task.id < int(tid)))
+        q = q.order_by(Task.updated_at.desc(), Task.id.desc())
+    else:
+        if cursor:
+            prio, due_s, tid = cursor.split("_")
+            prio, due_v, tid = int(prio), date.fromisoformat(due_s), int(tid)
+            q = q.filter(db.tuple_(Task.priority, BOARD_DUE, Task.id) > (prio, due_v, tid))
+        q = q.order_by(Task.priority.asc(), BOARD_DUE.asc(), Task.id.asc())
+    return q.limit(limit + 1)
+
+
+def kanban_column(state, filter_user_id=None, cursor=None, limit=KANBAN_PAGE_SIZE):
+    """One page of a Kanban column with project and assignees loaded.
+
+    Open columns are ordered by priority, then due date (undated last); the
+    done column shows the most recently updated tasks from the last
+    DONE_WINDOW_DAYS. Returns (tasks, next_cursor).
+    """
+    tasks = kanban_column_query(state, filter_user_id, cursor, limit).all()
+    if len(tasks) <= limit:
+        return tasks, None
+    tasks = tasks[:limit]
+    last = tasks[-1]
+    if state == "done":
+        return tasks, f"{last.updated_at.isoformat()}_{last.id}"
+    return tasks, f"{last.priority}_{(last.due_date or NO_DUE_DATE).isoformat()}_{last.id}"
+
+
+def _done_window():
+    return Task.updated_at >= datetime.utcnow() - timedelta(days=DONE_WINDOW_DAYS)
+
+
+def kanban_counts(filter_user_id=None):
+    """{state: task count} across the whole board (done limited to its window).
+
+    Open states are summed from the ProjectProgress rollup and done is counted
+    over its window only; a per-user board counts that user's tasks directly.
+    """
+    if filter_user_id:
+        rows = (_active_tasks_query(filter_user_id)
+                .filter(or_(Task.state != "done", _done_window()))
+                .with_entities(Task.state, func.count(Task.id))
+                .group_by(Task.state)
+                .all())
+        return dict(rows)
+    open_states = [s for s in TASK_STATES if s != "done"]
+    sums = (db.session.query(*[func.coalesce(func.sum(getattr(ProjectProgress, s)), 0) for s in open_states])
+            .join(Project, Project.id == ProjectProgress.project_id)
+            .filter(Project.status != "archived")
+            .one())
+    counts = dict(zip(open_states, sums))
+    counts["done"] = _active_tasks_query().filter(Task.state == "done", _done_window()).count()
+    return counts
+
+
+def card(t):
+    return {
+        "id": t.id,
+        "title": t.title,
+        "priority": t.priority,
+        "due": t.due_date.strftime('%m/%d/%Y') if t.due_date else None,
+        "code": t.project.code if t.project else "",
+        "assignees": [a.user.name for a in t.assignments if a.user],
+    }
+
+
+def workload(filter_user_id=None, user_ids=None):
+    """Open-task hours and counts per assignee as (name, count, hours), hours desc.
+
+    ``user_ids`` restricts the rows to those assignees (used for push deltas).
+    """
+    task_ids = _active_tasks_query(filter_user_id).filter(Task.state != "done").with_entities(Task.id)
+    hours = func.coalesce(func.sum(func.coalesce(Task.est_hours, 0.0)), 0.0)
+    q = (db.session.query(User.name, func.count(TaskAssignment.id), hours)
+         .select_from(TaskAssignment)
+         .join(User, User.id == TaskAssignment.user_id)
+         .join(Task, Task.id == TaskAssignment.task_id)
+         .filter(TaskAssignment.task_id.in_(task_ids)))
+    if user_ids is not None:
+        q = q.filter(TaskAssignment.user_id.in_(user_ids))
+    rows = q.group_by(User.name).order_by(hours.desc()).all()
+    return [(name, count, float(hrs)) for name, count, hrs in rows]
+
+
+def due_soon_query(today=None):
+    today = today or date.today()
+    return (Task.query.options(joinedload(Task.project))
+            .filter(Task.due_date != None, Task.due_date <= today + timedelta(days=DUE_SOON_DAYS), Task.state != "done")
+            .order_by(Task.due_date.asc())
+            .limit(DUE_SOON_LIMIT))
+
+
+def due_soon(today=None):
+    return due_soon_query(today).all()
+
+
+def blocked_query(cursor=None, limit=BLOCKED_LIMIT):
+    q = Task.query.options(joinedload(Task.project)).filter_by(state="blocked")
+    if cursor:
+        prio, tid = (int(v) for v in cursor.split("_"))
+        q = q.filter(db.tuple_(Task.priority, Task.id) > (prio, tid))
+    return q.order_by(Task.priority.asc(), Task.id.asc()).limit(limit + 1)
+
+
+def blocked_page(cursor=None, limit=BLOCKED_LIMIT):
+    """One page of blocked tasks by priority: (tasks, next_cursor)."""
+    tasks = blocked_query(cursor, limit).all()
+    if len(tasks) <= limit:
+        return tasks, None
+    tasks = tasks[:limit]
+    return tasks, f"{tasks[-1].priority}_{tasks[-1].id}"
+
+
+def project_progress_query(project_ids=None):
+    q = (db.session.query(Project.id, Project.code, Project.title, ProjectProgress.done, ProjectProgress.total)
+         .outerjoin(ProjectProgress, ProjectProgress.project_id == Project.id))
+    if project_ids is not None:
+        return q.filter(Project.id.in_(project_ids))  # applied by id, no order needed
+    return q.order_by(Project.created_at.desc())
+
+
+def progress_pct(done, total):
+    """Percent done as every progress bar shows it (app.js applies these values as-is)."""
+    return int(round((done / total) * 100)) if total else 0
+
+
+def project_progress(project_ids=None):
+    """Done/total per project from the rollup table; the full list is newest project first."""
+    rows = project_progress_query(project_ids).all()
+    out = []
+    for pid, code, title, done, total in rows:
+        done, total = done or 0, total or 0
+        out.append({"id": pid, "code": code, "title": title, "done": done, "total": total,
+                    "pct": progress_pct(done, total)})
+    return out
+
+
+# -------- Push deltas --------
+def task_item(t):
+    """A due-soon / blocked widget entry."""
+    return {
+        "id": t.id,
+        "code": t.project.code if t.project else "",
+        "title": t.title,
+        "priority": t.priority,
+        "due": t.due_date.strftime('%m/%d/%Y') if t.due_date else None,
+    }
+
+
+def task_delta(task, before=None, user_ids=None):
+    """Dashboard changes caused by one task write, computed once for every client.
+
+    ``before`` is the task's previous {"state", "due_date"}; ``user_ids`` adds
+    assignees that are no longer on the task (e.g. after an unassign).
+    """
+    return tasks_delta([task], [before] if before else [], user_ids)
+
+
+def tasks_delta(tasks, befores=(), user_ids=None):
+    """task_delta() for a batch of writes: one coalesced delta, same statement count."""
+    task_ids = [t.id for t in tasks]
+    affected_users = set(user_ids or ())
+    if task_ids:
+        affected_users.update(uid for (uid,) in db.session.query(TaskAssignment.user_id)
+                              .filter(TaskAssignment.task_id.in_(task_ids), TaskAssignment.user_id.isnot(None))
+                              .distinct())
+    delta = {
+        "progress": project_progress(sorted({t.project_id for t in tasks})),
+        "workload": [],
+    }
+    if affected_users:
+        rows = {name: (count, hrs) for name, count, hrs in workload(user_ids=affected_users)}
+        for (name,) in db.session.query(User.name).filter(User.id.in_(affected_users)):
+            count, hrs = rows.get(name, (0, 0.0))
+            delta["workload"].append({"name": name, "count": count, "hours": hrs})
+
+    cutoff = date.today() + timedelta(days=DUE_SOON_DAYS)
+    due_dates = [t.due_date for t in tasks] + [b.get("due_date") for b in befores]
+    if any(d is not None and d <= cutoff for d in due_dates):
+        delta["due_soon"] = [task_item(t) for t in due_soon()]
+    if "blocked" in [t.state for t in tasks] + [b.get("state") for b in befores]:
+        blocked_tasks, delta["blocked_next"] = blocked_page()
+        delta["blocked"] = [task_item(t) for t in blocked_tasks]
+    return delta
+
+
+# -------- Projects list --------
+PROJECTS_PER_PAGE = 50
+PROJECT_SORTS = {
+    "code": Project.code,
+    "title": Project.title,
+    "customer": Project.customer,
+    "due": Project.due_date,
+    "status": Project.status,
+    "priority": Project.priority,
+    "created": Project.created_at,
+    "tasks": ProjectProgress.total,
+}
+
+
+def projects_page(search=None, sort="created", direction="desc", page=1, per_page=PROJECTS_PER_PAGE):
+    """One page of the projects table with progress and assignee names.
+
+    Returns (rows, total) where each row is a dict with the Project plus
+    ``total``, ``done``, ``pct`` and ``assignees``; two statements for the
+    page and one count, whatever the number of tasks.
+    """
+    q = (db.session.query(Project, ProjectProgress.total, ProjectProgress.done)
+         .outerjoin(ProjectProgress, ProjectProgress.project_id == Project.id))
+    if search:
+        # User input is matched literally: % and _ are escaped, not wildcards
+        term = search.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+        like = f"%{term}%"
+        q = q.filter(or_(Project.code.ilike(f"{term}%", escape="\\"), Project.title.ilike(like, escape="\\"),
+                         Project.customer.ilike(like, escape="\\")))
+    total = q.order_by(None).count()
+    col = PROJECT_SORTS.get(sort, Project.created_at)
+    q = q.order_by(col.desc() if direction == "desc" else col.asc(), Project.id.desc())
+    items = q.offset((page - 1) * per_page).limit(per_page).all()
+
+    names = {}
+    ids = [p.id for p, _, _ in items]
+    if ids:
+        rows = (db.session.query(Task.project_id, User.name)
+                .join(TaskAssignment, TaskAssignment.task_id == Task.id)
+                .join(User, User.id == TaskAssignment.user_id)
+                .filter(Task.project_id.in_(ids))
+                .group_by(Task.project_id, User.name)
+                .order_by(Task.project_id, User.name))
+        for pid, name in rows:
+            names.setdefault(pid, []).append(name)
+
+    out = []
+    for p, count, done in items:
+        count, done = count or 0, done or 0
+        out.append({"project": p, "total": count, "done": done,
+                    "pct": progress_pct(done, count), "assignees": names.get(p.id, [])})
+    return out, total
@@ -0,0 +1,158 @@
+import os, sqlite3, time
+from functools import wraps
+from flask import current_app, has_request_context, request, session as flask_session
+from flask_sqlalchemy.session import Session
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
+
+# ----------------------
+# Engine options and read replica
+# ----------------------
+# DATABASE_URL is the primary. DATABASE_REPLICA_URL, when set, becomes the
+# "replica" bind and GET requests to views wrapped in @replica_reads run
+# their queries there; everything else, and anything inside a flush, goes to
+# the primary. A browser that just committed a write stays on the primary for
+# REPLICA_STICKY_SECONDS so it reads its own changes despite replication lag.
+#
+# Two SQLite files stand in for primary/replica locally:
+#
+#     DATABASE_URL=sqlite:////tmp/primary.db DATABASE_REPLICA_URL=sqlite:////tmp/replica.db
+#     python app.py --sync-replica     # copy primary -> replica with SQLite's backup API
+#
+# SQLite connections get WAL / synchronous / busy_timeout pragmas; replica
+# connections are opened with query_only so a misrouted write fails loudly.
+# Every SQLite connection, replica included, ATTACHes ARCHIVE_SQLITE_PATH
+# (default: "<database>-archive.db" beside the primary) as the "archive"
+# schema that archive.py moves cold rows into.
+
+REPLICA = "replica"
+ARCHIVE = "archive"
+
+
+class RoutingSession(Session):
+    """Flask-SQLAlchemy session that sends unbound reads to the replica while ``info["replica"]`` is set."""
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None and self.info.get(REPLICA) and not self._flushing:
+            engine = self._db.engines.get(REPLICA)
+            if engine is not None:
+                return engine
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+
+def _env_int(name, default=None):
+    value = os.getenv(name)
+    return int(value) if value not in (None, "") else default
+
+
+def configure(app):
+    """Engine options and binds from the environment; call before db.init_app(app)."""
+    url = app.config["SQLALCHEMY_DATABASE_URI"]
+    app.config["DB_POOL_SIZE"] = _env_int("DB_POOL_SIZE", 5)
+    app.config["DB_MAX_OVERFLOW"] = _env_int("DB_MAX_OVERFLOW", 10)
+    app.config["DB_POOL_RECYCLE"] = _env_int("DB_POOL_RECYCLE", 1800)  # seconds; below server idle timeouts
+    app.config["DB_POOL_TIMEOUT"] = _env_int("DB_POOL_TIMEOUT", 30)    # seconds to wait for a free connection
+    app.config["DB_POOL_PRE_PING"] = os.getenv("DB_POOL_PRE_PING", "1") == "1"
+    app.config["DB_STATEMENT_TIMEOUT_MS"] = _env_int("DB_STATEMENT_TIMEOUT_MS")  # PostgreSQL / MySQL
+    app.config["SQLITE_JOURNAL_MODE"] = os.getenv("SQLITE_JOURNAL_MODE", "WAL")
+    app.config["SQLITE_SYNCHRONOUS"] = os.getenv("SQLITE_SYNCHRONOUS", "NORMAL")
+    app.config["SQLITE_BUSY_TIMEOUT_MS"] = _env_int("SQLITE_BUSY_TIMEOUT_MS", 5000)
+    app.config["REPLICA_STICKY_SECONDS"] = float(os.getenv("REPLICA_STICKY_SECONDS", "5"))
+    app.config["ARCHIVE_SQLITE_PATH"] = os.getenv("ARCHIVE_SQLITE_PATH") or archive_path(url, app.instance_path)
+
+    app.config["SQLALCHEMY_ENGINE_OPTIONS"] = engine_options(app.config, url)
+    replica_url = os.getenv("DATABASE_REPLICA_URL")
+    if replica_url:
+        app.config.setdefault("SQLALCHEMY_BINDS", {})[REPLICA] = {
+            "url": replica_url, **engine_options(app.config, replica_url)}
+
+
+def engine_options(config, url):
+    """create_engine() keyword arguments for ``url`` from the DB_* settings."""
+    u = make_url(url)
+    options = {}
+    if u.get_backend_name() == "sqlite":
+        if u.database in (None, "", ":memory:"):
+            return options  # one shared in-memory connection; pool settings don't apply
+        options["connect_args"] = {"timeout": config["SQLITE_BUSY_TIMEOUT_MS"] / 1000}
+    else:
+        # A local file can't drop the connection, so only server databases pay for the ping
+        options.update(pool_pre_ping=config["DB_POOL_PRE_PING"], pool_recycle=config["DB_POOL_RECYCLE"])
+        timeout = config["DB_STATEMENT_TIMEOUT_MS"]
+        if timeout and u.get_backend_name() == "postgresql":
+            options["connect_args"] = {"options": f"-c statement_timeout={timeout}"}
+        elif timeout and u.get_backend_name() == "mysql":
+            options["connect_args"] = {"init_command": f"SET SESSION max_execution_time={timeout}"}
+    options.update(pool_size=config["DB_POOL_SIZE"], max_overflow=config["DB_MAX_OVERFLOW"],
+                   pool_timeout=config["DB_POOL_TIMEOUT"])
+    return options
+
+
+def archive_path(url, instance_path):
+    """Default archive file for a SQLite primary; None for other databases."""
+    u = make_url(url)
+    if u.get_backend_name() != "sqlite":
+        return None
+    if u.database in (None, "", ":memory:"):
+        return ":memory:"
+    # Relative paths resolve against the instance folder, as Flask-SQLAlchemy does for the primary
+    stem, ext = os.path.splitext(os.path.join(instance_path, u.database))
+    return f"{stem}-archive{ext or '.db'}"
+
+
+def init_app(app, db):
+    """SQLite pragmas on every new connection and read-your-writes stickiness; call after db.init_app(app)."""
+    with app.app_context():
+        engines = dict(db.engines)
+    for key, engine in engines.items():
+        if engine.dialect.name == "sqlite":
+            event.listen(engine, "connect", _sqlite_pragmas(app.config, replica=key == REPLICA))
+    if REPLICA in engines:
+        @event.listens_for(db.session, "after_commit")
+        def _stick_to_primary(session):
+            if has_request_context():
+                flask_session["primary_until"] = time.time() + app.config["REPLICA_STICKY_SECONDS"]
+
+
+def _sqlite_pragmas(config, replica=False):
+    def on_connect(dbapi_conn, record):
+        cur = dbapi_conn.cursor()
+        cur.execute(f"PRAGMA busy_timeout = {int(config['SQLITE_BUSY_TIMEOUT_MS'])}")
+        if config["ARCHIVE_SQLITE_PATH"]:
+            cur.execute(f"ATTACH DATABASE ? AS {ARCHIVE}", (config["ARCHIVE_SQLITE_PATH"],))
+        if replica:
+            cur.execute("PRAGMA query_only = ON")
+        else:
+            if config["SQLITE_JOURNAL_MODE"]:
+                cur.execute(f"PRAGMA journal_mode = {config['SQLITE_JOURNAL_MODE']}")
+                if config["ARCHIVE_SQLITE_PATH"]:
+                    cur.execute(f"PRAGMA {ARCHIVE}.journal_mode = {config['SQLITE_JOURNAL_MODE']}")
+            if config["SQLITE_SYNCHRONOUS"]:
+                cur.execute(f"PRAGMA synchronous = {config['SQLITE_SYNCHRONOUS']}")
+        cur.close()
+    return on_connect
+
+
+def replica_reads(view):
+    """Run a view's queries on the replica for GET/HEAD requests (no-op without one)."""
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        db = current_app.extensions["sqlalchemy"]
+        if (request.method in ("GET", "HEAD") and REPLICA in db.engines
+                and flask_session.get("primary_until", 0) < time.time()):
+            # The session is scoped to this request, so the flag ends with it (streamed responses included)
+            db.session.info[REPLICA] = True
+        return view(*args, **kwargs)
+    return wrapper
+
+
+def sync_sqlite_replica(primary_url, replica_url):
+    """Copy a SQLite primary onto its stand-in replica file; returns the replica path."""
+    src, dst = make_url(primary_url).database, make_url(replica_url).database
+    source, target = sqlite3.connect(src), sqlite3.connect(dst)
+    try:
+        source.backup(target)
+    finally:
+        source.close()
+        target.close()
+    return dst
@@ -0,0 +1,153 @@
+"""Synthetic machine-shop data for benchmarking.
+
+    python datagen.py --initdb --users 500 --machines 200 --projects 20000 --tasks 500000 \
+        --comments 1000000 --audits 2000000 --seed 42
+
+Rows are bulk-inserted in chunks with explicit ids (so the run is
+reproducible for a given seed), then the progress rollups, audit field
+index and search index are rebuilt because bulk inserts bypass the ORM
+flush hooks.
+"""
+import argparse, json, random, time
+from datetime import date, datetime, timedelta
+
+from models import db, User, Machine, Project, Task, TaskAssignment, Comment, Audit, TASK_STATES
+
+CHUNK = 10000
+ROLES = ["engineer"] * 5 + ["programmer"] * 3 + ["operator"] * 8 + ["manager", "admin"]
+MACHINE_TYPES = ["Mill", "Lathe", "EDM", "Grinder", "Saw", "CMM"]
+MACHINE_STATUS = ["available"] * 8 + ["setup", "down"]
+CUSTOMERS = ["Acme", "Globex", "Initech", "Umbrella", "Hooli", "Stark", "Wayne", "Tyrell", "Cyberdyne", "Soylent"]
+OPS = ["Program", "Fixture design", "Saw cut", "Rough mill", "Finish mill", "Turn", "Deburr", "Heat treat",
+       "Grind", "QC first article", "Anodize", "Final inspection", "Pack & ship"]
+# Closed work dominates a long-running shop
+STATE_WEIGHTS = {"backlog": 10, "ready": 8, "in_progress": 6, "blocked": 2, "review": 3, "done": 71}
+
+
+def _next_id(model):
+    return (db.session.query(db.func.max(model.id)).scalar() or 0) + 1
+
+
+def _insert(model, rows):
+    if rows:
+        db.session.execute(model.__table__.insert(), rows)
+
+
+def _chunked(model, total, make, report):
+    start = _next_id(model)
+    t0 = time.perf_counter()
+    for base in range(0, total, CHUNK):
+        _insert(model, [make(start + i) for i in range(base, min(base + CHUNK, total))])
+        db.session.commit()
+    report(model.__tablename__, total, time.perf_counter() - t0)
+    return start
+
+
+def generate(users=500, machines=200, projects=20000, tasks=500000, comments=1000000, audits=2000000,
+             archived_ratio=0.2, seed=42, report=None):
+    """Insert a reproducible synthetic shop into the current app's database."""
+    import audit, auth, rollups, scheduling, search
+    rnd = random.Random(seed)
+    report = report or (lambda table, n, secs: None)
+    now = datetime.utcnow().replace(microsecond=0)
+    today = date.today()
+    states, weights = zip(*STATE_WEIGHTS.items())
+
+    # One hash for everyone: hashing each password would dominate the run
+    pw = auth.hash_password("Password")
+    u0 = _chunked(User, users, lambda i: {
+        "id": i, "name": f"User {i:05d}", "email": f"user{i}@shop.example", "role": rnd.choice(ROLES),
+        "password_hash": pw, "is_active": True, "created_at": now - timedelta(days=rnd.randint(0, 1500))}, report)
+    m0 = _chunked(Machine, machines, lambda i: {
+        "id": i, "name": f"{rnd.choice(MACHINE_TYPES)}-{i:04d}", "type": rnd.choice(MACHINE_TYPES),
+        "status": rnd.choice(MACHINE_STATUS), "created_at": now}, report)
+
+    p0 = _next_id(Project)
+
+    def project(i):
+        created = now - timedelta(minutes=(p0 + projects - i) * 90)
+        return {"id": i, "code": f"JOB-{i:06d}", "title": f"{rnd.choice(OPS)} part {i}", "customer": rnd.choice(CUSTOMERS),
+                "rev": rnd.choice("ABCDE"), "priority": rnd.randint(1, 5),
+                "status": "archived" if rnd.random() < archived_ratio else "active",
+                "due_date": created.date() + timedelta(days=rnd.randint(5, 60)), "created_by": u0, "created_at": created}
+    _chunked(Project, projects, project, report)
+
+    def task(i):
+        pid = p0 + rnd.randrange(projects)
+        created = now - timedelta(minutes=rnd.randint(0, 60 * 24 * 720))
+        return {"id": i, "project_id": pid, "title": f"{rnd.choice(OPS)} OP{rnd.randint(1, 9)}0",
+                "description": "", "state": rnd.choices(states, weights)[0], "priority": rnd.randint(1, 5),
+                "est_hours": round(rnd.uniform(0.5, 12), 1),
+                "due_date": today + timedelta(days=rnd.randint(-30, 45)) if rnd.random() < 0.8 else None,
+                "created_by": u0 + rnd.randrange(users), "created_at": created,
+                "updated_at": created + timedelta(minutes=rnd.randint(0, 60 * 24 * 14))}
+    t0 = _chunked(Task, tasks, task, report)
+
+    # 0-2 distinct assignees per task, usually with a machine
+    a_id = _next_id(TaskAssignment)
+    started = time.perf_counter()
+    count = 0
+    batch = []
+    for tid in range(t0, t0 + tasks):
+        for uid in rnd.sample(range(u0, u0 + users), rnd.choice((0, 1, 1, 1, 2))):
+            batch.append({"id": a_id, "task_id": tid, "user_id": uid, "assigned_at": now,
+                          "machine_id": m0 + rnd.randrange(machines) if rnd.random() < 0.7 else None})
+            a_id += 1
+        if len(batch) >= CHUNK:
+            _insert(TaskAssignment, batch)
+            db.session.commit()
+            count += len(batch)
+            batch = []
+    _insert(TaskAssignment, batch)
+    db.session.commit()
+    report("task_assignment", count + len(batch), time.perf_counter() - started)
+
+    _chunked(Comment, comments, lambda i: {
+        "id": i, "task_id": t0 + rnd.randrange(tasks), "user_id": u0 + rnd.randrange(users),
+        "body": f"Note {i}: " + rnd.choice(["checked offsets", "waiting on material", "tool broke, replaced",
+                                             "first article OK", "customer revised drawing"]),
+        "created_at": now - timedelta(minutes=rnd.randint(0, 60 * 24 * 720))}, report)
+
+    def audit_row(i):
+        before, after = rnd.sample(TASK_STATES, 2)
+        return {"id": i, "entity_type": "task", "entity_id": t0 + rnd.randrange(tasks), "action": "update",
+                "actor_id": u0 + rnd.randrange(users),
+                "diff": json.dumps({"before": {"state": before}, "after": {"state": after}}),
+                "at": now - timedelta(seconds=(audits - (i - a0)) * 30)}
+    a0 = _next_id(Audit)
+    _chunked(Audit, audits, audit_row, report)
+
+    started = time.perf_counter()
+    rollups.rebuild_all()
+    audit.reindex_changes()
+    scheduling.touch(db.session.connection(), everything=True)
+    db.session.commit()
+    report("rollups+audit_change", projects, time.perf_counter() - started)
+
+    started = time.perf_counter()
+    indexed = search.rebuild()
+    db.session.commit()
+    report("search_index", indexed, time.perf_counter() - started)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate a synthetic machine shop")
+    parser.add_argument("--initdb", action="store_true", help="Drop & create tables first")
+    parser.add_argument("--users", type=int, default=500)
+    parser.add_argument("--machines", type=int, default=200)
+    parser.add_argument("--projects", type=int, default=20000)
+    parser.add_argument("--tasks", type=int, default=500000)
+    parser.add_argument("--comments", type=int, default=1000000)
+    parser.add_argument("--audits", type=int, default=2000000)
+    parser.add_argument("--archived-ratio", type=float, default=0.2)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    from app import create_app, init_db
+    app = create_app()
+    if args.initdb:
+        init_db(app)
+    with app.app_context():
+        generate(users=args.users, machines=args.machines, projects=args.projects, tasks=args.tasks,
+                 comments=args.comments, audits=args.audits, archived_ratio=args.archived_ratio, seed=args.seed,
+                 report=lambda table, n, secs: print(f"{table:22} {n:>9} rows  {secs:7.1f}s"))
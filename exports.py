@@ -0,0 +1,88 @@
+import csv
+from datetime import timedelta
+from io import StringIO
+from sqlalchemy import String, union_all
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.sql.functions import FunctionElement
+
+from models import db, User, Project, Task, TaskAssignment, archive_project, archive_task, archive_task_assignment
+
+# ----------------------
+# Streaming task export
+# ----------------------
+CSV_HEADER = ["Project", "Task", "State", "Assignees", "Priority", "Est Hours", "Due Date", "Created"]
+BATCH_SIZE = 1000
+
+
+class assignee_names(FunctionElement):
+    """Comma-joined assignee names per group, spelled for whichever database runs it."""
+    type = String()
+    inherit_cache = True
+
+
+@compiles(assignee_names)
+def _group_concat(element, compiler, **kw):
+    return f"group_concat({compiler.process(element.clauses, **kw)}, ', ')"
+
+
+@compiles(assignee_names, "mysql")
+@compiles(assignee_names, "mariadb")
+def _group_concat_separator(element, compiler, **kw):
+    return f"group_concat({compiler.process(element.clauses, **kw)} SEPARATOR ', ')"
+
+
+@compiles(assignee_names, "postgresql")
+def _string_agg(element, compiler, **kw):
+    return f"string_agg({compiler.process(element.clauses, **kw)}, ', ')"
+
+
+def _task_rows(projects, tasks, assignments, project=None, state=None, assignee=None,
+               created_from=None, created_to=None):
+    q = (db.select(projects.c.code, tasks.c.title, tasks.c.state, assignee_names(User.name).label("assignees"),
+                   tasks.c.priority, tasks.c.est_hours, tasks.c.due_date, tasks.c.created_at.label("created_at"))
+         .select_from(tasks)
+         .outerjoin(projects, projects.c.id == tasks.c.project_id)
+         .outerjoin(assignments, assignments.c.task_id == tasks.c.id)
+         .outerjoin(User, User.id == assignments.c.user_id)
+         .group_by(tasks.c.id, projects.c.code))
+    if project:
+        q = q.where(projects.c.code == project)
+    if state:
+        q = q.where(tasks.c.state == state)
+    if assignee:
+        q = q.where(tasks.c.id.in_(db.select(assignments.c.task_id).where(assignments.c.user_id == assignee)))
+    if created_from:
+        q = q.where(tasks.c.created_at >= created_from)
+    if created_to:
+        q = q.where(tasks.c.created_at < created_to + timedelta(days=1))
+    return q
+
+
+def task_export_query(project=None, state=None, assignee=None, created_from=None, created_to=None, archived=False):
+    """One row per task: (code, title, state, assignees, priority, est_hours, due_date, created_at).
+
+    With ``archived`` the tasks of archived jobs (archive.py) are read through as well.
+    """
+    filters = dict(project=project, state=state, assignee=assignee, created_from=created_from, created_to=created_to)
+    q = _task_rows(Project.__table__, Task.__table__, TaskAssignment.__table__, **filters)
+    if not archived:
+        return q.order_by(Task.created_at.desc())
+    q = union_all(q, _task_rows(archive_project, archive_task, archive_task_assignment, **filters))
+    return q.order_by(q.selected_columns.created_at.desc())
+
+
+def iter_csv(query, batch_size=BATCH_SIZE):
+    """Yield the CSV text in chunks of ``batch_size`` rows, fetching rows as it goes."""
+    buf = StringIO()
+    writer = csv.writer(buf, lineterminator='\n')
+    writer.writerow(CSV_HEADER)
+    result = db.session.execute(query.execution_options(yield_per=batch_size))
+    for rows in result.partitions():
+        for code, title, state, assignees, priority, est_hours, due_date, created_at in rows:
+            writer.writerow([code or "", title, state, assignees or "", priority, est_hours, due_date or "",
+                             created_at.strftime("%Y-%m-%d %H:%M") if created_at else ""])
+        yield buf.getvalue()
+        buf.seek(0)
+        buf.truncate()
+    if buf.tell():
+        yield buf.getvalue()
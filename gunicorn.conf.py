@@ -0,0 +1,10 @@
+import os
+
+# Socket.IO needs an async worker; eventlet matches SOCKETIO_ASYNC_MODE's default.
+worker_class = os.getenv("GUNICORN_WORKER_CLASS", "eventlet")
+# More than one worker needs SOCKETIO_MESSAGE_QUEUE so broadcasts reach every
+# worker's clients (app.js connects over websocket only, so no sticky sessions).
+workers = int(os.getenv("WEB_CONCURRENCY", "1"))
+bind = f"0.0.0.0:{os.getenv('PORT', '5000')}"
+timeout = int(os.getenv("GUNICORN_TIMEOUT", "120"))
+accesslog = "-"
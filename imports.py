@@ -0,0 +1,450 @@
+"""Bulk import of projects, tasks and assignments from CSV or JSON.
+
+    python imports.py tasks routings.csv --chunk-size 5000 --commit-every 50000 --errors errors.csv
+
+Rows are streamed from the file, resolved against in-memory lookup maps
+(project code, user email or name, machine name) and batch-inserted chunk by
+chunk, so memory stays flat whatever the file size. Bad rows are reported
+and skipped; the rest of the file still goes in. Input that can't be read past
+(a broken JSON array) or a write the database refuses stops the import; the
+report then says so, and what was already committed stays.
+"""
+import argparse, csv, json, time
+from datetime import datetime
+from sqlalchemy.exc import IntegrityError
+
+from models import db, User, Machine, Project, Task, TaskAssignment, PROJECT_STATUSES, TASK_STATES, to_date, insert_ids
+import audit
+import changelog
+import rollups
+import scheduling
+import search
+
+KINDS = ("projects", "tasks", "assignments")
+CHUNK_SIZE = 5000
+COMMIT_EVERY = 50000
+MAX_ERRORS_KEPT = 1000
+MAX_RECORD_CHARS = 1 << 20  # a JSON array element that doesn't close within this is treated as broken
+
+# Header aliases; the task export's own columns import back unchanged
+ALIASES = {
+    "project": "project_code", "code": "project_code", "job": "project_code",
+    "task": "title", "task_title": "title",
+    "est_hours": "est_hours", "est._hours": "est_hours", "hours": "est_hours",
+    "due": "due_date",
+    "assignee": "assignees", "user": "assignees", "user_email": "assignees", "email": "assignees",
+    "machine_name": "machine",
+}
+
+
+class RowError(ValueError):
+    def __init__(self, field, message):
+        super().__init__(message)
+        self.field = field
+
+
+# -------- Readers --------
+def _key(name):
+    key = (name or "").strip().lower().replace(" ", "_")
+    return ALIASES.get(key, key)
+
+
+# Readers yield a RowError in place of a record they can't parse; the
+# importer reports it against that row and carries on with the next one.
+def read_csv(f):
+    reader = csv.reader(f)
+    header = [_key(h) for h in next(reader, [])]
+    while True:
+        try:
+            row = next(reader)
+        except StopIteration:
+            return
+        except csv.Error as e:
+            yield RowError("row", f"unreadable CSV: {e}")
+            continue
+        if any(row):
+            yield dict(zip(header, row))
+
+
+def read_json(f, buffer_size=1 << 16):
+    """Objects from a JSON array or a JSON Lines file."""
+    first = f.read(1)
+    while first and first.isspace():
+        first = f.read(1)
+    if first == "[":
+        yield from _read_json_array(f, buffer_size)
+    elif first:
+        yield from _read_json_lines(first + f.readline(), f)
+
+
+def _read_json_lines(line, f):
+    # One record per line, so a bad line costs that row only
+    while line:
+        if line.strip():
+            try:
+                obj = json.loads(line)
+            except ValueError as e:
+                yield RowError("row", f"invalid JSON: {e}")
+            else:
+                yield {_key(k): v for k, v in obj.items()} if isinstance(obj, dict) else obj
+        line = f.readline()
+
+
+def _read_json_array(f, buffer_size):
+    # Decoded incrementally; an array can't be resumed past a malformed element
+    decoder = json.JSONDecoder()
+    buf, pos, eof = "", 0, False
+    while True:
+        # Skip separators; refill when the buffer runs dry
+        while True:
+            while pos < len(buf) and buf[pos] in " \t\r\n,[]":
+                pos += 1
+            if pos < len(buf) or eof:
+                break
+            chunk = f.read(buffer_size)
+            buf, pos, eof = buf[pos:] + chunk, 0, not chunk
+        if pos >= len(buf):
+            return
+        try:
+            obj, end = decoder.raw_decode(buf, pos)
+        except ValueError:
+            if eof or len(buf) - pos > MAX_RECORD_CHARS:
+                raise
+            chunk = f.read(buffer_size)
+            buf, pos, eof = buf[pos:] + chunk, 0, not chunk
+            continue
+        pos = end
+        yield {_key(k): v for k, v in obj.items()} if isinstance(obj, dict) else obj
+
+
+def read_rows(f, fmt):
+    return read_json(f) if fmt == "json" else read_csv(f)
+
+
+# -------- Field parsing --------
+def _text(row, field, required=False, max_len=None):
+    value = row.get(field)
+    value = "" if value is None else str(value).strip()
+    if required and not value:
+        raise RowError(field, "required")
+    if max_len and len(value) > max_len:
+        raise RowError(field, f"longer than {max_len} characters")
+    return value
+
+
+def _int(row, field, default, lo=1, hi=5):
+    raw = row.get(field)
+    if raw in (None, ""):
+        return default
+    try:
+        value = int(raw)
+    except (TypeError, ValueError):
+        raise RowError(field, f"must be an integer from {lo} to {hi}")
+    if not lo <= value <= hi:
+        raise RowError(field, f"must be an integer from {lo} to {hi}")
+    return value
+
+
+def _hours(row, field="est_hours"):
+    raw = row.get(field)
+    if raw in (None, ""):
+        return 0.0
+    try:
+        value = float(raw)
+    except (TypeError, ValueError):
+        raise RowError(field, "must be a non-negative number")
+    if value < 0:
+        raise RowError(field, "must be a non-negative number")
+    return value
+
+
+def _date(row, field="due_date"):
+    raw = row.get(field)
+    if raw in (None, ""):
+        return None
+    value = to_date(raw)
+    if value is None:
+        raise RowError(field, "expected YYYY-MM-DD or MM/DD/YYYY")
+    return value
+
+
+def _names(raw):
+    if isinstance(raw, list):
+        return [str(v).strip() for v in raw if str(v).strip()]
+    return [v.strip() for v in str(raw or "").replace(";", ",").split(",") if v.strip()]
+
+
+# -------- Importer --------
+class Importer:
+    """Streams rows of one kind into the current app's database.
+
+    ``on_error(row_number, field, message)`` sees every rejected row; the
+    report keeps the first MAX_ERRORS_KEPT of them.
+    """
+
+    def __init__(self, kind, chunk_size=CHUNK_SIZE, commit_every=COMMIT_EVERY, actor_id=None, on_error=None):
+        if kind not in KINDS:
+            raise ValueError(f"kind must be one of {', '.join(KINDS)}")
+        self.kind = kind
+        self.chunk_size = chunk_size
+        self.commit_every = max(commit_every, chunk_size)
+        self.actor_id = actor_id
+        self.on_error = on_error
+        self.rows = self.inserted = self.error_count = 0
+        self.errors = []
+        self._load_lookups()
+
+    def _load_lookups(self):
+        # One pass over each reference table; names are only kept for the kinds that use them
+        self.projects = {code: pid for pid, code in db.session.query(Project.id, Project.code)}
+        self.users, self.machines = {}, {}
+        if self.kind != "projects":
+            for uid, email, name in db.session.query(User.id, User.email, User.name):
+                self.users[email.lower()] = uid
+                self.users.setdefault(name.lower(), uid)
+            self.machines = {name.lower(): mid for mid, name in db.session.query(Machine.id, Machine.name)}
+
+    def _error(self, number, field, message):
+        self.error_count += 1
+        if len(self.errors) < MAX_ERRORS_KEPT:
+            self.errors.append({"row": number, "field": field, "error": message})
+        if self.on_error:
+            self.on_error(number, field, message)
+
+    def _user(self, token, field):
+        uid = self.users.get(token.lower())
+        if uid is None:
+            raise RowError(field, f"unknown user {token!r}")
+        return uid
+
+    def _machine(self, row):
+        name = _text(row, "machine")
+        if not name:
+            return None
+        mid = self.machines.get(name.lower())
+        if mid is None:
+            raise RowError("machine", f"unknown machine {name!r}")
+        return mid
+
+    def run(self, rows):
+        """Import every row; returns the report dict.
+
+        Unreadable input or an IntegrityError stops the import: the open
+        transaction is rolled back and the report carries ``aborted``, with
+        ``inserted`` counting the rows committed before it.
+        """
+        started = time.perf_counter()
+        chunk, since_commit, committed, aborted = [], 0, 0, None
+        try:
+            for number, row in enumerate(rows, start=1):
+                self.rows += 1
+                if isinstance(row, RowError):
+                    self._error(number, row.field, str(row))
+                    continue
+                if not isinstance(row, dict):
+                    self._error(number, "row", "expected an object")
+                    continue
+                try:
+                    chunk.append(self._parse(number, row))
+                except RowError as e:
+                    self._error(number, e.field, str(e))
+                    continue
+                if len(chunk) >= self.chunk_size:
+                    since_commit += self._flush(chunk)
+                    chunk = []
+                    if since_commit >= self.commit_every:
+                        db.session.commit()
+                        committed, since_commit = self.inserted, 0
+            self._flush(chunk)
+        except (ValueError, csv.Error, IntegrityError) as e:
+            db.session.rollback()
+            self.inserted = committed
+            reason = e.orig if isinstance(e, IntegrityError) else e
+            aborted = f"stopped after row {self.rows}: {type(reason).__name__}: {reason}"
+        audit.record("import", None, self.kind, {"rows": self.rows, "inserted": self.inserted,
+                                                 "errors": self.error_count, "aborted": aborted},
+                     actor_id=self.actor_id)
+        db.session.commit()
+        seconds = time.perf_counter() - started
+        report = {"kind": self.kind, "rows": self.rows, "inserted": self.inserted, "error_count": self.error_count,
+                  "errors": self.errors, "seconds": round(seconds, 3),
+                  "rows_per_sec": round(self.rows / seconds, 1) if seconds else None}
+        if aborted:
+            report["aborted"] = aborted
+        return report
+
+    # Each kind: _parse(row) -> tuple for its chunk, _insert(chunk) -> rows inserted
+    def _parse(self, number, row):
+        return getattr(self, f"_parse_{self.kind}")(number, row)
+
+    def _flush(self, chunk):
+        if not chunk:
+            return 0
+        conn = db.session.connection()
+        inserted = getattr(self, f"_insert_{self.kind}")(conn, chunk)
+        if inserted:
+            rollups._bump(conn, "dashboard")
+        self.inserted += inserted
+        return inserted
+
+    # -------- Projects --------
+    def _parse_projects(self, number, row):
+        code = _text(row, "project_code", required=True, max_len=50)
+        if code in self.projects:
+            raise RowError("project_code", f"project {code} already exists")
+        status = _text(row, "status").lower() or "active"
+        if status not in PROJECT_STATUSES:
+            raise RowError("status", f"must be one of {', '.join(PROJECT_STATUSES)}")
+        self.projects[code] = None  # claimed; duplicates later in the file are rejected
+        return {"code": code, "title": _text(row, "title", required=True, max_len=200),
+                "customer": _text(row, "customer", max_len=120) or None, "rev": _text(row, "rev", max_len=20) or None,
+                "priority": _int(row, "priority", 3), "status": status, "due_date": _date(row),
+                "created_by": self.actor_id, "created_at": datetime.utcnow()}
+
+    def _insert_projects(self, conn, chunk):
+        ids = insert_ids(conn, Project.__table__, chunk)
+        for pid, row in zip(ids, chunk):
+            self.projects[row["code"]] = pid
+        rollups._rebuild(conn, ids)  # empty rollup rows for the new projects
+        search.index(conn, "project", ids, new=True)
+        changelog.record(conn, "project", ids)
+        return len(ids)
+
+    # -------- Tasks --------
+    def _parse_tasks(self, number, row):
+        code = _text(row, "project_code", required=True)
+        pid = self.projects.get(code)
+        if pid is None:
+            raise RowError("project_code", f"unknown project {code!r}")
+        state = _text(row, "state") or "backlog"
+        if state not in TASK_STATES:
+            raise RowError("state", f"must be one of {', '.join(TASK_STATES)}")
+        users = list(dict.fromkeys(self._user(t, "assignees") for t in _names(row.get("assignees"))))
+        now = datetime.utcnow()
+        task = {"project_id": pid, "title": _text(row, "title", required=True, max_len=200),
+                "description": _text(row, "description"), "state": state, "priority": _int(row, "priority", 3),
+                "est_hours": _hours(row), "due_date": _date(row), "created_by": self.actor_id,
+                "created_at": now, "updated_at": now}
+        return task, users, self._machine(row)
+
+    def _insert_tasks(self, conn, chunk):
+        ids = insert_ids(conn, Task.__table__, [task for task, _, _ in chunk])
+        links, deltas = [], {}
+        for tid, (task, users, machine_id) in zip(ids, chunk):
+            links += [{"task_id": tid, "user_id": uid, "machine_id": machine_id} for uid in users]
+            rollups._add(deltas, task["project_id"], rollups._contribution(task["state"], task["est_hours"], +1))
+        if links:
+            conn.execute(TaskAssignment.__table__.insert(), links)
+            scheduling.touch(conn, {link["machine_id"] for link in links})
+        rollups._apply(conn, deltas)
+        search.index(conn, "task", ids, new=True)
+        changelog.record(conn, "task", ids)
+        return len(ids)
+
+    # -------- Assignments --------
+    def _parse_assignments(self, number, row):
+        task_id = row.get("task_id")
+        if task_id not in (None, ""):
+            try:
+                task_ref = int(task_id)
+            except (TypeError, ValueError):
+                raise RowError("task_id", "must be a task id")
+        else:
+            code = _text(row, "project_code", required=True)
+            pid = self.projects.get(code)
+            if pid is None:
+                raise RowError("project_code", f"unknown project {code!r}")
+            task_ref = (pid, _text(row, "title", required=True))
+        users = [self._user(t, "assignees") for t in _names(row.get("assignees"))]
+        if not users:
+            raise RowError("assignees", "required")
+        return number, task_ref, users, self._machine(row)
+
+    def _insert_assignments(self, conn, chunk):
+        # Resolve the chunk's task references and existing links in one query each
+        ids = {ref for _, ref, _, _ in chunk if isinstance(ref, int)}
+        by_title = {ref for _, ref, _, _ in chunk if isinstance(ref, tuple)}
+        known, titles = set(), {}
+        if ids:
+            known = {tid for (tid,) in conn.execute(db.select(Task.id).where(Task.id.in_(ids)))}
+        if by_title:
+            q = (db.select(Task.id, Task.project_id, Task.title)
+                 .where(Task.project_id.in_({pid for pid, _ in by_title}), Task.title.in_({t for _, t in by_title})))
+            for tid, pid, title in conn.execute(q):
+                titles.setdefault((pid, title), []).append(tid)
+        resolved = []
+        for number, ref, users, machine_id in chunk:
+            if isinstance(ref, int):
+                tid = ref if ref in known else None
+            else:
+                matches = titles.get(ref, [])
+                if len(matches) > 1:
+                    self._error(number, "title", f"{len(matches)} tasks are titled {ref[1]!r}; use task_id")
+                    continue
+                tid = matches[0] if matches else None
+            if tid is None:
+                self._error(number, "task_id" if isinstance(ref, int) else "title", "task not found")
+                continue
+            resolved.append((tid, users, machine_id))
+        if not resolved:
+            return 0
+        task_ids = {tid for tid, _, _ in resolved}
+        seen = set(conn.execute(db.select(TaskAssignment.task_id, TaskAssignment.user_id)
+                                .where(TaskAssignment.task_id.in_(task_ids))).tuples())
+        links = []
+        for tid, users, machine_id in resolved:
+            for uid in users:
+                if (tid, uid) not in seen:
+                    seen.add((tid, uid))
+                    links.append({"task_id": tid, "user_id": uid, "machine_id": machine_id})
+        if links:
+            conn.execute(TaskAssignment.__table__.insert(), links)
+            scheduling.touch(conn, {link["machine_id"] for link in links})
+            changelog.record(conn, "task", [link["task_id"] for link in links])
+        return len(links)
+
+
+def import_file(f, kind, fmt="csv", **kwargs):
+    """Import an open text file; see Importer for the keyword arguments."""
+    return Importer(kind, **kwargs).run(read_rows(f, fmt))
+
+
+def guess_format(filename, default="csv"):
+    name = (filename or "").lower()
+    if name.endswith((".json", ".jsonl", ".ndjson")):
+        return "json"
+    if name.endswith(".csv"):
+        return "csv"
+    return default
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Import projects, tasks or assignments")
+    parser.add_argument("kind", choices=KINDS)
+    parser.add_argument("path")
+    parser.add_argument("--format", choices=("csv", "json"), help="Default: from the file extension")
+    parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE, help="Rows per batch insert")
+    parser.add_argument("--commit-every", type=int, default=COMMIT_EVERY, help="Rows per transaction")
+    parser.add_argument("--errors", help="Write every rejected row to this CSV")
+    args = parser.parse_args()
+
+    from app import create_app
+    app = create_app()
+    with app.app_context(), open(args.path, newline="", encoding="utf-8-sig") as f:
+        err_file = open(args.errors, "w", newline="") if args.errors else None
+        err_writer = csv.writer(err_file) if err_file else None
+        if err_writer:
+            err_writer.writerow(["row", "field", "error"])
+        try:
+            report = import_file(f, args.kind, args.format or guess_format(args.path),
+                                 chunk_size=args.chunk_size, commit_every=args.commit_every,
+                                 on_error=(lambda *e: err_writer.writerow(e)) if err_writer else None)
+        finally:
+            if err_file:
+                err_file.close()
+    for e in report["errors"][:20]:
+        print(f"row {e['row']}: {e['field']}: {e['error']}")
+    if report.get("aborted"):
+        print(f"Import aborted, {report['aborted']}")
+    print(f"{report['rows']} rows, {report['inserted']} inserted, {report['error_count']} rejected "
+          f"in {report['seconds']:.1f}s ({report['rows_per_sec']:.0f} rows/s)")
@@ -0,0 +1,186 @@
+from datetime import datetime
+from sqlalchemy import inspect, select, text
+
+from models import db, SchemaVersion
+import archive
+import comments
+import dashboard_data
+import rollups
+import search
+
+# ----------------------
+# Schema migrations
+# ----------------------
+# Each migration is (version, description, fn(conn)) and runs inside one
+# transaction. Steps must be idempotent: a database created by an older
+# `--initdb` has no schema_version table and replays from version 1.
+# `init_db()` builds the current schema with create_all() and stamps the
+# latest version, so fresh databases skip straight past these.
+
+version_table = SchemaVersion.__table__
+
+
+def _table(name):
+    return db.metadata.tables[name]
+
+
+def _create_tables(conn, *names):
+    for name in names:
+        _table(name).create(conn, checkfirst=True)
+
+
+def _index_names(conn, table_name):
+    if conn.dialect.name == "sqlite":
+        # The inspector skips expression indexes on SQLite
+        return set(conn.execute(text("SELECT name FROM sqlite_master WHERE type = 'index' AND tbl_name = :t"),
+                                {"t": table_name}).scalars())
+    return {ix["name"] for ix in inspect(conn).get_indexes(table_name)}
+
+
+def _create_indexes(conn, table_name, *index_names):
+    existing = _index_names(conn, table_name)
+    for ix in _table(table_name).indexes:
+        if ix.name in index_names and ix.name not in existing:
+            ix.create(conn)
+
+
+def _add_column(conn, table_name, column_name):
+    if column_name in {c["name"] for c in inspect(conn).get_columns(table_name)}:
+        return False
+    col = _table(table_name).c[column_name]
+    ddl_type = col.type.compile(dialect=conn.dialect)
+    conn.execute(text(f"ALTER TABLE {table_name} ADD COLUMN {column_name} {ddl_type}"))
+    return True
+
+
+def _m1_catch_up(conn):
+    # Tables and columns introduced since the original schema
+    _create_tables(conn, "project_progress", "change_counter", "audit_change")
+    if _add_column(conn, "task", "updated_at"):
+        conn.execute(text("UPDATE task SET updated_at = created_at"))
+    _create_indexes(conn, "audit", "ix_audit_entity_at", "ix_audit_actor_at", "ix_audit_at")
+    rollups._rebuild(conn)
+
+
+def _m2_hot_filter_indexes(conn):
+    _create_indexes(conn, "task", "ix_task_due_state", "ix_task_state_priority",
+                    "ix_task_state_updated", "ix_task_project_state")
+    _create_indexes(conn, "task_assignment", "ix_assignment_user_task")
+    _create_indexes(conn, "project", "ix_project_status", "ix_project_created_at")
+
+
+def _m3_machine_shifts(conn):
+    _create_tables(conn, "machine_shift")
+
+
+def _m4_search_index(conn):
+    search.create(conn)
+
+
+def _m5_flow_analytics(conn):
+    # Empty until the first refresh; the high-water mark starts at 0 so it backfills the whole audit log
+    _create_tables(conn, "task_transition", "flow_rollup")
+
+
+def _m6_archive_tables(conn):
+    archive.create(conn)
+
+
+def _m7_change_log(conn):
+    _create_tables(conn, "change_log")
+
+
+def _m8_board_order_index(conn):
+    _create_indexes(conn, "task", "ix_task_board_order")
+
+
+def _m9_change_log_project(conn):
+    # Older rows stay NULL; sync() treats a task tombstone without one as touching every project
+    _add_column(conn, "change_log", "project_id")
+
+
+MIGRATIONS = [
+    (1, "Progress/counter/audit-change tables, task.updated_at, audit indexes", _m1_catch_up),
+    (2, "Composite indexes for due-soon, blocked, per-user filter and progress queries", _m2_hot_filter_indexes),
+    (3, "Machine shift calendars for scheduling", _m3_machine_shifts),
+    (4, "Full-text search index (SQLite FTS5)", _m4_search_index),
+    (5, "Task transition facts and flow rollups for analytics", _m5_flow_analytics),
+    (6, "Archive schema for archived projects and old audit rows", _m6_archive_tables),
+    (7, "Change log for delta sync", _m7_change_log),
+    (8, "Kanban column order index", _m8_board_order_index),
+    (9, "Project of each logged task write, for delta sync progress", _m9_change_log_project),
+]
+LATEST = MIGRATIONS[-1][0]
+
+
+def current_version(conn):
+    if not inspect(conn).has_table(version_table.name):
+        return 0
+    return conn.execute(select(db.func.max(version_table.c.version))).scalar() or 0
+
+
+def stamp(conn, version=LATEST):
+    """Record every migration up to ``version`` as applied without running it."""
+    version_table.create(conn, checkfirst=True)
+    done = current_version(conn)
+    conn.execute(version_table.insert(), [
+        {"version": v, "description": d, "applied_at": datetime.utcnow()}
+        for v, d, _ in MIGRATIONS if done < v <= version])
+
+
+def upgrade(target=LATEST):
+    """Apply pending migrations in order, one transaction each; returns versions applied."""
+    applied = []
+    for version, description, fn in MIGRATIONS:
+        if version > target:
+            break
+        with db.engine.begin() as conn:
+            if current_version(conn) >= version:
+                continue
+            fn(conn)
+            version_table.create(conn, checkfirst=True)
+            conn.execute(version_table.insert().values(version=version, description=description,
+                                                       applied_at=datetime.utcnow()))
+        applied.append((version, description))
+    return applied
+
+
+# -------- Index checks --------
+CHECKED_TABLES = ("project", "task", "task_assignment", "comment")
+
+
+def _hot_queries():
+    # The statements the routes run, built by the same functions
+    return {
+        "due_soon": dashboard_data.due_soon_query().statement,
+        "blocked": dashboard_data.blocked_query().statement,
+        "blocked_next_page": dashboard_data.blocked_query("2_100").statement,
+        "kanban_column": dashboard_data.kanban_column_query("ready").statement,
+        "kanban_column_next_page": dashboard_data.kanban_column_query("ready", cursor="2_2030-01-01_100").statement,
+        "kanban_column_user_filter": dashboard_data.kanban_column_query("ready", filter_user_id=1).statement,
+        "kanban_done": dashboard_data.kanban_column_query("done").statement,
+        "progress": dashboard_data.project_progress_query().statement,
+        "progress_projects": dashboard_data.project_progress_query([1, 2]).statement,
+        "progress_rebuild": rollups._aggregate_query([1]),
+        "comment_page": comments.page_query(1, before=1000),
+    }
+
+
+def explain_hot_queries():
+    """[(name, plan, uses_index)] from SQLite's EXPLAIN QUERY PLAN for the dashboard's hot queries.
+
+    A query passes when its project / task / task_assignment / comment access
+    goes through an index rather than a full table scan, and its ORDER BY is
+    served by an index instead of a temp B-tree sort.
+    """
+    conn = db.session.connection()
+    if conn.dialect.name != "sqlite":
+        raise RuntimeError("explain_hot_queries() only understands SQLite query plans")
+    out = []
+    for name, stmt in _hot_queries().items():
+        compiled = stmt.compile(dialect=conn.dialect, compile_kwargs={"literal_binds": True})
+        plan = [row[-1] for row in conn.exec_driver_sql("EXPLAIN QUERY PLAN " + compiled.string)]
+        bad = [p for p in plan if p.startswith("USE TEMP B-TREE FOR ORDER BY")
+               or (p.startswith("SCAN ") and "USING" not in p and p.split()[1] in CHECKED_TABLES)]
+        out.append((name, plan, not bad))
+    return out
@@ -1,7 +1,13 @@
 from flask_sqlalchemy import SQLAlchemy
 from datetime import datetime, date
 
-db = SQLAlchemy()
+from database import ARCHIVE, RoutingSession
+
+db = SQLAlchemy(session_options={"class_": RoutingSession})  # reads may go to a replica, see database.py
+
+TASK_STATES = ("backlog", "ready", "in_progress", "blocked", "review", "done")
+MACHINE_STATUSES = ("available", "setup", "down", "offline")
+PROJECT_STATUSES = ("active", "archived")
 
 class User(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -28,10 +34,22 @@ class Machine(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(80), unique=True, nullable=False)
     type = db.Column(db.String(80))
-    status = db.Column(db.String(30), default="available")  # available, down, setup, offline
+    status = db.Column(db.String(30), default="available")  # MACHINE_STATUSES
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
 
+class MachineShift(db.Model):
+    # Working windows per weekday (0=Mon); machine_id NULL rows are the shop-wide calendar
+    id = db.Column(db.Integer, primary_key=True)
+    machine_id = db.Column(db.Integer, db.ForeignKey('machine.id'), index=True)
+    weekday = db.Column(db.Integer, nullable=False)
+    start_minute = db.Column(db.Integer, nullable=False)
+    end_minute = db.Column(db.Integer, nullable=False)
+
 class Project(db.Model):
+    __table_args__ = (
+        db.Index('ix_project_status', 'status'),
+        db.Index('ix_project_created_at', 'created_at'),
+    )
     id = db.Column(db.Integer, primary_key=True)
     code = db.Column(db.String(50), unique=True, nullable=False, index=True)
     title = db.Column(db.String(200), nullable=False)
@@ -39,13 +57,44 @@ class Project(db.Model):
     rev = db.Column(db.String(20))
     due_date = db.Column(db.Date)
     priority = db.Column(db.Integer, default=3)  # 1 hot .. 5 low
-    status = db.Column(db.String(30), default="active")
+    status = db.Column(db.String(30), default="active")  # PROJECT_STATUSES
     created_by = db.Column(db.Integer, db.ForeignKey('user.id'))
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
 
     tasks = db.relationship('Task', backref='project', lazy=True, cascade="all, delete-orphan")
 
+class SchemaVersion(db.Model):
+    # Applied migrations (see migrations.py)
+    version = db.Column(db.Integer, primary_key=True)
+    description = db.Column(db.String(200))
+    applied_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+class ProjectProgress(db.Model):
+    # Materialized per-project rollup, maintained by rollups.py on every flush
+    project_id = db.Column(db.Integer, db.ForeignKey('project.id'), primary_key=True)
+    total = db.Column(db.Integer, nullable=False, default=0)
+    backlog = db.Column(db.Integer, nullable=False, default=0)
+    ready = db.Column(db.Integer, nullable=False, default=0)
+    in_progress = db.Column(db.Integer, nullable=False, default=0)
+    blocked = db.Column(db.Integer, nullable=False, default=0)
+    review = db.Column(db.Integer, nullable=False, default=0)
+    done = db.Column(db.Integer, nullable=False, default=0)
+    open_hours = db.Column(db.Float, nullable=False, default=0)
+
+class ChangeCounter(db.Model):
+    # Monotonic version per data scope, used for ETags on polled fragments
+    name = db.Column(db.String(50), primary_key=True)
+    value = db.Column(db.Integer, nullable=False, default=0)
+
 class Task(db.Model):
+    __table_args__ = (
+        db.Index('ix_task_due_state', 'due_date', 'state'),          # due-soon widget
+        db.Index('ix_task_state_priority', 'state', 'priority'),     # blocked list
+        db.Index('ix_task_state_updated', 'state', 'updated_at'),    # recent done window
+        db.Index('ix_task_project_state', 'project_id', 'state'),    # progress rollup rebuild
+        # Kanban column order (priority, due date with undated last, id); see dashboard_data.BOARD_DUE
+        db.Index('ix_task_board_order', 'state', 'priority', db.text("coalesce(due_date, '9999-12-31')"), 'id'),
+    )
     id = db.Column(db.Integer, primary_key=True)
     project_id = db.Column(db.Integer, db.ForeignKey('project.id'), nullable=False, index=True)
     title = db.Column(db.String(200), nullable=False)
@@ -56,11 +105,15 @@ class Task(db.Model):
     due_date = db.Column(db.Date)
     created_by = db.Column(db.Integer, db.ForeignKey('user.id'))
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
     assignments = db.relationship('TaskAssignment', backref='task', lazy=True, cascade="all, delete-orphan")
 
 class TaskAssignment(db.Model):
-    __table_args__ = (db.UniqueConstraint('task_id','user_id', name='uq_task_user'),)
+    __table_args__ = (
+        db.UniqueConstraint('task_id','user_id', name='uq_task_user'),
+        db.Index('ix_assignment_user_task', 'user_id', 'task_id'),   # per-user dashboard filter
+    )
     id = db.Column(db.Integer, primary_key=True)
     task_id = db.Column(db.Integer, db.ForeignKey('task.id'), nullable=False, index=True)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'))
@@ -80,6 +133,11 @@ class Comment(db.Model):
     user = db.relationship('User', lazy=True)
 
 class Audit(db.Model):
+    __table_args__ = (
+        db.Index('ix_audit_entity_at', 'entity_type', 'entity_id', 'at'),
+        db.Index('ix_audit_actor_at', 'actor_id', 'at'),
+        db.Index('ix_audit_at', 'at', 'id'),
+    )
     id = db.Column(db.Integer, primary_key=True)
     entity_type = db.Column(db.String(50))  # e.g., 'task', 'project'
     entity_id = db.Column(db.Integer)
@@ -88,15 +146,94 @@ class Audit(db.Model):
     diff = db.Column(db.Text)               # JSON string
     at = db.Column(db.DateTime, default=datetime.utcnow)
 
+    changes = db.relationship('AuditChange', lazy=True, cascade="all, delete-orphan")
+
+class AuditChange(db.Model):
+    # One row per field an audit entry changed, so diffs can be filtered by index
+    __table_args__ = (db.Index('ix_audit_change_field_value_at', 'field', 'value', 'at', 'audit_id'),)
+    id = db.Column(db.Integer, primary_key=True)
+    audit_id = db.Column(db.Integer, db.ForeignKey('audit.id'), nullable=False, index=True)
+    field = db.Column(db.String(50), nullable=False)
+    value = db.Column(db.String(200))
+    at = db.Column(db.DateTime)  # copy of Audit.at so field filters page on one index
+
+class TaskTransition(db.Model):
+    # One task state change parsed from an Audit row (analytics.py); no FKs so history outlives deleted tasks
+    __table_args__ = (db.Index('ix_transition_task_at', 'task_id', 'at'),)
+    audit_id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    task_id = db.Column(db.Integer, nullable=False)
+    project_id = db.Column(db.Integer)
+    actor_id = db.Column(db.Integer)
+    from_state = db.Column(db.String(30))
+    to_state = db.Column(db.String(30), nullable=False)
+    at = db.Column(db.DateTime, nullable=False)
+    state_seconds = db.Column(db.Integer)  # time spent in from_state
+    lead_seconds = db.Column(db.Integer)   # created -> done, on entries into done
+    cycle_seconds = db.Column(db.Integer)  # first in_progress -> done
+
+class FlowRollup(db.Model):
+    # Per-bucket state flow (analytics.py); grain 'hour' or 'day', bucket = its start (UTC), dim all/project/customer/user/machine
+    __table_args__ = (db.Index('ix_flow_rollup_series', 'grain', 'dim', 'key', 'bucket'),)
+    grain = db.Column(db.String(4), primary_key=True)
+    bucket = db.Column(db.DateTime, primary_key=True)
+    dim = db.Column(db.String(10), primary_key=True)
+    key = db.Column(db.String(120), primary_key=True)
+    state = db.Column(db.String(30), primary_key=True)
+    entered = db.Column(db.Integer, nullable=False, default=0)
+    exited = db.Column(db.Integer, nullable=False, default=0)
+    timed = db.Column(db.Integer, nullable=False, default=0)  # exits with a known state_seconds
+    state_seconds = db.Column(db.BigInteger, nullable=False, default=0)
+    lead_count = db.Column(db.Integer, nullable=False, default=0)
+    lead_seconds = db.Column(db.BigInteger, nullable=False, default=0)
+    cycle_count = db.Column(db.Integer, nullable=False, default=0)
+    cycle_seconds = db.Column(db.BigInteger, nullable=False, default=0)
+
+class ChangeLog(db.Model):
+    # One row per write to a synced project / task / comment (changelog.py); the id is the sync version
+    __table_args__ = (db.Index('ix_change_log_at', 'at'), {"sqlite_autoincrement": True})
+    id = db.Column(db.Integer, primary_key=True)
+    entity_type = db.Column(db.String(20), nullable=False)
+    entity_id = db.Column(db.Integer, nullable=False)
+    project_id = db.Column(db.Integer)  # task rows: the project it sat in, kept for tombstones and moves
+    at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+# Cold copies of moved rows (archive.py): same columns, no FKs, a few read-through indexes. The
+# "archive" schema is a separately ATTACHed file on SQLite and a real schema on other databases.
+def _archive_table(model, *indexes):
+    src = model.__table__
+    cols = [db.Column(c.name, c.type, primary_key=c.primary_key, autoincrement=False) for c in src.columns]
+    return db.Table(src.name, db.metadata, *cols,
+                    *[db.Index(f"ix_archive_{src.name}_{'_'.join(ix)}", *ix) for ix in indexes], schema=ARCHIVE)
+
+archive_project = _archive_table(Project, ("code",))
+archive_task = _archive_table(Task, ("project_id",))
+archive_task_assignment = _archive_table(TaskAssignment, ("task_id",))
+archive_comment = _archive_table(Comment, ("task_id",))
+archive_audit = _archive_table(Audit, ("entity_type", "entity_id", "at"))
+archive_audit_change = _archive_table(AuditChange, ("audit_id",))
+
 def to_date(s):
+    """YYYY-MM-DD or MM/DD/YYYY to a date; None if empty or unparseable."""
     if not s:
         return None
     if isinstance(s, date):
         return s
     try:
-        return datetime.strptime(s, "%Y-%m-%d").date()
-    except Exception:
-        try:
-            return datetime.strptime(s, "%m/%d/%Y").date()
-        except Exception:
-            return None
+        if "/" in s:
+            m, d, y = s.split("/")
+        else:
+            y, m, d = s.split("-")
+        return date(int(y), int(m), int(d))
+    except (TypeError, ValueError):
+        return None
+
+def insert_ids(conn, table, rows):
+    """Insert ``rows`` in as few statements as the dialect allows; returns their new ids in row order."""
+    if not rows:
+        return []
+    if conn.dialect.name == "sqlite":
+        # SQLite can't pair batched RETURNING rows with parameter sets (SQLAlchemy
+        # then inserts row by row), but the single writer assigns rowids in
+        # VALUES order, so the sorted ids line up with ``rows``.
+        return sorted(conn.execute(table.insert().returning(table.c.id), rows).scalars())
+    return conn.execute(table.insert().returning(table.c.id, sort_by_parameter_order=True), rows).scalars().all()
@@ -0,0 +1,163 @@
+import logging, threading, time
+from flask import g, has_request_context, request, template_rendered, before_render_template, Response
+from sqlalchemy import event
+
+from models import db
+
+log = logging.getLogger(__name__)
+
+# ----------------------
+# Request profiling (opt-in)
+# ----------------------
+# PROFILING=1 hooks SQLAlchemy cursor events, Jinja render signals and
+# socketio.emit to record per-endpoint statement count, DB time, template
+# time, emit time and payload size. Totals are served in Prometheus text
+# format at /metrics. PROFILING_SERVER_TIMING=1 also adds a Server-Timing
+# header. Requests slower than SLOW_REQUEST_MS are logged with their SQL.
+# With PROFILING off nothing is registered at all.
+
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+MAX_CAPTURED_SQL = 50
+
+
+class Metrics:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.endpoints = {}
+
+    def observe(self, endpoint, method, status, seconds, stats, size):
+        key = (endpoint or "unknown", method)
+        with self.lock:
+            m = self.endpoints.get(key)
+            if m is None:
+                m = self.endpoints[key] = {"requests": 0, "seconds": 0.0, "queries": 0, "db_seconds": 0.0,
+                                           "template_seconds": 0.0, "emit_seconds": 0.0, "bytes": 0,
+                                           "errors": 0, "buckets": [0] * len(BUCKETS)}
+            m["requests"] += 1
+            m["seconds"] += seconds
+            m["queries"] += stats["queries"]
+            m["db_seconds"] += stats["db"]
+            m["template_seconds"] += stats["template"]
+            m["emit_seconds"] += stats["emit"]
+            m["bytes"] += size
+            if status >= 500:
+                m["errors"] += 1
+            for i, le in enumerate(BUCKETS):
+                if seconds <= le:
+                    m["buckets"][i] += 1
+
+    def prometheus(self):
+        counters = [
+            ("shop_requests_total", "requests", "Requests handled"),
+            ("shop_request_errors_total", "errors", "Requests answered with a 5xx status"),
+            ("shop_db_queries_total", "queries", "SQL statements executed"),
+            ("shop_db_seconds_total", "db_seconds", "Time spent executing SQL"),
+            ("shop_template_seconds_total", "template_seconds", "Time spent rendering templates"),
+            ("shop_socketio_emit_seconds_total", "emit_seconds", "Time spent in socketio.emit"),
+            ("shop_response_bytes_total", "bytes", "Response payload bytes (when known)"),
+        ]
+        with self.lock:
+            items = sorted((k, dict(v, buckets=list(v["buckets"]))) for k, v in self.endpoints.items())
+        lines = []
+        for metric, field, help_text in counters:
+            lines += [f"# HELP {metric} {help_text}", f"# TYPE {metric} counter"]
+            for (endpoint, method), m in items:
+                lines.append(f'{metric}{{endpoint="{endpoint}",method="{method}"}} {m[field]}')
+        lines += ["# HELP shop_request_seconds Request latency", "# TYPE shop_request_seconds histogram"]
+        for (endpoint, method), m in items:
+            labels = f'endpoint="{endpoint}",method="{method}"'
+            for le, n in zip(BUCKETS, m["buckets"]):
+                lines.append(f'shop_request_seconds_bucket{{{labels},le="{le}"}} {n}')
+            lines.append(f'shop_request_seconds_bucket{{{labels},le="+Inf"}} {m["requests"]}')
+            lines.append(f'shop_request_seconds_sum{{{labels}}} {m["seconds"]}')
+            lines.append(f'shop_request_seconds_count{{{labels}}} {m["requests"]}')
+        return "\n".join(lines) + "\n"
+
+
+def _stats():
+    # Per-request accumulator; None outside requests (e.g. the audit writer thread)
+    if not has_request_context():
+        return None
+    return g.get("_profile")
+
+
+def init_app(app, socketio):
+    app.config.setdefault("PROFILING", False)
+    app.config.setdefault("PROFILING_SERVER_TIMING", False)
+    app.config.setdefault("SLOW_REQUEST_MS", 500)
+    if not app.config["PROFILING"]:
+        return
+    metrics = app.extensions["profiling"] = Metrics()
+
+    with app.app_context():
+        engines = list(db.engines.values())  # primary and replica
+
+    def _before_cursor(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("_profile_start", []).append(time.perf_counter())
+
+    def _after_cursor(conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - conn.info["_profile_start"].pop()
+        stats = _stats()
+        if stats is not None:
+            stats["queries"] += 1
+            stats["db"] += elapsed
+            if len(stats["sql"]) < MAX_CAPTURED_SQL:
+                stats["sql"].append((elapsed, statement))
+
+    for engine in engines:
+        event.listen(engine, "before_cursor_execute", _before_cursor)
+        event.listen(engine, "after_cursor_execute", _after_cursor)
+
+    def _template_start(sender, template, context, **extra):
+        stats = _stats()
+        if stats is not None:
+            stats["template_started"] = time.perf_counter()
+
+    def _template_done(sender, template, context, **extra):
+        stats = _stats()
+        if stats is not None and stats.get("template_started"):
+            stats["template"] += time.perf_counter() - stats.pop("template_started")
+
+    before_render_template.connect(_template_start, app, weak=False)
+    template_rendered.connect(_template_done, app, weak=False)
+
+    emit = socketio.emit
+
+    def timed_emit(*args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return emit(*args, **kwargs)
+        finally:
+            stats = _stats()
+            if stats is not None:
+                stats["emit"] += time.perf_counter() - start
+    socketio.emit = timed_emit
+
+    @app.before_request
+    def _start_profile():
+        g._profile = {"start": time.perf_counter(), "queries": 0, "db": 0.0, "template": 0.0, "emit": 0.0, "sql": []}
+
+    @app.after_request
+    def _finish_profile(response):
+        stats = g.pop("_profile", None)
+        if stats is None:
+            return response
+        elapsed = time.perf_counter() - stats["start"]
+        size = response.content_length or 0
+        metrics.observe(request.endpoint, request.method, response.status_code, elapsed, stats, size)
+        if app.config["PROFILING_SERVER_TIMING"]:
+            response.headers["Server-Timing"] = (
+                f'db;dur={stats["db"] * 1000:.1f};desc="{stats["queries"]} queries", '
+                f'tpl;dur={stats["template"] * 1000:.1f}, emit;dur={stats["emit"] * 1000:.1f}, '
+                f'total;dur={elapsed * 1000:.1f}')
+        if elapsed * 1000 >= app.config["SLOW_REQUEST_MS"]:
+            slowest = sorted(stats["sql"], key=lambda s: s[0], reverse=True)[:5]
+            log.warning("Slow request %s %s %.0fms: %d queries, db %.0fms, templates %.0fms\n%s",
+                        request.method, request.full_path, elapsed * 1000, stats["queries"],
+                        stats["db"] * 1000, stats["template"] * 1000,
+                        "\n".join(f"  {ms * 1000:.1f}ms  {sql}" for ms, sql in slowest))
+        return response
+
+    @app.route("/metrics")
+    def metrics_endpoint():
+        return Response(metrics.prometheus(), mimetype="text/plain; version=0.0.4")
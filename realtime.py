@@ -0,0 +1,233 @@
+import queue, sqlite3, threading, time
+from flask_login import current_user
+from flask_socketio import SocketIO, join_room
+from socketio import PubSubManager
+
+# ----------------------
+# Socket.IO server & message queue
+# ----------------------
+# SOCKETIO_MESSAGE_QUEUE picks how emits reach clients connected to other
+# worker processes:
+#   (unset)                one process, no queue
+#   redis://, amqp://,     passed straight to Flask-SocketIO (needs the
+#   kafka://               matching client library installed)
+#   sqlite:////path/q.db   SQLiteManager: cross-process on one host, no extra
+#                          services; fine for small deployments and tests
+#   local://<name>         LocalManager: in-process bus joining several
+#                          SocketIO servers in one interpreter (tests)
+
+
+def create_socketio(app):
+    url = app.config.get("SOCKETIO_MESSAGE_QUEUE") or None
+    channel = app.config.get("SOCKETIO_CHANNEL", "shop-tracker")
+    kwargs = {"cors_allowed_origins": "*", "async_mode": app.config.get("SOCKETIO_ASYNC_MODE", "eventlet")}
+    if url and url.startswith("local://"):
+        kwargs["client_manager"] = LocalManager(url, channel=channel)
+    elif url and url.startswith("sqlite://"):
+        kwargs["client_manager"] = SQLiteManager(url, channel=channel)
+    elif url:
+        kwargs["message_queue"] = url
+        kwargs["channel"] = channel
+    socketio = SocketIO(app, **kwargs)
+    register_rooms(socketio)
+    app.extensions["realtime"] = RoomEmitter(socketio, app.config.get("SOCKETIO_COALESCE_MS", 50) / 1000)
+    return socketio
+
+
+class LocalManager(PubSubManager):
+    """Pub/sub between SocketIO servers living in the same process."""
+    name = "local"
+    poll_interval = 0.01
+    _buses = {}
+    _lock = threading.Lock()
+
+    def __init__(self, url="local://", channel="socketio", write_only=False, logger=None, json=None):
+        super().__init__(channel=channel, write_only=write_only, logger=logger, json=json)
+        self.key = (url, channel)
+        self.inbox = queue.Queue()
+        with self._lock:
+            self._buses.setdefault(self.key, []).append(self.inbox)
+
+    def _publish(self, data):
+        payload = self.json.dumps(data)
+        with self._lock:
+            inboxes = list(self._buses.get(self.key, ()))
+        for inbox in inboxes:
+            inbox.put(payload)
+
+    def _listen(self):
+        while True:
+            try:
+                yield self.inbox.get_nowait()
+            except queue.Empty:
+                self.server.sleep(self.poll_interval)
+
+
+class SQLiteManager(PubSubManager):
+    """Pub/sub through a small SQLite table shared by processes on one host."""
+    name = "sqlite"
+    poll_interval = 0.05
+    retention = 60  # seconds a message stays readable
+
+    def __init__(self, url, channel="socketio", write_only=False, logger=None, json=None):
+        super().__init__(channel=channel, write_only=write_only, logger=logger, json=json)
+        self.path = url[len("sqlite:///"):]
+        self._last_prune = 0.0
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("CREATE TABLE IF NOT EXISTS socketio_message ("
+                         "id INTEGER PRIMARY KEY AUTOINCREMENT, channel TEXT NOT NULL, "
+                         "payload TEXT NOT NULL, created REAL NOT NULL)")
+
+    def _connect(self):
+        return sqlite3.connect(self.path, timeout=5)
+
+    def _publish(self, data):
+        now = time.time()
+        conn = self._connect()
+        try:
+            with conn:
+                conn.execute("INSERT INTO socketio_message (channel, payload, created) VALUES (?, ?, ?)",
+                             (self.channel, self.json.dumps(data), now))
+                if now - self._last_prune > self.retention:
+                    conn.execute("DELETE FROM socketio_message WHERE created < ?", (now - self.retention,))
+                    self._last_prune = now
+        finally:
+            conn.close()
+
+    def _listen(self):
+        conn = self._connect()
+        last_id = conn.execute("SELECT COALESCE(MAX(id), 0) FROM socketio_message").fetchone()[0]
+        while True:
+            rows = conn.execute("SELECT id, payload FROM socketio_message WHERE channel = ? AND id > ? ORDER BY id",
+                                (self.channel, last_id)).fetchall()
+            for last_id, payload in rows:
+                yield payload
+            if not rows:
+                self.server.sleep(self.poll_interval)
+
+
+# ----------------------
+# Rooms & coalescing
+# ----------------------
+# Pages say what they show when they connect (io({auth: {...}}), see
+# app.js) and only join the rooms for that:
+#   {"view": "dashboard"}              DASHBOARD: every card, full delta
+#   {"view": "dashboard", "user": id}  user:<id>: that user's cards and
+#                                      workload, plus SHOP
+#   {"view": "projects"}               SHOP: progress / due soon / blocked
+#   {"view": "project", "project": id} project:<id>: that job's cards and
+#                                      comment ids
+# Other pages (and anonymous sockets) join nothing.
+#
+# Writers publish to rooms through RoomEmitter rather than socketio.emit.
+# The first batch in a quiet room goes out at once; batches published to it
+# within SOCKETIO_COALESCE_MS after that are merged and sent as one
+# tasks_updated event when the window closes. 0 sends every batch at once.
+DASHBOARD = "dashboard"
+SHOP = "shop"
+SHOP_KEYS = ("progress", "due_soon", "blocked")
+
+
+def project_room(pid):
+    return f"project:{pid}"
+
+
+def user_room(uid):
+    return f"user:{uid}"
+
+
+def view_rooms(auth):
+    """Rooms for the page described by a connect ``auth`` payload."""
+    auth = auth if isinstance(auth, dict) else {}
+
+    def _id(key):
+        try:
+            return int(auth.get(key) or 0)
+        except (TypeError, ValueError):
+            return 0
+    view = auth.get("view")
+    if view == "dashboard":
+        return [user_room(_id("user")), SHOP] if _id("user") else [DASHBOARD]
+    if view == "projects":
+        return [SHOP]
+    if view == "project" and _id("project"):
+        return [project_room(_id("project"))]
+    return []
+
+
+def register_rooms(socketio):
+    @socketio.on("connect")
+    def _join_view_rooms(auth=None):
+        if not current_user.is_authenticated:
+            return
+        for room in view_rooms(auth):
+            join_room(room)
+
+
+class RoomEmitter:
+    """Per-room tasks_updated batches, coalesced within ``window`` seconds."""
+
+    def __init__(self, socketio, window):
+        self.socketio = socketio
+        self.window = window
+        self._lock = threading.Lock()
+        self._open = {}  # room -> batch merged since the last send (None while empty)
+
+    def publish(self, room, tasks=(), delta=None, comments=()):
+        """Send (or merge) cards, a dashboard delta and new comment ids for ``room``."""
+        batch = _merge(None, tasks, delta, comments)
+        if self.window > 0:
+            with self._lock:
+                if room in self._open:
+                    self._open[room] = _merge(self._open[room], batch["tasks"].values(), batch["delta"],
+                                              batch["comments"].values())
+                    return
+                self._open[room] = None
+            self.socketio.start_background_task(self._drain, room)
+        self._send(room, batch)
+
+    def flush(self):
+        """Send everything still waiting (tests, shutdown)."""
+        with self._lock:
+            waiting = [(room, batch) for room, batch in self._open.items() if batch]
+            self._open = {room: None for room in self._open}
+        for room, batch in waiting:
+            self._send(room, batch)
+
+    def _drain(self, room):
+        # Keep the window open while batches keep arriving, then close it
+        while True:
+            self.socketio.sleep(self.window)
+            with self._lock:
+                batch = self._open.get(room)
+                if not batch:
+                    self._open.pop(room, None)
+                    return
+                self._open[room] = None
+            self._send(room, batch)
+
+    def _send(self, room, batch):
+        payload = {"tasks": list(batch["tasks"].values()), "delta": {
+            k: list(v.values()) if isinstance(v, dict) else v for k, v in batch["delta"].items()}}
+        if batch["comments"]:
+            payload["comments"] = list(batch["comments"].values())
+        self.socketio.emit("tasks_updated", payload, to=room)
+
+
+def _merge(batch, tasks, delta, comments):
+    # Later writes win: cards by id, progress rows by project id, workload rows
+    # by name, comment ids by task; due_soon / blocked are whole lists
+    batch = batch or {"tasks": {}, "delta": {}, "comments": {}}
+    for t in tasks:
+        batch["tasks"].setdefault(t["id"], {}).update(t)
+    for key, value in (delta or {}).items():
+        if key in ("progress", "workload"):
+            rows = value.values() if isinstance(value, dict) else value
+            field = "id" if key == "progress" else "name"
+            batch["delta"].setdefault(key, {}).update((r[field], r) for r in rows)
+        else:
+            batch["delta"][key] = value
+    for c in comments:
+        batch["comments"][c["task_id"]] = c
+    return batch
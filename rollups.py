@@ -0,0 +1,203 @@
+from sqlalchemy import bindparam, event, func, inspect, select
+
+from models import db, User, Project, Task, TaskAssignment, ProjectProgress, ChangeCounter, TASK_STATES
+
+# ----------------------
+# Project progress rollup
+# ----------------------
+# ProjectProgress holds total / per-state counts / open est_hours for each
+# project. It is kept current from the session's flush events so every
+# route that adds, edits or deletes tasks (including the project -> task
+# delete cascade) updates it inside the same transaction.
+
+progress_table = ProjectProgress.__table__
+counter_table = ChangeCounter.__table__
+COUNTER_COLUMNS = ("total",) + TASK_STATES + ("open_hours",)
+
+
+def _contribution(state, est_hours, sign):
+    d = {"total": sign}
+    if state in TASK_STATES:
+        d[state] = sign
+    if state != "done":
+        d["open_hours"] = sign * (est_hours or 0.0)
+    return d
+
+
+def _add(deltas, project_id, contribution):
+    if project_id is None:
+        return
+    bucket = deltas.setdefault(project_id, {})
+    for k, v in contribution.items():
+        bucket[k] = bucket.get(k, 0) + v
+
+
+def _previous_values(session, task):
+    """(project_id, state, est_hours) as currently stored in the database."""
+    ins = inspect(task)
+    keys = ("project_id", "state", "est_hours")
+    values = []
+    for key in keys:
+        hist = ins.attrs[key].history
+        if hist.deleted:
+            values.append(hist.deleted[0])
+        elif hist.unchanged:
+            values.append(hist.unchanged[0])
+        elif hist.added:
+            # Set without the old value ever being loaded; read it back
+            row = session.connection().execute(
+                select(Task.project_id, Task.state, Task.est_hours).where(Task.id == task.id)
+            ).first()
+            return tuple(row) if row else (None, None, None)
+        else:
+            values.append(ins.dict.get(key))
+    return tuple(values)
+
+
+def _new_project_id(task):
+    # Assigning task.project only copies its id to project_id during the flush
+    hist = inspect(task).attrs.project.history
+    if hist.added and hist.added[0] is not None:
+        return hist.added[0].id
+    return task.project_id
+
+
+def _aggregate_query(project_ids=None):
+    q = (select(Task.project_id, Task.state, func.count(Task.id), func.coalesce(func.sum(Task.est_hours), 0.0))
+         .group_by(Task.project_id, Task.state))
+    if project_ids is not None:
+        q = q.where(Task.project_id.in_(project_ids))
+    return q
+
+
+def _aggregate(conn, project_ids=None):
+    q = _aggregate_query(project_ids)
+    pq = select(Project.id)
+    if project_ids is not None:
+        pq = pq.where(Project.id.in_(project_ids))
+    rows = {pid: dict.fromkeys(COUNTER_COLUMNS, 0) for (pid,) in conn.execute(pq)}
+    for pid, state, count, hours in conn.execute(q):
+        row = rows.get(pid)
+        if row is None:
+            continue
+        row["total"] += count
+        if state in TASK_STATES:
+            row[state] += count
+        if state != "done":
+            row["open_hours"] += float(hours or 0.0)
+    return rows
+
+
+def _rebuild(conn, project_ids=None):
+    rows = _aggregate(conn, project_ids)
+    if project_ids is None:
+        conn.execute(progress_table.delete())
+    elif project_ids:
+        conn.execute(progress_table.delete().where(progress_table.c.project_id.in_(project_ids)))
+    if rows:
+        conn.execute(progress_table.insert(), [{"project_id": pid, **vals} for pid, vals in rows.items()])
+    return len(rows)
+
+
+def _apply(conn, deltas, rebuild=()):
+    """Add {project_id: {column: change}} to the rollup; projects in ``rebuild`` are recounted instead.
+
+    One executemany for every project; projects without a rollup row yet (e.g.
+    created before the rollup existed) are recounted.
+    """
+    rebuild = set(rebuild)
+    pending = {pid: d for pid, d in deltas.items() if pid not in rebuild and any(d.values())}
+    if pending:
+        have = {pid for (pid,) in conn.execute(select(progress_table.c.project_id)
+                                               .where(progress_table.c.project_id.in_(pending)))}
+        rebuild |= pending.keys() - have
+        rows = [{"pid": pid, **{f"d_{k}": d.get(k, 0) for k in COUNTER_COLUMNS}}
+                for pid, d in pending.items() if pid in have]
+        if rows:
+            conn.execute(progress_table.update()
+                         .where(progress_table.c.project_id == bindparam("pid"))
+                         .values({k: progress_table.c[k] + bindparam(f"d_{k}") for k in COUNTER_COLUMNS}), rows)
+    if rebuild:
+        _rebuild(conn, list(rebuild))
+
+
+@event.listens_for(db.session, "before_flush")
+def _collect_progress_deltas(session, flush_context, instances):
+    deleted_projects = {p.id for p in session.deleted if isinstance(p, Project)}
+    if deleted_projects:
+        session.connection().execute(
+            progress_table.delete().where(progress_table.c.project_id.in_(deleted_projects))
+        )
+
+    deltas = {}
+    for obj in session.deleted:
+        if isinstance(obj, Task):
+            pid, state, hours = _previous_values(session, obj)
+            if pid not in deleted_projects:
+                _add(deltas, pid, _contribution(state, hours, -1))
+    for obj in session.dirty:
+        if isinstance(obj, Task) and session.is_modified(obj):
+            old = _previous_values(session, obj)
+            new = (_new_project_id(obj), obj.state, obj.est_hours)
+            if old != new:
+                _add(deltas, old[0], _contribution(old[1], old[2], -1))
+                _add(deltas, new[0], _contribution(new[1], new[2], +1))
+    session.info["progress_deltas"] = deltas
+
+
+@event.listens_for(db.session, "after_flush")
+def _apply_progress_deltas(session, flush_context):
+    deltas = session.info.pop("progress_deltas", {})
+    for obj in session.new:
+        if isinstance(obj, Task):
+            _add(deltas, obj.project_id, _contribution(obj.state, obj.est_hours, +1))
+    rebuild = {p.id for p in session.new if isinstance(p, Project)}
+
+    conn = session.connection()
+    _apply(conn, deltas, rebuild)
+
+    if any(isinstance(obj, DASHBOARD_MODELS) for obj in (*session.new, *session.dirty, *session.deleted)):
+        _bump(conn, "dashboard")
+
+
+# -------- Change counters --------
+# Anything rendered by the polled dashboard fragments depends on these models
+DASHBOARD_MODELS = (Project, Task, TaskAssignment, User)
+
+
+def _bump(conn, name):
+    res = conn.execute(counter_table.update().where(counter_table.c.name == name)
+                       .values(value=counter_table.c.value + 1))
+    if res.rowcount == 0:
+        conn.execute(counter_table.insert().values(name=name, value=1))
+
+
+def current_version(name="dashboard"):
+    return db.session.execute(select(counter_table.c.value).where(counter_table.c.name == name)).scalar() or 0
+
+
+# -------- Maintenance --------
+def rebuild_all():
+    """Recompute every project's rollup from the task table."""
+    conn = db.session.connection()
+    progress_table.create(conn, checkfirst=True)
+    count = _rebuild(conn)
+    db.session.commit()
+    return count
+
+
+def verify():
+    """Return [(project_id, column, stored, actual)] for every drifted counter."""
+    conn = db.session.connection()
+    actual = _aggregate(conn)
+    stored = {r.project_id: r._mapping for r in conn.execute(select(progress_table))}
+    drift = []
+    for pid, vals in actual.items():
+        row = stored.get(pid)
+        for col in COUNTER_COLUMNS:
+            have = row[col] if row is not None else None
+            if have is None or abs(have - vals[col]) > 1e-6:
+                drift.append((pid, col, have, vals[col]))
+    for pid in stored.keys() - actual.keys():
+        drift.append((pid, "total", stored[pid]["total"], None))
+    return drift
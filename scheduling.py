@@ -0,0 +1,343 @@
+import os, threading
+from datetime import date, datetime, timedelta
+from zoneinfo import ZoneInfo
+from flask import current_app
+from sqlalchemy import event, inspect, or_, select
+
+from models import db, Machine, MachineShift, Project, Task, TaskAssignment, ChangeCounter
+import rollups
+
+# ----------------------
+# Finite-capacity machine schedule
+# ----------------------
+# Each machine is a single-capacity queue. Its open tasks (not done, project
+# not archived) run back to back in (in progress first, priority, due date,
+# id) order inside the machine's shift windows. A `down`/`offline` machine
+# gets no time; a machine in `setup` starts SETUP_HOURS late. Blocked tasks
+# stay in the queue listing but are not given time.
+#
+# Solved schedules are cached per process. The flush hooks below bump a
+# "machine:<id>" change counter whenever something in that machine's queue
+# changes, so a read re-solves only machines whose counter moved, and each
+# of those only from the first queue position that differs. The "schedule"
+# counter (calendar edits, core inserts) and an anchor older than MAX_AGE
+# force a full solve.
+#
+# Shift windows and due dates are shop wall-clock times, so the schedule is
+# solved in naive shop-local time: SHOP_TIMEZONE (an IANA name such as
+# "America/Chicago") when set, the server's local time otherwise. Aware
+# datetimes passed in are converted to it; shop_isoformat() puts the shop's
+# UTC offset back on times handed to clients.
+
+DEFAULT_SHIFTS = [(weekday, 6 * 60, 22 * 60) for weekday in range(5)]  # Mon-Fri 06:00-22:00
+SETUP_HOURS = 1.0
+UNAVAILABLE = ("down", "offline")
+HORIZON_DAYS = 730
+LOAD_WINDOW_DAYS = 7
+MAX_AGE = timedelta(minutes=5)
+NO_DUE_DATE = date(9999, 12, 31)
+QUEUE_ATTRS = ("state", "priority", "due_date", "est_hours", "project_id")
+
+counter_table = ChangeCounter.__table__
+
+
+def init_app(app):
+    app.config.setdefault("SHOP_TIMEZONE", os.getenv("SHOP_TIMEZONE") or None)
+    if app.config["SHOP_TIMEZONE"]:
+        ZoneInfo(app.config["SHOP_TIMEZONE"])  # unknown names fail at startup, not on the first schedule
+
+
+def _zone():
+    name = current_app.config.get("SHOP_TIMEZONE")
+    return ZoneInfo(name) if name else None
+
+
+def shop_time(dt=None):
+    """``dt`` (default: now) as naive shop-local time; naive input is taken as shop-local already."""
+    zone = _zone()
+    if dt is None:
+        return datetime.now(zone).replace(tzinfo=None) if zone else datetime.now()
+    if dt.tzinfo is None:
+        return dt
+    return (dt.astimezone(zone) if zone else dt.astimezone()).replace(tzinfo=None)
+
+
+def shop_isoformat(dt):
+    """ISO 8601 with the shop's UTC offset for a naive shop-local time."""
+    zone = _zone()
+    return (dt.replace(tzinfo=zone) if zone else dt.astimezone()).isoformat()
+
+
+class Calendar:
+    """Weekly shift windows; yields concrete (start, end) datetimes from any point."""
+
+    def __init__(self, shifts):
+        self.days = {}
+        for weekday, start, end in shifts:
+            if end > start:
+                self.days.setdefault(weekday, []).append((start, end))
+        for windows in self.days.values():
+            windows.sort()
+
+    def windows(self, start, days=HORIZON_DAYS):
+        day = datetime.combine(start.date(), datetime.min.time())
+        for _ in range(days):
+            for s, e in self.days.get(day.weekday(), ()):
+                ws, we = day + timedelta(minutes=s), day + timedelta(minutes=e)
+                if we > start:
+                    yield max(ws, start), we
+            day += timedelta(days=1)
+
+    def hours_between(self, start, end):
+        total = 0.0
+        for ws, we in self.windows(start, (end - start).days + 2):
+            if ws >= end:
+                break
+            total += (min(we, end) - ws).total_seconds() / 3600
+        return total
+
+
+def _queue_key(state, priority, due_date, task_id):
+    return (0 if state == "in_progress" else 1, priority or 3, due_date or NO_DUE_DATE, task_id)
+
+
+def solve(status, calendar, items, anchor, previous=None):
+    """Place ``items`` [(key, task_id, hours, due_date, state)] on one machine.
+
+    Returns {"status", "anchor", "items", "slots"} where slots[i] is
+    (start, end) or None for blocked / unplaceable tasks. With ``previous``
+    (an earlier result for the same status and anchor) the unchanged prefix
+    of the queue is reused and only the rest is placed again.
+    """
+    items = sorted(items)
+    if status in UNAVAILABLE:
+        return {"status": status, "anchor": anchor, "items": items, "slots": [None] * len(items)}
+    slots = []
+    cursor = anchor + timedelta(hours=SETUP_HOURS if status == "setup" else 0)
+    if previous and previous["status"] == status and previous["anchor"] == anchor:
+        for old, new in zip(previous["items"], items):
+            if old != new:
+                break
+            slots.append(previous["slots"][len(slots)])
+        cursor = next((slot[1] for slot in reversed(slots) if slot), cursor)
+
+    windows = calendar.windows(cursor)
+    current = None
+    for key, task_id, hours, due, state in items[len(slots):]:
+        if state == "blocked":
+            slots.append(None)
+            continue
+        remaining = max(hours or 0.0, 0.0) * 3600
+        start, placed = None, False
+        while True:
+            if current is None:
+                current = next(windows, None)
+                if current is None:
+                    break  # past the horizon
+            ws, we = current
+            if start is None:
+                start = ws
+            available = (we - ws).total_seconds()
+            if available >= remaining:
+                cursor = ws + timedelta(seconds=remaining)
+                current = (cursor, we) if cursor < we else None
+                placed = True
+                break
+            remaining -= available
+            current = None
+        slots.append((start, cursor) if placed else None)
+    return {"status": status, "anchor": anchor, "items": items, "slots": slots}
+
+
+# -------- Loading --------
+def _calendars():
+    rows = db.session.query(MachineShift.machine_id, MachineShift.weekday,
+                            MachineShift.start_minute, MachineShift.end_minute).all()
+    shop = [(w, s, e) for mid, w, s, e in rows if mid is None] or DEFAULT_SHIFTS
+    per_machine = {}
+    for mid, w, s, e in rows:
+        if mid is not None:
+            per_machine.setdefault(mid, []).append((w, s, e))
+    return Calendar(shop), {mid: Calendar(shifts) for mid, shifts in per_machine.items()}
+
+
+def _queues(machine_ids=None):
+    """{machine_id: [(key, task_id, hours, due_date, state)]} for open work, one query."""
+    q = (db.session.query(TaskAssignment.machine_id, Task.id, Task.state, Task.priority, Task.due_date,
+                          Task.est_hours)
+         .join(Task, Task.id == TaskAssignment.task_id)
+         .join(Project, Project.id == Task.project_id)
+         .filter(TaskAssignment.machine_id.isnot(None), Task.state != "done", Project.status != "archived")
+         .distinct())
+    if machine_ids is not None:
+        q = q.filter(TaskAssignment.machine_id.in_(machine_ids))
+    queues = {}
+    for mid, tid, state, priority, due, hours in q:
+        queues.setdefault(mid, []).append((_queue_key(state, priority, due, tid), tid, hours or 0.0, due, state))
+    return queues
+
+
+def _versions():
+    rows = db.session.execute(select(counter_table.c.name, counter_table.c.value).where(
+        or_(counter_table.c.name == "schedule", counter_table.c.name.like("machine:%")))).all()
+    return dict(rows)
+
+
+# -------- Cache --------
+def _app_cache():
+    return current_app.extensions.setdefault("schedule", {
+        "lock": threading.Lock(), "anchor": None, "version": None, "machines": {},
+        "stats": {"full_solves": 0, "machine_solves": 0}})
+
+
+def floor(now=None):
+    """{machine_id: schedule} for every machine, re-solving only what changed since the last call.
+
+    The cache lock is only held to snapshot and publish the cache; queries and
+    solves run outside it, so /machines requests don't queue behind each other.
+    Two requests may solve the same machine at once; the newer result is kept.
+    """
+    now = shop_time(now).replace(second=0, microsecond=0)
+    cache = _app_cache()
+    versions = _versions()
+    machines = {mid: (name, status) for mid, name, status in db.session.query(Machine.id, Machine.name, Machine.status)}
+    with cache["lock"]:
+        anchor, version, cached = cache["anchor"], cache["version"], dict(cache["machines"])
+    full = (anchor is None or version != versions.get("schedule", 0)
+            or abs(now - anchor) > MAX_AGE)  # abs: wall clocks step back at DST
+    if full:
+        anchor, version, cached = now, versions.get("schedule", 0), {}
+    stale = [mid for mid in machines
+             if mid not in cached or cached[mid]["version"] != versions.get(f"machine:{mid}", 0)]
+    solved = {}
+    if stale:
+        shop, calendars = _calendars()
+        queues = _queues(None if full else stale)
+        for mid in stale:
+            name, status = machines[mid]
+            result = solve(status, calendars.get(mid, shop), queues.get(mid, []), anchor, cached.get(mid))
+            result.update(machine_id=mid, name=name, version=versions.get(f"machine:{mid}", 0),
+                          calendar=calendars.get(mid, shop))
+            solved[mid] = result
+    schedules = {mid: solved.get(mid) or cached[mid] for mid in machines}
+
+    with cache["lock"]:
+        if cache["anchor"] == anchor and cache["version"] == version:
+            # Same base as the cache: keep whichever solve of each machine is newer
+            current = cache["machines"]
+            for mid, result in solved.items():
+                if mid not in current or current[mid]["version"] <= result["version"]:
+                    current[mid] = result
+            cache["machines"] = {mid: current[mid] for mid in machines if mid in current}
+        elif full and (cache["anchor"] is None or (cache["version"], cache["anchor"]) <= (version, anchor)):
+            cache.update(anchor=anchor, version=version, machines=schedules)
+        cache["stats"]["machine_solves"] += len(stale)
+        if full:
+            cache["stats"]["full_solves"] += 1
+    return schedules
+
+
+def machine_load(now=None, days=LOAD_WINDOW_DAYS):
+    """Per-machine summary rows for the load dashboard, sorted by machine name."""
+    out = []
+    for mid, s in floor(now).items():
+        window_end = s["anchor"] + timedelta(days=days)
+        capacity = 0.0 if s["status"] in UNAVAILABLE else s["calendar"].hours_between(s["anchor"], window_end)
+        queued = 0.0
+        late = unplaced = blocked = 0
+        next_free = None
+        for (key, tid, hours, due, state), slot in zip(s["items"], s["slots"]):
+            queued += hours
+            if state == "blocked":
+                blocked += 1
+                continue
+            if slot is None:
+                unplaced += 1
+                continue
+            next_free = slot[1]
+            if due and next_free.date() > due:
+                late += 1
+        # Placed work is packed back to back, so what's booked is the shift time up to the last end
+        booked = s["calendar"].hours_between(s["anchor"], min(next_free, window_end)) if next_free else 0.0
+        out.append({"id": mid, "name": s["name"], "status": s["status"], "tasks": len(s["items"]),
+                    "queued_hours": round(queued, 1), "late": late, "blocked": blocked, "unplaced": unplaced,
+                    "next_free": shop_isoformat(next_free) if next_free else None,
+                    "load_pct": round(booked * 100 / capacity) if capacity else None})
+    out.sort(key=lambda r: r["name"])
+    return out
+
+
+def machine_schedule(machine_id, now=None):
+    """[(task_id, start, end, late, state)] in queue order for one machine, or None if unknown."""
+    s = floor(now).get(machine_id)
+    if s is None:
+        return None
+    return [(tid, slot[0] if slot else None, slot[1] if slot else None,
+             bool(slot and due and slot[1].date() > due), state)
+            for (key, tid, hours, due, state), slot in zip(s["items"], s["slots"])]
+
+
+# -------- Change tracking --------
+def touch(conn, machine_ids=(), everything=False):
+    """Mark machines' queues changed; core inserts that skip the flush hooks call this."""
+    names = sorted({f"machine:{mid}" for mid in machine_ids if mid is not None})
+    if names:
+        have = set(conn.execute(select(counter_table.c.name).where(counter_table.c.name.in_(names))).scalars())
+        if have:
+            conn.execute(counter_table.update().where(counter_table.c.name.in_(have))
+                         .values(value=counter_table.c.value + 1))
+        missing = [n for n in names if n not in have]
+        if missing:
+            conn.execute(counter_table.insert(), [{"name": n, "value": 1} for n in missing])
+    if everything:
+        rollups._bump(conn, "schedule")
+
+
+def _changed(obj, attrs):
+    state = inspect(obj)
+    return any(state.attrs[a].history.has_changes() for a in attrs)
+
+
+@event.listens_for(db.session, "before_flush")
+def _track_queue_changes(session, flush_context, instances):
+    machines, task_ids, project_ids, everything = set(), set(), set(), False
+    for obj in session.new:
+        if isinstance(obj, TaskAssignment):
+            machines.add(obj.machine_id)
+        elif isinstance(obj, MachineShift):
+            everything = True
+    for obj in session.dirty:
+        if isinstance(obj, Task) and _changed(obj, QUEUE_ATTRS):
+            task_ids.add(obj.id)
+        elif isinstance(obj, TaskAssignment) and _changed(obj, ("machine_id", "task_id")):
+            hist = inspect(obj).attrs.machine_id.history
+            machines.update(hist.added or ())
+            machines.update(hist.deleted or ())
+            machines.update(hist.unchanged or ())
+        elif isinstance(obj, Machine) and _changed(obj, ("status", "name")):
+            machines.add(obj.id)
+        elif isinstance(obj, Project) and _changed(obj, ("status",)):
+            project_ids.add(obj.id)
+        elif isinstance(obj, MachineShift):
+            everything = True
+    for obj in session.deleted:
+        if isinstance(obj, TaskAssignment):
+            machines.add(obj.machine_id)
+        elif isinstance(obj, Task):
+            task_ids.add(obj.id)
+        elif isinstance(obj, Project):
+            project_ids.add(obj.id)
+        elif isinstance(obj, (Machine, MachineShift)):
+            everything = True
+    if task_ids or project_ids:
+        conds = []
+        if task_ids:
+            conds.append(Task.id.in_(task_ids))
+        if project_ids:
+            conds.append(Task.project_id.in_(project_ids))
+        machines.update(session.connection().execute(
+            select(TaskAssignment.machine_id).join(Task, Task.id == TaskAssignment.task_id)
+            .where(TaskAssignment.machine_id.isnot(None), or_(*conds)).distinct()).scalars())
+    machines.discard(None)
+    if machines or everything:
+        touch(session.connection(), machines, everything)
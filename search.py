@@ -0,0 +1,289 @@
+import re
+from flask import current_app, url_for
+from markupsafe import Markup, escape
+from sqlalchemy import and_, column, event, inspect, literal, or_, select, table, text
+from sqlalchemy.exc import OperationalError
+
+from models import db, User, Project, Task, Comment, archive_project
+import archive
+
+# ----------------------
+# Full-text search
+# ----------------------
+# On SQLite the search_index FTS5 table holds one row per project, task and
+# comment with rowid = id * 4 + kind, so a source row maps to its index row
+# without a lookup. Columns are (title, body, code): project title /
+# customer / code, task title / description, comment body. Every query term
+# is matched as a prefix, so "JOB-10" finds JOB-1001, JOB-1002, ...
+#
+# The after_flush hook below re-indexes rows the ORM inserts, edits or
+# deletes; core bulk inserts (bulk create, imports) call index() themselves
+# and datagen rebuilds the whole table. Without FTS5 (other databases, or
+# before migration 4) search falls back to LIKE over the source tables.
+# Projects moved to the archive (archive.py) keep their index rows so old
+# jobs can still be found; their tasks and comments are dropped.
+
+KINDS = {"project": 1, "task": 2, "comment": 3}
+INDEXED = {Project: ("project", ("code", "title", "customer")),
+           Task: ("task", ("title", "description")),
+           Comment: ("comment", ("body",))}
+WEIGHTS = (4.0, 1.0, 10.0)  # bm25 weights for title, body, code
+PAGE_SIZE = 20
+MAX_TERMS = 8
+# bm25 scores every match it orders, so queries matching more rows than this
+# are ranked within their newest RANK_LIMIT matches; older ones follow newest first
+RANK_LIMIT = 2000
+HIT, END = "\x02", "\x03"  # snippet() markers, turned into <mark> by _highlight
+
+index_table = table("search_index", column("rowid"), column("title"), column("body"), column("code"))
+
+
+def _sources(kind):
+    """select(rowid, title, body, code) of the rows a kind contributes."""
+    k = KINDS[kind]
+    if kind == "project":
+        return select((Project.id * 4 + k).label("rowid"), Project.title,
+                      db.func.coalesce(Project.customer, ""), Project.code), Project.id
+    if kind == "task":
+        return select((Task.id * 4 + k).label("rowid"), Task.title,
+                      db.func.coalesce(Task.description, ""), literal("")), Task.id
+    return select((Comment.id * 4 + k).label("rowid"), literal(""), Comment.body, literal("")), Comment.id
+
+
+# -------- Index maintenance --------
+def _state():
+    return current_app.extensions.setdefault("search", {})
+
+
+def enabled(conn=None):
+    """True when the FTS5 index exists; checked once per process."""
+    state = _state()
+    if "fts" not in state:
+        conn = conn or db.session.connection()
+        state["fts"] = conn.dialect.name == "sqlite" and conn.execute(
+            text("SELECT 1 FROM sqlite_master WHERE name = 'search_index'")).first() is not None
+    return state["fts"]
+
+
+def create(conn):
+    """(Re)create and fill the FTS5 index; False when SQLite lacks FTS5 or the database isn't SQLite."""
+    ok = False
+    if conn.dialect.name == "sqlite":
+        conn.execute(text("DROP TABLE IF EXISTS search_index"))
+        try:
+            conn.execute(text("CREATE VIRTUAL TABLE search_index USING fts5("
+                              "title, body, code, prefix='2 3', tokenize='unicode61 remove_diacritics 2')"))
+            ok = True
+        except OperationalError:
+            pass  # built without FTS5
+    _state()["fts"] = ok
+    if ok:
+        rebuild(conn)
+    return ok
+
+
+def rebuild(conn=None):
+    """Re-index every project, task and comment; returns the number of rows indexed."""
+    conn = conn or db.session.connection()
+    if not enabled(conn):
+        return 0
+    conn.execute(index_table.delete())
+    count = 0
+    for kind in KINDS:
+        source, _ = _sources(kind)
+        count += conn.execute(index_table.insert().from_select(["rowid", "title", "body", "code"], source)).rowcount
+    if archive.ready(conn):
+        p = archive_project.c
+        count += conn.execute(index_table.insert().from_select(["rowid", "title", "body", "code"], select(
+            (p.id * 4 + KINDS["project"]).label("rowid"), p.title, db.func.coalesce(p.customer, ""), p.code))).rowcount
+    conn.execute(text("INSERT INTO search_index(search_index) VALUES ('optimize')"))
+    return count
+
+
+def index(conn, kind, ids, new=False):
+    """(Re)index ``ids`` of one kind from their current rows; ``new`` skips removing old entries."""
+    ids = list(ids)
+    if not ids or not enabled(conn):
+        return
+    source, id_col = _sources(kind)
+    if not new:
+        unindex(conn, kind, ids)
+    conn.execute(index_table.insert().from_select(["rowid", "title", "body", "code"], source.where(id_col.in_(ids))))
+
+
+def unindex(conn, kind, ids):
+    k = KINDS[kind]
+    conn.execute(index_table.delete().where(index_table.c.rowid.in_([i * 4 + k for i in ids])))
+
+
+def _changed(obj, attrs):
+    state = inspect(obj)
+    return any(state.attrs[a].history.has_changes() for a in attrs)
+
+
+@event.listens_for(db.session, "after_flush")
+def _sync_index(session, flush_context):
+    changed, removed = {kind: set() for kind in KINDS}, {kind: set() for kind in KINDS}
+    for obj in session.new:
+        if type(obj) in INDEXED:
+            changed[INDEXED[type(obj)][0]].add(obj.id)
+    for obj in session.dirty:
+        if type(obj) in INDEXED:
+            kind, attrs = INDEXED[type(obj)]
+            if _changed(obj, attrs):
+                changed[kind].add(obj.id)
+    for obj in session.deleted:
+        if type(obj) in INDEXED:
+            removed[INDEXED[type(obj)][0]].add(obj.id)
+    if not any(changed.values()) and not any(removed.values()):
+        return
+    conn = session.connection()
+    if not enabled(conn):
+        return
+    if removed["task"]:
+        # Comments aren't cascaded with their task; drop them from results all the same
+        removed["comment"].update(conn.execute(
+            select(Comment.id).where(Comment.task_id.in_(removed["task"]))).scalars())
+    for kind in KINDS:
+        if removed[kind]:
+            unindex(conn, kind, removed[kind])
+        if changed[kind] - removed[kind]:
+            index(conn, kind, changed[kind] - removed[kind])
+
+
+# -------- Queries --------
+def terms(q):
+    """Search words from user input, quotes and FTS syntax stripped."""
+    words = [w.replace('"', "") for w in (q or "").split()]
+    return [w for w in words if re.search(r"\w", w)][:MAX_TERMS]
+
+
+def search(q, kind=None, offset=0, limit=PAGE_SIZE):
+    """One page of hits for ``q``: (items, next_offset or None, truncated).
+
+    Items are dicts with kind, id, title, code, project_id, url and a
+    highlighted ``snippet`` (Markup); ``kind`` restricts to one of KINDS.
+    ``truncated`` is True when more than RANK_LIMIT rows match, so only the
+    first RANK_LIMIT results are in relevance order.
+    """
+    words = terms(q)
+    if not words:
+        return [], None, False
+    hits, truncated = (_fts_hits if enabled() else _like_hits)(words, kind, offset, limit + 1)
+    more = len(hits) > limit
+    items = _describe(hits[:limit])
+    return items, (offset + limit if more else None), truncated
+
+
+def _fts_hits(words, kind, offset, limit):
+    """([(kind, id, raw snippet)], truncated) from the FTS5 index.
+
+    Queries matching more than RANK_LIMIT rows are ranked by bm25 within
+    their newest RANK_LIMIT matches, a rowid range FTS5 seeks to directly;
+    offsets past that window page through the older matches newest first,
+    so every match stays reachable.
+    """
+    where = "search_index MATCH :match" + (" AND rowid % 4 = :k" if kind else "")
+    params = {"match": " ".join(f'"{w}"*' for w in words), "k": KINDS.get(kind)}
+    # rowid of the newest match outside the ranked window, None when everything fits
+    edge = db.session.execute(text(f"SELECT rowid FROM search_index WHERE {where} "
+                                   f"ORDER BY rowid DESC LIMIT 1 OFFSET :skip"), {**params, "skip": RANK_LIMIT}).scalar()
+    snippet = f"snippet(search_index, -1, '{HIT}', '{END}', '…', 12)"
+    rows = []
+    if edge is None or offset < RANK_LIMIT:
+        ranked = where + (" AND rowid > :edge" if edge is not None else "")
+        rows += db.session.execute(text(
+            f"SELECT rowid, {snippet} FROM search_index WHERE {ranked} "
+            f"ORDER BY bm25(search_index, {', '.join(map(str, WEIGHTS))}), rowid DESC "
+            f"LIMIT :limit OFFSET :offset"), {**params, "edge": edge, "limit": limit, "offset": offset}).all()
+    if edge is not None and len(rows) < limit:
+        rows += db.session.execute(text(
+            f"SELECT rowid, {snippet} FROM search_index WHERE {where} AND rowid <= :edge "
+            f"ORDER BY rowid DESC LIMIT :limit OFFSET :offset"),
+            {**params, "edge": edge, "limit": limit - len(rows), "offset": max(offset - RANK_LIMIT, 0)}).all()
+    names = {k: name for name, k in KINDS.items()}
+    return [(names[rowid % 4], rowid // 4, snippet) for rowid, snippet in rows], edge is not None
+
+
+def _like_hits(words, kind, offset, limit):
+    """Fallback without FTS5: every word must appear in one of the kind's columns.
+
+    Code-prefix matches rank first, then title matches, then the rest, newest
+    first within each; each kind is fetched up to offset + limit rows, so
+    results are never truncated.
+    """
+    def matches(*cols):
+        return and_(*[or_(*[c.ilike(f"%{w}%") for c in cols]) for w in words])
+
+    queries = {
+        "project": (select(Project.id, Project.code, Project.title, Project.customer)
+                    .where(matches(Project.code, Project.title, Project.customer)), Project.id),
+        "task": (select(Task.id, literal(""), Task.title, Task.description)
+                 .where(matches(Task.title, Task.description)), Task.id),
+        "comment": (select(Comment.id, literal(""), literal(""), Comment.body)
+                    .where(matches(Comment.body)), Comment.id),
+    }
+    lowered = [w.lower() for w in words]
+    found = []
+    for name, (q, id_col) in queries.items():
+        if kind and name != kind:
+            continue
+        for id_, code, title, body in db.session.execute(q.order_by(id_col.desc()).limit(offset + limit)):
+            score = (0 if (code or "").lower().startswith(lowered[0]) else
+                     1 if any(w in (title or "").lower() for w in lowered) else 2)
+            found.append((score, -id_, name, _like_snippet((code, title, body), words)))
+    found.sort(key=lambda f: (f[0], f[1], KINDS[f[2]]))
+    return [(name, -neg_id, snippet) for _, neg_id, name, snippet in found[offset:offset + limit]], False
+
+
+def _like_snippet(values, words, width=80):
+    """Up to ``width`` characters around the first match in the first matching field."""
+    pattern = re.compile("|".join(re.escape(w) for w in words), re.IGNORECASE)
+    value = next((v for v in values if v and pattern.search(v)), "")
+    m = pattern.search(value)
+    start = max(0, (m.start() if m else 0) - width // 2)
+    piece = value[start:start + width]
+    piece = pattern.sub(lambda m: f"{HIT}{m.group(0)}{END}", piece)
+    return ("…" if start else "") + piece + ("…" if start + width < len(value) else "")
+
+
+def _highlight(raw):
+    out = Markup("")
+    for i, part in enumerate(re.split(f"[{HIT}{END}]", raw or "")):
+        out += Markup("<mark>{}</mark>").format(part) if i % 2 else escape(part)
+    return out
+
+
+def _describe(hits):
+    """Hits as result dicts in hit order, one query per kind; rows deleted since indexing are dropped."""
+    ids = {name: [id_ for kind, id_, _ in hits if kind == name] for name in KINDS}
+    found = {}
+    if ids["project"]:
+        for pid, code, title, status in db.session.query(Project.id, Project.code, Project.title, Project.status) \
+                .filter(Project.id.in_(ids["project"])):
+            found["project", pid] = {"title": title, "code": code, "project_id": pid, "status": status}
+        missing = [pid for pid in ids["project"] if ("project", pid) not in found]
+        if missing and archive.ready():
+            p = archive_project.c
+            for pid, code, title in db.session.execute(select(p.id, p.code, p.title).where(p.id.in_(missing))):
+                found["project", pid] = {"title": title, "code": code, "project_id": pid, "status": "archived"}
+    if ids["task"]:
+        for tid, title, state, pid, code in db.session.query(Task.id, Task.title, Task.state, Project.id, Project.code) \
+                .join(Project, Project.id == Task.project_id).filter(Task.id.in_(ids["task"])):
+            found["task", tid] = {"title": title, "code": code, "project_id": pid, "state": state}
+    if ids["comment"]:
+        rows = (db.session.query(Comment.id, Comment.task_id, Comment.created_at, User.name, Task.title,
+                                 Project.id, Project.code)
+                .join(Task, Task.id == Comment.task_id).join(Project, Project.id == Task.project_id)
+                .outerjoin(User, User.id == Comment.user_id).filter(Comment.id.in_(ids["comment"])))
+        for cid, tid, at, user, title, pid, code in rows:
+            found["comment", cid] = {"title": title, "code": code, "project_id": pid, "task_id": tid,
+                                     "user": user or "Unknown", "created_at": at.strftime("%Y-%m-%d %H:%M") if at else None}
+    items = []
+    for kind, id_, snippet in hits:
+        info = found.get((kind, id_))
+        if info is None:
+            continue
+        items.append({"kind": kind, "id": id_, **info, "snippet": _highlight(snippet),
+                      "url": url_for("project_detail", pid=info["project_id"])})
+    return items
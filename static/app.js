@@ -25,26 +25,250 @@ async function dropTask(e){
     console.error('PATCH failed', err);
   }
 
-  refreshWidgets();
-  refreshWorkload();
-  refreshProgress();
+  // Live clients get the server's tasks_updated delta; only sync without one
+  if(!socketLive()){
+    resync();
+  }
+}
+
+// ---- Lazy Kanban columns ----
+// Each column renders its first page server-side; the '.more' sentinel below
+// the list pulls the next page from /dashboard/columns/<state>.json when it
+// scrolls into view.
+// /sync sends ISO dates; pages and socket deltas already use MM/DD/YYYY
+function showDate(due){
+  const m = /^(\d{4})-(\d{2})-(\d{2})$/.exec(due || '');
+  return m ? `${m[2]}/${m[3]}/${m[1]}` : (due || '');
+}
+
+function renderCard(t){
+  const card = document.createElement('article');
+  card.className = 'card task';
+  card.draggable = true;
+  card.dataset.task = t.id;
+  card.addEventListener('dragstart', dragTask);
+
+  const title = document.createElement('div');
+  title.className = 'title';
+  title.textContent = t.title;
+
+  const meta = document.createElement('div');
+  meta.className = 'meta';
+  const chip = document.createElement('span');
+  chip.className = `chip p${t.priority}`;
+  chip.textContent = `P${t.priority}`;
+  meta.append(chip);
+  if(t.due){
+    const time = document.createElement('time');
+    time.textContent = showDate(t.due);
+    meta.append(time);
+  }
+  const code = document.createElement('span');
+  code.className = 'right badge';
+  code.textContent = t.code;
+  meta.append(code);
+
+  const people = document.createElement('div');
+  people.className = 'meta assignees';
+  card.append(title, meta, people);
+  applyAssignees(card, t.assignees.map(name => ({name})));
+  return card;
 }
 
+async function loadMore(sentinel){
+  const list = sentinel.previousElementSibling;
+  const cursor = list && list.dataset.next;
+  if(!cursor || list.dataset.loading) return;
+  list.dataset.loading = '1';
+  sentinel.textContent = 'Loading…';
+  try{
+    const params = new URLSearchParams(location.search);
+    params.set('cursor', cursor);
+    const res = await fetch(`/dashboard/columns/${sentinel.dataset.state}.json?${params}`);
+    if(!res.ok) return;
+    const page = await res.json();
+    for(const t of page.items){
+      if(!document.querySelector(`[data-task="${t.id}"]`)) list.append(renderCard(t));
+    }
+    list.dataset.next = page.next || '';
+  }catch(e){
+    console.error('loadMore error', e);
+  }finally{
+    delete list.dataset.loading;
+    sentinel.textContent = '';
+  }
+  // Keep going while the sentinel is still on screen
+  const r = sentinel.getBoundingClientRect();
+  if(list.dataset.next && r.top < window.innerHeight) loadMore(sentinel);
+}
+
+document.addEventListener('DOMContentLoaded', () => {
+  const sentinels = document.querySelectorAll('.col .more');
+  if(!sentinels.length || typeof IntersectionObserver === 'undefined') return;
+  const observer = new IntersectionObserver(entries => {
+    for(const e of entries){
+      if(e.isIntersecting) loadMore(e.target);
+    }
+  }, {rootMargin: '200px'});
+  sentinels.forEach(s => observer.observe(s));
+});
+
 // ---- Socket.IO Live Updates ----
-const socket = typeof io !== 'undefined' ? io() : null;
+// Websocket only: lets several server workers share a message queue without sticky sessions.
+// The page's data-view / data-user / data-project pick the rooms it joins (realtime.py);
+// auth is re-read on every reconnect.
+const socket = typeof io !== 'undefined'
+  ? io({transports: ['websocket'], auth: cb => {
+      const {view, user, project} = document.body.dataset;
+      cb({view, user, project});
+    }})
+  : null;
+
+function socketLive(){
+  return !!(socket && socket.connected);
+}
+
 if (socket){
-  socket.on('task_updated', ({id, state}) => {
-    // Move the card if it exists on this page (dashboard)
-    const card = document.querySelector(`[data-task="${id}"]`);
-    if(card && state){
-      const col = document.querySelector(`.col[data-state="${state}"] .list`);
-      if(col){ col.prepend(card); }
-    }
-    // Always refresh widgets and project progress (affects Projects tab too)
-    refreshWidgets();
-  refreshWorkload();
-    refreshProgress();
+  // One event per room per burst: the cards and delta this page shows, merged server-side
+  socket.on('tasks_updated', ({tasks, delta}) => {
+    tasks.forEach(applyTaskUpdate);
+    applyDelta(delta);
+  });
+  // Imports and other large writes: re-fetch rather than ship a delta
+  socket.on('dashboard_changed', refreshAll);
+  // Catch up on anything missed while disconnected
+  socket.io.on('reconnect', resync);
+}
+
+function applyTaskUpdate({id, state, assignees}){
+  // Move the card if it exists on this page (dashboard)
+  const card = document.querySelector(`[data-task="${id}"]`);
+  if(card && state){
+    const col = document.querySelector(`.col[data-state="${state}"] .list`);
+    if(col){ col.prepend(card); }
+  }
+  if(card && assignees){
+    applyAssignees(card, assignees);
+  }
+}
+
+// ---- Apply server-computed deltas in place ----
+function applyDelta(delta){
+  if(delta.progress) applyProgress(delta.progress);
+  if(delta.workload){
+    // Filtered dashboards scope workload to one user's tasks; re-fetch those
+    if(new URLSearchParams(location.search).get('user')) refreshWorkload();
+    else applyWorkload(delta.workload);
+  }
+  if(delta.due_soon) applyTaskList('dueSoonList', delta.due_soon, 'All clear.', (li, t) => {
+    const strong = document.createElement('strong');
+    strong.textContent = showDate(t.due);
+    li.append(`${t.code} • ${t.title} — `, strong);
   });
+  if(delta.blocked){
+    applyTaskList('blockedList', delta.blocked, 'No blocked tasks 🎉', fillBlocked);
+    setBlockedNext(delta.blocked_next);
+  }
+}
+
+function fillBlocked(li, t){
+  const badge = document.createElement('span');
+  badge.className = 'badge';
+  badge.textContent = `P${t.priority}`;
+  li.append(`${t.code} • ${t.title} `, badge);
+}
+
+function setBlockedNext(next){
+  const ul = document.getElementById('blockedList');
+  if(!ul) return;
+  ul.dataset.next = next || '';
+  const button = ul.parentElement.querySelector('.more-blocked');
+  if(button) button.hidden = !next;
+}
+
+// The widget shows the top blocked tasks; 'More' pages through the rest
+async function loadMoreBlocked(button){
+  const ul = document.getElementById('blockedList');
+  if(!ul || !ul.dataset.next) return;
+  button.disabled = true;
+  try{
+    const res = await fetch(`/dashboard/blocked.json?cursor=${encodeURIComponent(ul.dataset.next)}`);
+    if(!res.ok) return;
+    const page = await res.json();
+    for(const t of page.items){
+      const li = document.createElement('li');
+      fillBlocked(li, t);
+      ul.append(li);
+    }
+    setBlockedNext(page.next);
+  }catch(e){
+    console.error('loadMoreBlocked error', e);
+  }finally{
+    button.disabled = false;
+  }
+}
+
+function applyAssignees(card, assignees){
+  const meta = card.querySelector('.assignees');
+  if(!meta) return;
+  meta.replaceChildren(...assignees.map(a => {
+    const span = document.createElement('span');
+    span.className = 'avatar';
+    span.title = a.name;
+    span.textContent = a.name[0];
+    return span;
+  }));
+}
+
+function applyWorkload(rows, complete){
+  // complete: rows is the whole table (sync), so drop anyone missing from it
+  const tbody = document.getElementById('workloadRows');
+  if(!tbody) return;
+  if(complete){
+    const names = new Set(rows.map(w => w.name));
+    tbody.querySelectorAll('tr[data-name]').forEach(tr => { if(!names.has(tr.dataset.name)) tr.remove(); });
+  }
+  for(const w of rows){
+    let tr = [...tbody.querySelectorAll('tr[data-name]')].find(r => r.dataset.name === w.name);
+    if(!w.count){
+      if(tr) tr.remove();
+      continue;
+    }
+    if(!tr){
+      tr = document.createElement('tr');
+      tr.dataset.name = w.name;
+      tr.append(document.createElement('td'), document.createElement('td'), document.createElement('td'));
+      tbody.append(tr);
+    }
+    tr.dataset.hours = w.hours;
+    tr.cells[0].textContent = w.name;
+    tr.cells[1].textContent = w.count;
+    tr.cells[2].textContent = w.hours.toFixed(1);
+  }
+  // Keep hours-desc order and the empty placeholder in sync
+  const trs = [...tbody.querySelectorAll('tr[data-name]')];
+  trs.sort((a, b) => rowHours(b) - rowHours(a)).forEach(r => tbody.append(r));
+  const empty = tbody.querySelector('tr:not([data-name])');
+  if(trs.length && empty) empty.remove();
+  if(!trs.length && !empty) tbody.innerHTML = '<tr><td colspan="2" class="help">No open tasks.</td></tr>';
+}
+
+function rowHours(tr){
+  return parseFloat(tr.dataset.hours || tr.cells[2].textContent) || 0;
+}
+
+function applyTaskList(listId, items, emptyText, fill){
+  const ul = document.getElementById(listId);
+  if(!ul) return;
+  if(!items.length){
+    ul.innerHTML = `<li class="help">${emptyText}</li>`;
+    return;
+  }
+  ul.replaceChildren(...items.map(t => {
+    const li = document.createElement('li');
+    fill(li, t);
+    return li;
+  }));
 }
 
 // ---- Widgets (Workload / Due Soon / Blocked) ----
@@ -54,7 +278,7 @@ async function refreshWidgets(){
     const aside = document.getElementById('rightAside');
     if(!aside) return;
     const qs = location.search || '';
-    const res = await fetch(`/dashboard/widgets${qs}${qs ? '&' : '?'}ts=${Date.now()}`);
+    const res = await fetch(`/dashboard/widgets${qs}`, {cache: 'no-cache'});
     const html = await res.text();
     const wrapper = document.createElement('div');
     wrapper.innerHTML = html;
@@ -68,42 +292,116 @@ async function refreshWidgets(){
 // ---- Project Progress (Dashboard + Projects tab) ----
 async function refreshProgress(){
   try{
-    // Progress card exists on dashboard; on Projects tab, only per-row bars exist
-    const res = await fetch(`/dashboard/progress.json?ts=${Date.now()}`);
+    // Progress card exists on dashboard; on Projects tab, only per-row bars exist.
+    // 'no-cache' revalidates with If-None-Match, so unchanged data is a 304.
+    const res = await fetch('/dashboard/progress.json', {cache: 'no-cache'});
     if(!res.ok) return;
-    const items = await res.json();
-    for(const p of items){
-      // Update dashboard card if present
-      const barDash = document.getElementById(`bar-${p.id}`);
-      const txtDash = document.getElementById(`txt-${p.id}`);
-      if(barDash) barDash.style.width = `${p.pct}%`;
-      if(txtDash) txtDash.textContent = `${p.done}/${p.total} (${p.pct}%)`;
-
-      // Update Projects table if present
-      const barProj = document.getElementById(`proj-bar-${p.id}`);
-      const txtProj = document.getElementById(`proj-txt-${p.id}`);
-      if(barProj) barProj.style.width = `${p.pct}%`;
-      if(txtProj) txtProj.textContent = `${p.done}/${p.total} (${p.pct}%)`;
-    }
+    applyProgress(await res.json());
   }catch(e){
     console.error('refreshProgress error', e);
   }
 }
 
-// ---- Kick off on page load, focus, and as a gentle fallback ----
-document.addEventListener('DOMContentLoaded', () => {
-  refreshProgress();      // initial
+function applyProgress(items){
+  for(const p of items){
+    // Update dashboard card if present
+    const barDash = document.getElementById(`bar-${p.id}`);
+    const txtDash = document.getElementById(`txt-${p.id}`);
+    if(barDash) barDash.style.width = `${p.pct}%`;
+    if(txtDash) txtDash.textContent = `${p.done}/${p.total} (${p.pct}%)`;
+
+    // Update Projects table if present
+    const barProj = document.getElementById(`proj-bar-${p.id}`);
+    const txtProj = document.getElementById(`proj-txt-${p.id}`);
+    if(barProj) barProj.style.width = `${p.pct}%`;
+    if(txtProj) txtProj.textContent = `${p.done}/${p.total} (${p.pct}%)`;
+  }
+}
+
+function refreshAll(){
+  refreshProgress();
   refreshWidgets();
-  refreshWorkload();       // if on dashboard
-  // Fallback refresher (5s)
-  setInterval(refreshProgress, 5000);
+  refreshWorkload();
+}
+
+// ---- Delta sync ----
+// Pages rendered with data-version (dashboard, projects) ask /sync for what
+// changed since then: one JSON request with the changed cards, tombstones and
+// widgets, or a full snapshot when too far behind. Other pages re-fetch.
+let syncing = false;
+
+async function resync(){
+  const data = document.body.dataset;
+  if(!data.version) return refreshAll();
+  if(syncing) return;
+  syncing = true;
+  try{
+    const params = new URLSearchParams({since: data.version});
+    if(data.user) params.set('user', data.user);
+    const res = await fetch(`/sync?${params}`, {cache: 'no-store'});
+    if(!res.ok) return refreshAll();
+    const sync = await res.json();
+    if(sync.full) applySnapshot(sync);
+    else sync.changes.forEach(applyChange);
+    if(sync.delta){
+      const {workload, ...widgets} = sync.delta;
+      applyDelta(widgets);
+      if(workload) applyWorkload(workload, true);
+    }
+    data.version = sync.version;
+  }catch(e){
+    console.error('resync error', e);
+  }finally{
+    syncing = false;
+  }
+}
+
+function onBoard(t){
+  // Filtered dashboards only show the filtered user's tasks
+  const user = document.body.dataset.user;
+  return t.board && (!user || t.assignee_ids.includes(Number(user)));
+}
+
+function applyChange(change){
+  if(change.type !== 'task') return;
+  const card = document.querySelector(`[data-task="${change.id}"]`);
+  const t = change.data;
+  if(change.deleted || !onBoard(t)){
+    if(card) card.remove();
+    return;
+  }
+  const list = document.querySelector(`.col[data-state="${t.state}"] .list`);
+  if(!list) return;
+  const fresh = renderCard(t);
+  if(card && card.parentElement === list) card.replaceWith(fresh);
+  else{
+    if(card) card.remove();
+    list.prepend(fresh);
+  }
+}
+
+function applySnapshot(sync){
+  for(const [state, column] of Object.entries(sync.columns)){
+    const col = document.querySelector(`.col[data-state="${state}"]`);
+    if(!col) continue;
+    const list = col.querySelector('.list');
+    list.replaceChildren(...column.items.map(renderCard));
+    list.dataset.next = column.next || '';
+    const count = col.querySelector('header .help');
+    if(count) count.textContent = `${sync.counts[state] || 0}${state === 'done' ? ' recent' : ''}`;
+  }
+}
+
+// ---- Kick off on page load, focus, and as a degraded fallback ----
+document.addEventListener('DOMContentLoaded', () => {
+  resync();                // initial
+  // Fallback sync (5s), only while the socket can't push deltas
+  setInterval(() => { if(!socketLive()) resync(); }, 5000);
 });
 
 document.addEventListener('visibilitychange', () => {
   if(document.visibilityState === 'visible'){
-    refreshProgress();
-    refreshWidgets();
-  refreshWorkload();
+    resync();
   }
 });
 
@@ -115,7 +413,7 @@ window.dropTask = dropTask;
 async function refreshWorkload(){
   try{
     const qs = location.search || '';
-    const res = await fetch(`/dashboard/workload${qs}${qs ? '&' : '?'}ts=${Date.now()}`);
+    const res = await fetch(`/dashboard/workload${qs}`, {cache: 'no-cache'});
     if(!res.ok) return;
     const html = await res.text();
     const left = document.getElementById('leftAside');
@@ -0,0 +1,50 @@
+import os, sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture
+def app(tmp_path, monkeypatch):
+    """The app on a throwaway SQLite database with the demo shop seeded."""
+    monkeypatch.setenv("DATABASE_URL", f"sqlite:///{tmp_path}/test.db")
+    monkeypatch.setenv("SOCKETIO_ASYNC_MODE", "threading")
+    monkeypatch.setenv("SOCKETIO_COALESCE_MS", "0")
+    import app as appmod
+    app = appmod.create_app()
+    app.config["TESTING"] = True
+    appmod.init_db(app)
+    appmod.seed_demo(app)
+    return app
+
+
+@pytest.fixture
+def client(app):
+    """Test client logged in as the seeded admin."""
+    c = app.test_client()
+    c.post("/login", data={"email": "admin@example.com", "password": "Password"})
+    return c
+
+
+@pytest.fixture
+def statements(app, client):
+    """statements(url) -> SQL statements executed by one GET of ``url`` (asserted to be a 200)."""
+    from sqlalchemy import event
+    from models import db
+    with app.app_context():
+        engine = db.engine
+
+    def run(url):
+        executed = [0]
+
+        def count(*args, **kwargs):
+            executed[0] += 1
+
+        event.listen(engine, "before_cursor_execute", count)
+        try:
+            assert client.get(url).status_code == 200, url
+        finally:
+            event.remove(engine, "before_cursor_execute", count)
+        return executed[0]
+    return run
@@ -0,0 +1,81 @@
+from datetime import datetime, timedelta
+
+import analytics
+import archive
+from models import db, Audit, Comment, Project, Task, TaskAssignment
+
+
+def add_history(app, jobs):
+    """Finished, archived jobs with a task, assignment and comment each, then one new live job.
+
+    The previous call's live job is archived too, so each call leaves the same live rows.
+    """
+    with app.app_context():
+        Project.query.filter(Project.code.like("NEW-%")).update({"status": "archived"}, synchronize_session=False)
+        for _ in range(jobs):
+            p = Project(code=f"OLD-{Project.query.count() + 1}", title="Shipped bracket", status="archived", created_by=1)
+            db.session.add(p)
+            db.session.flush()
+            t = Task(project_id=p.id, title="Mill bracket", state="done", est_hours=2, created_by=1)
+            db.session.add(t)
+            db.session.flush()
+            db.session.add_all([TaskAssignment(task_id=t.id, user_id=2), Comment(task_id=t.id, user_id=2, body="shipped")])
+        # The archiver leaves the projects holding the newest rows for its next run
+        live = Project(code=f"NEW-{Project.query.count() + 1}", title="Live job", created_by=1)
+        db.session.add(live)
+        db.session.flush()
+        t = Task(project_id=live.id, title="Program OP10", created_by=1)
+        db.session.add(t)
+        db.session.flush()
+        db.session.add_all([TaskAssignment(task_id=t.id, user_id=3), Comment(task_id=t.id, user_id=3, body="started")])
+        db.session.commit()
+
+
+def live_counts(app):
+    with app.app_context():
+        return {name: counts["live"] for name, counts in archive.stats().items()}
+
+
+def test_archived_job_moves_and_reads_through(app, client):
+    add_history(app, 1)
+    with app.app_context():
+        old = Project.query.filter_by(code="OLD-3").one().id
+        assert archive.run(pause=0)["projects"] == 1
+        assert db.session.get(Project, old) is None
+        assert archive.run(pause=0) == {"projects": 0, "audits": 0}
+    page = client.get(f"/projects/{old}")
+    assert page.status_code == 200 and b"Mill bracket" in page.data and b"Alex Eng" in page.data
+    export = client.get("/export/tasks.csv?project=OLD-3").get_data(as_text=True)
+    assert "OLD-3,Mill bracket,done,Alex Eng" in export
+
+
+def test_old_audit_rows_leave_once_analytics_has_seen_them(app, client):
+    client.patch("/tasks/1", json={"state": "review"})
+    client.patch("/tasks/2", json={"state": "review"})
+    with app.app_context():
+        for a in Audit.query:
+            a.at = datetime.utcnow() - timedelta(days=app.config["AUDIT_RETENTION_DAYS"] + 1)
+        db.session.commit()
+        assert archive.archive_audits(pause=0) == 0  # analytics hasn't processed them yet
+        analytics.refresh(settle=0)
+        total = Audit.query.count()
+        assert archive.archive_audits(pause=0) == total - 1  # the newest row stays
+        assert Audit.query.count() == 1
+    assert client.get("/audit").status_code == 200
+
+
+def test_live_tables_and_dashboard_work_stay_flat_as_history_grows(app, client, statements):
+    add_history(app, 0)
+    with app.app_context():
+        archive.run(pause=0)
+    baseline = live_counts(app)
+    client.get("/")  # first-request work (user cache) out of the way
+    dashboard = statements("/")
+    for jobs in (10, 40):
+        add_history(app, jobs)
+        with app.app_context():
+            assert archive.run(pause=0)["projects"] == jobs + 1  # and the previous round's live job
+        assert live_counts(app) == baseline
+        assert statements("/") == dashboard
+    with app.app_context():
+        assert archive.stats()["task"]["archived"] == 52
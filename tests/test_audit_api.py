@@ -0,0 +1,10 @@
+def test_audit_history_requires_manager_or_admin(app, client):
+    engineer = app.test_client()
+    engineer.post("/login", data={"email": "alex@example.com", "password": "Password"})
+    assert engineer.get("/audit?entity_type=user").status_code == 403
+    assert engineer.get("/audit?stream=1").status_code == 403
+
+    client.patch("/tasks/1", json={"state": "blocked"})
+    resp = client.get("/audit?field=state&value=blocked")
+    assert resp.status_code == 200
+    assert [a["entity_id"] for a in resp.get_json()["items"]] == [1]
@@ -0,0 +1,70 @@
+import threading
+
+from werkzeug.security import generate_password_hash
+
+import auth
+from models import db, User
+
+
+def test_load_user_is_cached_until_the_user_changes(app):
+    with app.app_context():
+        assert auth.load_user(2).name == "Alex Eng"
+        misses = auth.stats()["cache_misses"]
+        assert auth.load_user(2).name == "Alex Eng"
+        assert auth.stats()["cache_misses"] == misses and auth.stats()["cache_hits"] >= 1
+        db.session.rollback()
+
+        db.session.get(User, 2).name = "Alex Engineer"
+        db.session.commit()
+        assert auth.load_user(2).name == "Alex Engineer"
+        assert auth.stats()["cache_misses"] == misses + 1
+
+        db.session.delete(db.session.get(User, 3))
+        db.session.commit()
+        assert auth.load_user(3) is None
+
+
+def test_cache_expires_after_the_ttl(app):
+    app.config["USER_CACHE_TTL"] = 0
+    with app.app_context():
+        auth.load_user(2)
+        db.session.execute(User.__table__.update().where(User.id == 2).values(name="Changed elsewhere"))
+        db.session.commit()
+        assert auth.load_user(2).name == "Changed elsewhere"
+
+
+def test_stats_are_exact_under_threads(app):
+    with app.app_context():
+        auth.load_user(2)
+        hits = auth.stats()["cache_hits"]
+
+    def worker():
+        with app.app_context():
+            for _ in range(500):
+                auth.load_user(2)
+    threads = [threading.Thread(target=worker) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    with app.app_context():
+        assert auth.stats()["cache_hits"] == hits + 8 * 500
+
+
+def test_login_rehashes_other_methods(app):
+    with app.app_context():
+        db.session.get(User, 2).password_hash = generate_password_hash("Password", "pbkdf2:sha256")
+        db.session.commit()
+    client = app.test_client()
+    assert client.post("/login", data={"email": "alex@example.com", "password": "Password"}).status_code == 302
+    with app.app_context():
+        stored = db.session.get(User, 2).password_hash
+        assert not auth.needs_rehash(stored) and stored.startswith("scrypt")
+        assert auth.stats()["rehashed"] == 1
+
+    # The new hash still signs in, without another rehash; a wrong password doesn't
+    client = app.test_client()
+    assert client.post("/login", data={"email": "alex@example.com", "password": "Password"}).status_code == 302
+    assert client.post("/login", data={"email": "alex@example.com", "password": "nope"}).status_code == 200
+    with app.app_context():
+        assert auth.stats()["rehashed"] == 1 and auth.stats()["failed"] == 1
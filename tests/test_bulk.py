@@ -0,0 +1,73 @@
+from sqlalchemy import func
+
+import rollups
+from models import db, ChangeLog, Task, TaskAssignment
+
+
+def snapshot(app):
+    with app.app_context():
+        return {t.id: (t.title, t.state, t.priority, t.updated_at) for t in Task.query.order_by(Task.id)}
+
+
+def test_update_is_all_or_nothing(app, client):
+    before = snapshot(app)
+    resp = client.post("/tasks/bulk", json={"tasks": [
+        {"id": 1, "state": "review"},
+        {"id": 2, "priority": 9},
+        {"id": 999, "state": "done"},
+    ]})
+    assert resp.status_code == 400
+    errors = {(e["row"], e["field"]) for e in resp.get_json()["errors"]}
+    assert errors == {(1, "priority"), (2, "id")}
+    assert snapshot(app) == before
+
+
+def test_create_skip_invalid(app, client):
+    rows = [{"title": "Deburr", "assign": [2]}, {"title": ""}, {"title": "Inspect", "priority": 7},
+            {"title": "Pack", "state": "ready"}]
+    resp = client.post("/projects/1/tasks/bulk", json={"tasks": rows})
+    assert resp.status_code == 400 and resp.get_json()["created"] == []
+
+    resp = client.post("/projects/1/tasks/bulk", json={"tasks": rows, "skip_invalid": True})
+    assert resp.status_code == 201
+    body = resp.get_json()
+    assert {(e["row"], e["field"]) for e in body["errors"]} == {(1, "title"), (2, "priority")}
+    with app.app_context():
+        created = {t.title: t for t in Task.query.filter(Task.id.in_(body["created"]))}
+        assert set(created) == {"Deburr", "Pack"} and created["Pack"].state == "ready"
+        assert [a.user_id for a in created["Deburr"].assignments] == [2]
+        assert rollups.verify() == []
+
+
+def test_update_keeps_rollups_exact(app, client):
+    resp = client.post("/tasks/bulk", json={"tasks": [
+        {"id": 1, "state": "done", "unassign": [2]},
+        {"id": 3, "state": "in_progress", "assign": [1, 2]},
+        {"id": 4, "state": "done", "priority": 1},
+    ]})
+    assert resp.status_code == 200 and resp.get_json()["updated"] == 3
+    with app.app_context():
+        assert db.session.get(Task, 1).state == "done"
+        assert {a.user_id for a in TaskAssignment.query.filter_by(task_id=3)} == {1, 2, 3}
+        assert rollups.verify() == []
+    assert client.post("/tasks/bulk", json={"ids": [1, 2, 3, 4], "set": {"state": "review"}}).status_code == 200
+    with app.app_context():
+        assert rollups.verify() == []
+
+
+def test_unchanged_values_are_not_written(app, client):
+    before = snapshot(app)
+    with app.app_context():
+        logged = db.session.query(func.count(ChangeLog.id)).scalar()
+    title, state, priority, _ = before[1]
+    resp = client.post("/tasks/bulk", json={"tasks": [
+        {"id": 1, "title": title, "state": state, "priority": priority},
+        {"id": 2, "title": before[2][0], "priority": 5},
+    ]})
+    assert resp.status_code == 200
+    after = snapshot(app)
+    assert after[1] == before[1]  # updated_at included
+    assert after[2][2] == 5 and after[2][3] > before[2][3]
+    with app.app_context():
+        entries = db.session.query(ChangeLog.entity_id).filter(ChangeLog.id > logged).all()
+        assert [e for (e,) in entries] == [2]
@@ -0,0 +1,31 @@
+from datetime import date, timedelta
+
+from models import db, Task, TaskAssignment, TASK_STATES
+
+ROUTES = ["/", "/dashboard/widgets", "/dashboard/workload"]
+SIZES = (10, 500)
+
+
+def add_tasks(app, count):
+    with app.app_context():
+        for i in range(count):
+            t = Task(project_id=1 + i % 2, title=f"Op {i}", state=TASK_STATES[i % len(TASK_STATES)],
+                     priority=1 + i % 3, est_hours=1.5, created_by=1,
+                     due_date=date.today() + timedelta(days=i % 10) if i % 4 else None)
+            db.session.add(t)
+            db.session.flush()
+            db.session.add(TaskAssignment(task_id=t.id, user_id=1 + i % 3))
+        db.session.commit()
+
+
+def test_dashboard_statement_count_is_constant(app, client, statements):
+    for url in ROUTES:
+        client.get(url)  # first-request work (user cache, analytics catch-up) out of the way
+    measured = []
+    have = 0
+    for size in SIZES:
+        add_tasks(app, size - have)
+        have = size
+        measured.append({url: statements(url) for url in ROUTES})
+    assert measured[0] == measured[1]
+    assert all(n <= 25 for n in measured[0].values()), measured[0]
@@ -0,0 +1,45 @@
+import pytest
+
+URLS = ["/dashboard/widgets", "/dashboard/progress", "/dashboard/progress.json", "/dashboard/workload"]
+
+
+@pytest.mark.parametrize("url", URLS)
+def test_matching_etag_gets_an_empty_304(client, url):
+    first = client.get(url)
+    assert first.status_code == 200 and first.headers["ETag"]
+    again = client.get(url, headers={"If-None-Match": first.headers["ETag"]})
+    assert again.status_code == 304
+    assert again.get_data() == b""
+    assert again.headers["ETag"] == first.headers["ETag"]
+
+
+def test_etag_changes_after_a_task_write(client):
+    etag = client.get("/dashboard/progress.json").headers["ETag"]
+    assert client.patch("/tasks/1", json={"state": "done"}).status_code == 204
+    fresh = client.get("/dashboard/progress.json", headers={"If-None-Match": etag})
+    assert fresh.status_code == 200
+    assert fresh.headers["ETag"] != etag
+    assert client.get("/dashboard/progress.json", headers={"If-None-Match": fresh.headers["ETag"]}).status_code == 304
+
+
+def test_etag_depends_on_the_query_string(client):
+    everyone = client.get("/dashboard/workload").headers["ETag"]
+    filtered = client.get("/dashboard/workload?user=2")
+    assert filtered.headers["ETag"] != everyone
+    assert client.get("/dashboard/workload?user=2", headers={"If-None-Match": everyone}).status_code == 200
+
+
+def test_304_reads_no_task_data(app, client):
+    from sqlalchemy import event
+    from models import db
+    etag = client.get("/dashboard/widgets").headers["ETag"]
+    executed = []
+    with app.app_context():
+        engine = db.engine
+    listener = lambda conn, cursor, statement, *args: executed.append(statement)
+    event.listen(engine, "before_cursor_execute", listener)
+    try:
+        assert client.get("/dashboard/widgets", headers={"If-None-Match": etag}).status_code == 304
+    finally:
+        event.remove(engine, "before_cursor_execute", listener)
+    assert not [s for s in executed if "FROM task" in s]
@@ -0,0 +1,22 @@
+import csv
+import io
+
+from sqlalchemy.dialects import mysql, postgresql, sqlite
+
+import exports
+from models import Project, Task, TaskAssignment
+
+
+def test_assignee_names_compile_per_dialect():
+    q = exports._task_rows(Project.__table__, Task.__table__, TaskAssignment.__table__)
+    sql = {name: str(q.compile(dialect=d)) for name, d in
+           (("sqlite", sqlite.dialect()), ("postgresql", postgresql.dialect()), ("mysql", mysql.dialect()))}
+    assert "group_concat(user.name, ', ')" in sql["sqlite"]
+    assert "string_agg(\"user\".name, ', ')" in sql["postgresql"]
+    assert "group_concat(user.name SEPARATOR ', ')" in sql["mysql"]
+
+
+def test_export_lists_assignees(client):
+    resp = client.get("/export/tasks.csv?project=JOB-1002")
+    rows = list(csv.DictReader(io.StringIO(resp.get_data(as_text=True))))
+    assert {r["Task"]: r["Assignees"] for r in rows} == {"Post-process NC": "Sam Prog", "QC first article": ""}
@@ -0,0 +1,57 @@
+import csv
+import io
+import json
+
+import imports
+from models import db, Project, Task
+
+
+def post(client, kind, body, filename):
+    return client.post(f"/import/{kind}", data={"file": (io.BytesIO(body.encode()), filename)})
+
+
+def test_bad_json_line_is_a_row_error(client):
+    lines = [json.dumps({"project_code": "JOB-1001", "title": f"OP{i}"}) for i in range(3)]
+    lines.insert(1, '{"project_code": "JOB-1001", "title": ')
+    resp = post(client, "tasks", "\n".join(lines) + "\n", "t.jsonl")
+    report = resp.get_json()
+    assert resp.status_code == 200
+    assert (report["rows"], report["inserted"], report["error_count"]) == (4, 3, 1)
+    assert report["errors"][0]["row"] == 2 and report["errors"][0]["error"].startswith("invalid JSON")
+
+
+def test_unreadable_csv_row_is_a_row_error(client):
+    huge = "x" * (csv.field_size_limit() + 1)
+    body = f"code,title\nJOB-3001,Plate\nJOB-3002,\"{huge}\"\nJOB-3003,Cover\n"
+    report = post(client, "projects", body, "p.csv").get_json()
+    assert (report["inserted"], report["error_count"]) == (2, 1)
+    assert report["errors"][0]["error"].startswith("unreadable CSV")
+
+
+def test_project_status_is_validated(client):
+    report = post(client, "projects", "code,title,status\nJOB-3001,Plate,Active\nJOB-3002,Shaft,shipped\n",
+                  "p.csv").get_json()
+    assert report["inserted"] == 1
+    assert report["errors"] == [{"row": 2, "field": "status", "error": "must be one of active, archived"}]
+
+
+def test_broken_json_array_returns_the_partial_report(client):
+    body = '[{"project_code": "JOB-1001", "title": "OP1"}, {"title": '
+    resp = client.post("/import/tasks?format=json", data=body, content_type="application/json")
+    assert resp.status_code == 422
+    assert resp.get_json()["aborted"].startswith("stopped after row 1: JSONDecodeError")
+
+
+def test_integrity_error_keeps_committed_rows(app):
+    with app.app_context():
+        importer = imports.Importer("projects", chunk_size=1, commit_every=1)
+        # Another writer takes the code after the importer loaded its lookups
+        db.session.add(Project(code="JOB-3002", title="Taken"))
+        db.session.commit()
+        report = importer.run(iter([{"project_code": "JOB-3001", "title": "Plate"},
+                                    {"project_code": "JOB-3002", "title": "Shaft"},
+                                    {"project_code": "JOB-3003", "title": "Cover"}]))
+        assert report["inserted"] == 1
+        assert "IntegrityError" in report["aborted"]
+        assert {p.code for p in Project.query.filter(Project.code.like("JOB-300%"))} == {"JOB-3001", "JOB-3002"}
+        assert Task.query.count() == 4
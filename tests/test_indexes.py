@@ -0,0 +1,29 @@
+from sqlalchemy import text
+
+import migrations
+from models import db
+
+
+def test_hot_queries_use_indexes(app):
+    with app.app_context():
+        results = migrations.explain_hot_queries()
+    assert {name for name, _, _ in results} >= {"due_soon", "blocked", "kanban_column", "progress", "comment_page"}
+    assert {name: plan for name, plan, ok in results if not ok} == {}
+
+
+def test_temp_btree_sort_fails_the_check(app, monkeypatch):
+    unindexed = db.select(text("id")).select_from(text("task")).order_by(text("title"))
+    monkeypatch.setattr(migrations, "_hot_queries", lambda: {"by_title": unindexed})
+    with app.app_context():
+        [(name, plan, ok)] = migrations.explain_hot_queries()
+    assert not ok and any("TEMP B-TREE" in p for p in plan)
+
+
+def test_migrations_replay_in_place(app):
+    # Re-running every step over an up-to-date schema must be a no-op
+    with app.app_context():
+        with db.engine.begin() as conn:
+            conn.execute(text("DELETE FROM schema_version"))
+        applied = migrations.upgrade()
+        assert [v for v, _ in applied] == [v for v, _, _ in migrations.MIGRATIONS]
+        assert all(ok for _, _, ok in migrations.explain_hot_queries())
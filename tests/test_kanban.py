@@ -0,0 +1,61 @@
+from datetime import date, datetime, timedelta
+
+import dashboard_data
+from models import db, Project, Task, TaskAssignment, TASK_STATES
+
+
+def add_board(app):
+    with app.app_context():
+        archived = Project(code="OLD-1", title="Shipped", status="archived", created_by=1)
+        db.session.add(archived)
+        db.session.flush()
+        for i in range(150):
+            state = TASK_STATES[i % len(TASK_STATES)]
+            t = Task(project_id=archived.id if i % 9 == 0 else 1 + i % 2, title=f"Op {i}", state=state,
+                     priority=1 + i % 3, created_by=1, due_date=date.today() + timedelta(days=i % 7) if i % 5 else None)
+            if state == "done" and i % 4 == 0:
+                t.updated_at = datetime.utcnow() - timedelta(days=dashboard_data.DONE_WINDOW_DAYS + 1)
+            db.session.add(t)
+            db.session.flush()
+            db.session.add(TaskAssignment(task_id=t.id, user_id=1 + i % 3))
+        db.session.commit()
+
+
+def test_counts_match_the_board(app):
+    add_board(app)
+    with app.app_context():
+        cutoff = datetime.utcnow() - timedelta(days=dashboard_data.DONE_WINDOW_DAYS)
+        for user_id in (None, 2):
+            tasks = dashboard_data._active_tasks_query(user_id).all()
+            expected = {}
+            for t in tasks:
+                if t.state != "done" or t.updated_at >= cutoff:
+                    expected[t.state] = expected.get(t.state, 0) + 1
+            counts = {s: n for s, n in dashboard_data.kanban_counts(user_id).items() if n}
+            assert counts == expected
+
+
+def test_column_pages_in_board_order(app):
+    add_board(app)
+    with app.app_context():
+        seen, cursor = [], None
+        while True:
+            tasks, cursor = dashboard_data.kanban_column("ready", cursor=cursor, limit=4)
+            seen += [(t.priority, t.due_date or dashboard_data.NO_DUE_DATE, t.id) for t in tasks]
+            if not cursor:
+                break
+        assert seen == sorted(seen)
+        assert len(seen) == dashboard_data.kanban_counts()["ready"]
+
+
+def test_blocked_widget_is_capped_and_paged(app, client):
+    add_board(app)
+    with app.app_context():
+        total = Task.query.filter_by(state="blocked").count()
+    page = client.get("/dashboard/blocked.json?cursor=").get_json()
+    ids = [t["id"] for t in page["items"]]
+    while page["next"]:
+        page = client.get(f"/dashboard/blocked.json?cursor={page['next']}").get_json()
+        ids += [t["id"] for t in page["items"]]
+    assert len(ids) == len(set(ids)) == total
+    assert client.get("/dashboard/blocked.json?cursor=x").status_code == 400
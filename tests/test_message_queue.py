@@ -0,0 +1,69 @@
+import multiprocessing
+import os
+import sys
+import time
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "bench"))
+
+
+def make_apps(tmp_path, monkeypatch, queue, count):
+    monkeypatch.setenv("DATABASE_URL", f"sqlite:///{tmp_path}/shop.db")
+    monkeypatch.setenv("SOCKETIO_ASYNC_MODE", "threading")
+    monkeypatch.setenv("SOCKETIO_COALESCE_MS", "0")
+    monkeypatch.setenv("SOCKETIO_MESSAGE_QUEUE", queue)
+    import app as appmod
+    apps = [appmod.create_app() for _ in range(count)]
+    appmod.init_db(apps[0])
+    appmod.seed_demo(apps[0])
+    return apps
+
+
+def logged_in(app):
+    client = app.test_client()
+    client.post("/login", data={"email": "admin@example.com", "password": "Password"})
+    return client
+
+
+def test_local_queue_joins_servers_in_one_process(tmp_path, monkeypatch):
+    a, b = make_apps(tmp_path, monkeypatch, f"local://{tmp_path}", 2)
+    # The test client refuses queued servers, so watch what reaches B's manager instead
+    received = []
+    server = b.socketio.server
+    server.manager._handle_emit = received.append
+    server.manager_initialized = True  # what B's first client connection would do: start the listener
+    server.manager.initialize()
+    assert logged_in(a).patch("/tasks/1", json={"state": "review"}).status_code == 204
+    deadline = time.time() + 5
+    while time.time() < deadline and not any(m["event"] == "tasks_updated" for m in received):
+        time.sleep(0.02)
+    [message] = [m for m in received if m["event"] == "tasks_updated" and m["room"] == "dashboard"]
+    assert message["data"][0]["tasks"] == [{"id": 1, "state": "review"}]
+
+
+@pytest.mark.skipif(sys.platform == "win32", reason="spawns worker processes serving a local port")
+def test_update_in_worker_a_reaches_client_on_worker_b(tmp_path, monkeypatch):
+    pytest.importorskip("simple_websocket")
+    import socket_workers
+    queue = f"sqlite:///{tmp_path}/socketio.db"
+    make_apps(tmp_path, monkeypatch, queue, 1)
+    env = {"DATABASE_URL": f"sqlite:///{tmp_path}/shop.db", "SOCKETIO_MESSAGE_QUEUE": queue,
+           "SOCKETIO_ASYNC_MODE": "threading"}
+
+    ctx = multiprocessing.get_context("spawn")
+    port = socket_workers.free_port()
+    b = ctx.Process(target=socket_workers.worker_b, args=(env, port), daemon=True)
+    b.start()
+    try:
+        ws = socket_workers.connect(port, timeout=20)
+        a = ctx.Process(target=socket_workers.worker_a, args=(env,))
+        a.start()
+        payload = socket_workers.wait_for(ws, "tasks_updated", timeout=20)
+        a.join(20)
+        ws.close()
+    finally:
+        b.terminate()
+        b.join(5)
+    assert a.exitcode == 0
+    assert payload and payload["tasks"] == [{"id": 1, "state": "review"}]
@@ -0,0 +1,41 @@
+from models import db
+
+
+def hooks(app):
+    with app.app_context():
+        engines = list(db.engines.values())
+    request_hooks = [f.__name__ for funcs in (*app.before_request_funcs.values(), *app.after_request_funcs.values())
+                     for f in funcs]
+    cursor_hooks = sum(len(e.dispatch.before_cursor_execute) + len(e.dispatch.after_cursor_execute) for e in engines)
+    return request_hooks, cursor_hooks
+
+
+def test_nothing_is_registered_with_profiling_off(app, client):
+    request_hooks, cursor_hooks = hooks(app)
+    assert not {"_start_profile", "_finish_profile"} & set(request_hooks)
+    assert cursor_hooks == 0
+    assert "profiling" not in app.extensions
+    assert "emit" not in vars(app.socketio)  # socketio.emit is not wrapped
+    assert client.get("/metrics").status_code == 404
+    assert "Server-Timing" not in client.get("/dashboard/progress.json").headers
+
+
+def test_metrics_with_profiling_on(tmp_path, monkeypatch):
+    monkeypatch.setenv("PROFILING", "1")
+    monkeypatch.setenv("PROFILING_SERVER_TIMING", "1")
+    monkeypatch.setenv("DATABASE_URL", f"sqlite:///{tmp_path}/test.db")
+    monkeypatch.setenv("SOCKETIO_ASYNC_MODE", "threading")
+    import app as appmod
+    app = appmod.create_app()
+    appmod.init_db(app)
+    appmod.seed_demo(app)
+    request_hooks, cursor_hooks = hooks(app)
+    assert {"_start_profile", "_finish_profile"} <= set(request_hooks)
+    assert cursor_hooks > 0
+
+    client = app.test_client()
+    client.post("/login", data={"email": "admin@example.com", "password": "Password"})
+    resp = client.get("/dashboard/progress.json")
+    assert "queries" in resp.headers["Server-Timing"]
+    metrics = client.get("/metrics").get_data(as_text=True)
+    assert 'shop_requests_total{endpoint="dashboard_progress_json",method="GET"} 1' in metrics
@@ -0,0 +1,29 @@
+import dashboard_data
+from models import db, Project, Task
+
+
+def test_list_and_progress_json_agree_on_percent(app, client):
+    with app.app_context():
+        p = Project(code="JOB-3000", title="Thirds", created_by=1)
+        p.tasks = [Task(title=f"Op {i}", state="done" if i < 2 else "ready", created_by=1) for i in range(3)]
+        db.session.add(p)
+        db.session.commit()
+        listed = {row["project"].id: row["pct"] for row in dashboard_data.projects_page()[0]}
+        assert listed[p.id] == 67  # 2/3 rounds, it doesn't floor
+    pushed = {row["id"]: row["pct"] for row in client.get("/dashboard/progress.json").get_json()}
+    assert pushed == listed
+
+
+def test_search_treats_wildcards_literally(app, client):
+    with app.app_context():
+        db.session.add_all([Project(code="JOB_4000", title="Rush 50% off", customer="Initech", created_by=1),
+                            Project(code="JOB-4001", title="Rush 500 off", customer="Initech", created_by=1)])
+        db.session.commit()
+
+        def codes(term):
+            return {row["project"].code for row in dashboard_data.projects_page(term)[0]}
+        assert codes("50%") == {"JOB_4000"}
+        assert codes("%") == {"JOB_4000"}
+        assert codes("JOB_") == {"JOB_4000"}
+        assert codes("rush") == {"JOB_4000", "JOB-4001"}
+    assert b"JOB-4001" not in client.get("/projects?q=50%25").data
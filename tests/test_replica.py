@@ -0,0 +1,70 @@
+import pytest
+from sqlalchemy import event
+
+import database
+from models import db
+
+
+@pytest.fixture
+def routed(tmp_path, monkeypatch):
+    """(client, counts): the app on two SQLite files, counting statements per engine."""
+    primary, replica = f"sqlite:///{tmp_path}/primary.db", f"sqlite:///{tmp_path}/replica.db"
+    monkeypatch.setenv("DATABASE_URL", primary)
+    monkeypatch.setenv("DATABASE_REPLICA_URL", replica)
+    monkeypatch.setenv("REPLICA_STICKY_SECONDS", "60")
+    monkeypatch.setenv("SOCKETIO_ASYNC_MODE", "threading")
+    monkeypatch.setenv("SOCKETIO_COALESCE_MS", "0")
+    import app as appmod
+    app = appmod.create_app()
+    appmod.init_db(app)
+    appmod.seed_demo(app)
+    database.sync_sqlite_replica(primary, replica)
+    counts = {}
+    with app.app_context():
+        for key, engine in db.engines.items():
+            name = key or "primary"
+            event.listen(engine, "before_cursor_execute",
+                         lambda *a, name=name, **k: counts.__setitem__(name, counts.get(name, 0) + 1))
+    client = app.test_client()
+    client.post("/login", data={"email": "admin@example.com", "password": "Password"})
+    client.get("/")  # login_required loads the session user on the primary once, then serves it from auth's cache
+    unstick(client)
+    return client, counts
+
+
+def unstick(client):
+    with client.session_transaction() as session:
+        session.pop("primary_until", None)
+
+
+def run(client, counts, method, url, **kwargs):
+    counts.clear()
+    resp = client.open(url, method=method, **kwargs)
+    assert resp.status_code < 400, (url, resp.status_code)
+    return resp, counts.get("primary", 0), counts.get("replica", 0)
+
+
+def test_gets_read_from_the_replica(routed):
+    client, counts = routed
+    for url in ("/", "/projects", "/dashboard/progress.json", "/search.json?q=bracket", "/sync"):
+        _, primary, replica = run(client, counts, "GET", url)
+        assert primary == 0 and replica > 0, url
+
+
+def test_writes_go_to_the_primary_and_reads_stick_to_it(routed):
+    client, counts = routed
+    _, primary, replica = run(client, counts, "POST", "/projects", data={"code": "JOB-NEW", "title": "Fresh job"})
+    assert primary > 0 and replica == 0
+    _, primary, replica = run(client, counts, "PATCH", "/tasks/1", json={"state": "review"})
+    assert primary > 0 and replica == 0
+
+    # Inside the sticky window this browser reads its own write from the primary
+    resp, primary, replica = run(client, counts, "GET", "/projects")
+    assert primary > 0 and replica == 0
+    assert b"JOB-NEW" in resp.data
+
+    # Once it lapses, reads go back to the replica, which hasn't seen the write yet
+    unstick(client)
+    resp, primary, replica = run(client, counts, "GET", "/projects")
+    assert primary == 0 and replica > 0
+    assert b"JOB-NEW" not in resp.data
@@ -0,0 +1,83 @@
+import pytest
+
+import rollups
+from models import db, Project, ProjectProgress, Task
+
+
+@pytest.fixture
+def ctx(app):
+    with app.app_context():
+        yield
+
+
+def progress(pid):
+    row = db.session.get(ProjectProgress, pid)
+    db.session.refresh(row)
+    return {"total": row.total, "done": row.done, "ready": row.ready, "open_hours": row.open_hours}
+
+
+def test_create(ctx):
+    before = progress(1)
+    db.session.add_all([Task(project_id=1, title="Deburr", state="ready", est_hours=2, created_by=1),
+                        Task(project_id=1, title="Ship", state="done", est_hours=5, created_by=1)])
+    db.session.commit()
+    assert progress(1) == {"total": before["total"] + 2, "done": before["done"] + 1,
+                           "ready": before["ready"] + 1, "open_hours": before["open_hours"] + 2}
+    assert rollups.verify() == []
+
+
+def test_state_change(ctx):
+    t = db.session.get(Task, 1)  # ready, 3.5 h
+    before = progress(1)
+    t.state = "done"
+    db.session.commit()
+    assert progress(1) == {"total": before["total"], "done": before["done"] + 1,
+                           "ready": before["ready"] - 1, "open_hours": before["open_hours"] - 3.5}
+    # Expired after the commit: the old state is read back from the row
+    t.state = "ready"
+    t.est_hours = 1
+    db.session.commit()
+    assert rollups.verify() == []
+
+
+def test_delete(ctx):
+    before = progress(1)
+    db.session.delete(db.session.get(Task, 2))  # in_progress, 6 h
+    db.session.commit()
+    assert progress(1)["total"] == before["total"] - 1
+    assert progress(1)["open_hours"] == before["open_hours"] - 6
+    assert rollups.verify() == []
+
+
+def test_move_between_projects(ctx):
+    t = db.session.get(Task, 1)
+    t.project_id = 2
+    t.state = "review"
+    db.session.commit()
+    assert rollups.verify() == []
+    db.session.get(Task, 3).project = db.session.get(Project, 1)
+    db.session.commit()
+    assert rollups.verify() == []
+
+
+def test_project_delete_cascade(ctx):
+    extra = Project(code="JOB-2000", title="Scrap", created_by=1)
+    extra.tasks = [Task(title=f"Op {i}", state="ready", created_by=1) for i in range(3)]
+    db.session.add(extra)
+    db.session.commit()
+    assert progress(extra.id)["total"] == 3
+    pid = extra.id
+    db.session.delete(db.session.get(Project, 2))
+    db.session.delete(extra)
+    db.session.commit()
+    assert db.session.get(ProjectProgress, pid) is None
+    assert db.session.get(ProjectProgress, 2) is None
+    assert rollups.verify() == []
+
+
+def test_routes_keep_counters_exact(app, client):
+    client.patch("/tasks/1", json={"state": "done"})
+    client.post("/projects/2/delete")
+    with app.app_context():
+        assert db.session.get(Project, 2) is None
+        assert rollups.verify() == []
@@ -0,0 +1,74 @@
+import json
+import os
+import sys
+import threading
+import time
+
+import pytest
+from werkzeug.serving import make_server
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "bench"))
+
+WINDOW_MS = 300
+
+
+@pytest.fixture
+def served(tmp_path, monkeypatch):
+    """(writer client on app A, port of app B); A and B share the database and a local:// queue."""
+    pytest.importorskip("simple_websocket")
+    import socket_workers
+    monkeypatch.setenv("DATABASE_URL", f"sqlite:///{tmp_path}/shop.db")
+    monkeypatch.setenv("SOCKETIO_ASYNC_MODE", "threading")
+    monkeypatch.setenv("SOCKETIO_MESSAGE_QUEUE", f"local://{tmp_path}")
+    monkeypatch.setenv("SOCKETIO_COALESCE_MS", str(WINDOW_MS))
+    import app as appmod
+    a, b = appmod.create_app(), appmod.create_app()
+    appmod.init_db(a)
+    appmod.seed_demo(a)
+    # The Socket.IO test client refuses queued servers, so B serves real websockets on a local port
+    server = make_server("127.0.0.1", socket_workers.free_port(), b, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    writer = a.test_client()
+    writer.post("/login", data={"email": "admin@example.com", "password": "Password"})
+    yield writer, server.server_port
+    server.shutdown()
+
+
+def received(ws, seconds):
+    """tasks_updated payloads arriving on ``ws`` within ``seconds``."""
+    out, deadline = [], time.time() + seconds
+    while time.time() < deadline:
+        msg = ws.receive(max(deadline - time.time(), 0.01))
+        if msg == "2":
+            ws.send("3")
+        elif msg and msg.startswith("42"):
+            name, *args = json.loads(msg[2:])
+            if name == "tasks_updated":
+                out.append(args[0])
+    return out
+
+
+def test_project_rooms_get_only_their_job_and_bursts_coalesce(served):
+    import socket_workers
+    writer, port = served
+    job1 = socket_workers.connect(port, view={"view": "project", "project": 1})
+    job2 = socket_workers.connect(port, view={"view": "project", "project": 2})
+    try:
+        # Tasks 1 and 2 belong to JOB-1001; a burst inside one coalescing window
+        for state in ("review", "done", "ready", "review"):
+            assert writer.patch("/tasks/1", json={"state": state}).status_code == 204
+        assert writer.patch("/tasks/2", json={"state": "blocked"}).status_code == 204
+        got1, got2 = received(job1, WINDOW_MS * 3 / 1000), received(job2, 0.1)
+        # The first batch goes out at once, the other four are merged into one emit
+        assert len(got1) == 2
+        assert got1[0]["tasks"] == [{"id": 1, "state": "review"}]
+        assert sorted((t["id"], t["state"]) for t in got1[1]["tasks"]) == [(1, "review"), (2, "blocked")]
+        assert got2 == []
+
+        assert writer.patch("/tasks/3", json={"state": "review"}).status_code == 204
+        got1, got2 = received(job1, 0.5), received(job2, 0.5)
+        assert got1 == []
+        assert [t["id"] for p in got2 for t in p["tasks"]] == [3]
+    finally:
+        job1.close()
+        job2.close()
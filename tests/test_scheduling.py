@@ -0,0 +1,49 @@
+from datetime import datetime, timezone
+
+import scheduling
+from models import db, Task
+
+
+def test_schedule_runs_in_shop_local_time(app, client):
+    app.config["SHOP_TIMEZONE"] = "America/Chicago"
+    # Sunday 22:00 in Chicago; the default shifts open Monday 06:00 shop time (11:00 UTC)
+    now = datetime(2026, 10, 19, 3, 0, tzinfo=timezone.utc)
+    with app.app_context():
+        entries = scheduling.machine_schedule(1, now)
+        assert scheduling.floor(now)[1]["anchor"] == datetime(2026, 10, 18, 22, 0)
+        assert entries[0][1] == datetime(2026, 10, 19, 6, 0)
+        assert scheduling.shop_isoformat(entries[0][1]) == "2026-10-19T06:00:00-05:00"
+
+
+def test_naive_times_are_taken_as_shop_local(app):
+    app.config["SHOP_TIMEZONE"] = "Europe/Berlin"
+    with app.app_context():
+        assert scheduling.shop_time(datetime(2026, 1, 5, 9, 30)) == datetime(2026, 1, 5, 9, 30)
+        assert scheduling.shop_time(datetime(2026, 1, 5, 9, 30, tzinfo=timezone.utc)) == datetime(2026, 1, 5, 10, 30)
+
+
+def test_solves_run_outside_the_cache_lock(app, monkeypatch):
+    solve, held = scheduling.solve, []
+
+    def watched(*args, **kwargs):
+        lock = scheduling._app_cache()["lock"]
+        free = lock.acquire(blocking=False)
+        if free:
+            lock.release()
+        held.append(not free)
+        return solve(*args, **kwargs)
+    monkeypatch.setattr(scheduling, "solve", watched)
+    now = datetime(2026, 10, 19, 9, 0)
+    with app.app_context():
+        first = scheduling.floor(now)
+        assert held and not any(held)
+        stats = dict(scheduling._app_cache()["stats"])
+        assert scheduling.floor(now) == first  # served from the cache: nothing re-solved
+        assert scheduling._app_cache()["stats"] == stats
+
+        # Task 1 runs on machine 1: only that machine is solved again, and the result is kept
+        db.session.get(Task, 1).priority = 5
+        db.session.commit()
+        scheduling.floor(now)
+        assert scheduling._app_cache()["stats"] == {**stats, "machine_solves": stats["machine_solves"] + 1}
+        assert not any(held)
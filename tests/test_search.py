@@ -0,0 +1,53 @@
+import search
+from models import db, Task
+
+
+def add_tasks(app, rows):
+    with app.app_context():
+        tasks = [Task(project_id=1, title=title, description=description, created_by=1) for title, description in rows]
+        db.session.add_all(tasks)
+        db.session.commit()
+        return [t.id for t in tasks]
+
+
+def pages(client, url):
+    """Every page of a /search.json query, following ``next``."""
+    out, offset = [], 0
+    while offset is not None:
+        page = client.get(f"{url}&offset={offset}").get_json()
+        out.append(page)
+        offset = page["next"]
+    return out
+
+
+def test_broad_queries_page_through_every_match(app, client, monkeypatch):
+    monkeypatch.setattr(search, "RANK_LIMIT", 5)
+    [prefix_only] = add_tasks(app, [("Deburr", "spindles worn")])
+    [oldest_best] = add_tasks(app, [("Spindle spindle spindle", "spindle")])
+    newer = add_tasks(app, [("Deburr", f"check spindle {i}") for i in range(6)])
+    [titled] = add_tasks(app, [("Spindle warmup", "")])
+    newest = add_tasks(app, [("Deburr", "spindle note")])
+
+    found = pages(client, "/search.json?q=spindle&kind=task&limit=3")
+    assert all(p["truncated"] for p in found)
+    ids = [i["id"] for p in found for i in p["items"]]
+    # The newest RANK_LIMIT matches by bm25 (title hits first), then the older ones newest first
+    assert ids[0] == titled
+    assert set(ids[:5]) == {titled, *newest, *newer[-3:]}
+    assert ids[5:] == [*newer[2::-1], oldest_best, prefix_only]
+
+
+def test_exact_words_still_include_prefix_matches(app, client, monkeypatch):
+    monkeypatch.setattr(search, "RANK_LIMIT", 3)
+    [prefix_only] = add_tasks(app, [("Deburr", "coolants topped up")])
+    exact = add_tasks(app, [("Deburr", "coolant level") for _ in range(4)])
+    ids = [i["id"] for p in pages(client, "/search.json?q=coolant&kind=task&limit=2") for i in p["items"]]
+    assert sorted(ids) == sorted([prefix_only, *exact])
+
+
+def test_narrow_queries_rank_every_match(app, client):
+    [strong] = add_tasks(app, [("Coolant coolant", "coolant")])
+    add_tasks(app, [("Deburr", "coolant level") for _ in range(3)])
+    page = client.get("/search.json?q=coolant&kind=task").get_json()
+    ids = [i["id"] for i in page["items"]]
+    assert ids[0] == strong and len(ids) == 4 and not page["truncated"]
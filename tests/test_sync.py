@@ -0,0 +1,63 @@
+import re
+from datetime import date, timedelta
+
+from models import db, ChangeLog, Project, Task
+
+ISO = re.compile(r"^\d{4}-\d{2}-\d{2}$")
+
+
+def dates(payload):
+    """Every "due" value anywhere in a /sync payload."""
+    if isinstance(payload, dict):
+        return [v for k, v in payload.items() if k == "due" and v] + \
+            [d for v in payload.values() for d in dates(v)]
+    if isinstance(payload, list):
+        return [d for v in payload for d in dates(v)]
+    return []
+
+
+def test_sync_dates_are_iso(app, client):
+    soon = date.today() + timedelta(days=2)
+    with app.app_context():
+        db.session.add(Task(project_id=1, title="Deburr", state="blocked", priority=1, created_by=1, due_date=soon))
+        db.session.get(Project, 1).due_date = soon
+        db.session.commit()
+    full = client.get("/sync").get_json()
+    changes = client.get("/sync?since=0").get_json()
+    assert full["full"] and not changes["full"]
+    assert {c["type"] for c in changes["changes"]} >= {"task", "project"}
+    for payload in (full, changes):
+        found = dates(payload)
+        assert soon.isoformat() in found
+        assert all(ISO.match(d) for d in found), found
+    assert soon.isoformat() in [t["due"] for t in changes["delta"]["due_soon"]]
+
+
+def newest(app):
+    with app.app_context():
+        return db.session.query(db.func.max(ChangeLog.id)).scalar() or 0
+
+
+def progress_ids(client, since):
+    payload = client.get(f"/sync?since={since}").get_json()
+    assert not payload["full"]
+    return {p["id"] for p in payload["delta"]["progress"]}
+
+
+def test_task_tombstone_limits_progress_to_its_project(app, client):
+    with app.app_context():
+        assert Project.query.count() > 1
+        task = Task.query.filter_by(project_id=1).first()
+        since = newest(app)
+        db.session.delete(task)
+        db.session.commit()
+    assert progress_ids(client, since) == {1}
+
+
+def test_task_move_sends_progress_of_both_projects(app, client):
+    with app.app_context():
+        other = Project.query.filter(Project.id != 1).first().id
+        since = newest(app)
+        Task.query.filter_by(project_id=1).first().project = db.session.get(Project, other)
+        db.session.commit()
+    assert progress_ids(client, since) == {1, other}
@@ -0,0 +1,6 @@
+# Production entry point: gunicorn -c gunicorn.conf.py wsgi:app
+# The app (and its Socket.IO server) is built once per worker process at import.
+from app import create_app
+
+app = create_app()
+socketio = app.socketio